@@ -0,0 +1,90 @@
+"""
+Cache des principaux authentifiés (session coach -> utilisateur), par processus.
+
+- LRU borné, indexé par le hash du token (jamais le token en clair).
+- TTL plafonné à l'expiration de la session.
+- Révocations inter-workers: chaque révocation (déconnexion, suppression de coach, nouvelle
+  connexion) incrémente une version partagée en base. Chaque worker la relit au plus toutes
+  les `revocation_poll_seconds` et vide son cache quand elle a changé.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Hashable, Optional
+
+
+class PrincipalCache:
+    """LRU token -> principal authentifié, avec TTL et version de révocation partagée"""
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        revocation_poll_seconds: float = 1.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.revocation_poll_seconds = revocation_poll_seconds
+        self.clock = clock
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # hash -> (principal, expire_monotonic)
+        self.revocation_version: Optional[Hashable] = None
+        self.revocations_checked_at: Optional[float] = None
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        principal, expires = entry
+        if expires <= self.clock():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return principal
+
+    def put(self, token: str, principal: dict, session_expires_at: datetime):
+        remaining = (session_expires_at - datetime.now(timezone.utc)).total_seconds()
+        ttl = min(self.ttl_seconds, remaining)
+        if ttl <= 0:
+            return
+        key = self._key(token)
+        self.entries[key] = (principal, self.clock() + ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        self.entries.pop(self._key(token), None)
+
+    def invalidate_user(self, user_id: str = None, email: str = None):
+        """Invalide toutes les sessions d'un utilisateur (par user_id ou email)"""
+        email = email.lower() if email else None
+        stale = [
+            key for key, (principal, _) in self.entries.items()
+            if (user_id and principal.get("user_id") == user_id) or (email and (principal.get("email") or "").lower() == email)
+        ]
+        for key in stale:
+            del self.entries[key]
+
+    # --- Révocations partagées ---
+    def revocation_check_due(self) -> bool:
+        now = self.clock()
+        if self.revocations_checked_at is not None and now - self.revocations_checked_at < self.revocation_poll_seconds:
+            return False
+        self.revocations_checked_at = now
+        return True
+
+    def sync_revocations(self, version: Hashable) -> bool:
+        """Applique la version partagée; retourne True si le cache a été vidé"""
+        if version == self.revocation_version:
+            return False
+        cleared = self.revocation_version is not None
+        if cleared:
+            self.entries.clear()
+        self.revocation_version = version
+        return cleared
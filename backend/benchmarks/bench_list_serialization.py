@@ -0,0 +1,112 @@
+"""
+Benchmark: sérialisation des listes (response_model + json stdlib vs list_api + orjson)
+
+Mesure le temps CPU par requête pour 1000 documents offres / utilisateurs / codes promo:
+- avant: validation response_model=List[Model] par FastAPI puis JSONResponse (json stdlib)
+- après: list_api (projection et défauts précalculés, sans validation + orjson), tel qu'envoyé en flux
+
+Usage (depuis backend/):
+    python benchmarks/bench_list_serialization.py [nb_documents] [nb_iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+# server.py exige MONGO_URL à l'import; aucune connexion n'est ouverte par ce script
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+import orjson  # noqa: E402
+import server  # noqa: E402
+from list_api import ListSpec  # noqa: E402
+from server import DiscountCode, Offer, User  # noqa: E402
+
+
+def make_offers(count: int) -> List[dict]:
+    return [{
+        "id": str(uuid.uuid4()),
+        "name": f"Offre {i}",
+        "price": 30.0 + i,
+        "thumbnail": "https://example.com/thumb.jpg",
+        "description": "Cours de danse afro, cardio et bonne humeur " * 3,
+        "keywords": "afro, cardio, danse",
+        "visible": True,
+        "images": ["https://example.com/1.jpg", "https://example.com/2.jpg"],
+        "category": "service",
+        "isProduct": i % 3 == 0,
+        "stock": -1,
+    } for i in range(count)]
+
+
+def make_users(count: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": str(uuid.uuid4()),
+        "name": f"Client {i}",
+        "email": f"client{i}@example.com",
+        "whatsapp": "+41790000000",
+        "createdAt": now,
+    } for i in range(count)]
+
+
+def make_codes(count: int) -> List[dict]:
+    return [{
+        "id": str(uuid.uuid4()),
+        "code": f"PROMO{i:04d}",
+        "type": "%",
+        "value": 10.0,
+        "courses": [str(uuid.uuid4())],
+        "used": i % 5,
+        "active": True,
+    } for i in range(count)]
+
+
+async def render_before(field, docs: List[dict]) -> bytes:
+    content = await serialize_response(field=field, response_content=docs, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def render_after(spec: ListSpec, docs: List[dict]) -> bytes:
+    return orjson.dumps(spec.shape_many([dict(doc) for doc in docs], None, "_id"))
+
+
+def cpu_per_request(func, iterations: int) -> float:
+    func()  # échauffement (caches Pydantic / forme du modèle)
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    loop = asyncio.new_event_loop()
+
+    print(f"{count} documents, {iterations} itérations - temps CPU par requête")
+    print(f"{'endpoint':<16}{'avant (ms)':>12}{'après (ms)':>12}{'gain':>8}")
+    for name, model, docs in [
+        ("/offers", Offer, make_offers(count)),
+        ("/users", User, make_users(count)),
+        ("/discount-codes", DiscountCode, make_codes(count)),
+    ]:
+        field = create_response_field(name=f"Response_{model.__name__}", type_=List[model])
+        before = cpu_per_request(lambda: loop.run_until_complete(render_before(field, docs)), iterations)
+        spec = ListSpec(model)
+        after = cpu_per_request(lambda: render_after(spec, docs), iterations)
+        print(f"{name:<16}{before:>12.2f}{after:>12.2f}{before / after:>7.1f}x")
+
+    loop.close()
+    server.client.close()
+
+
+if __name__ == "__main__":
+    main()
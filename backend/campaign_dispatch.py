@@ -0,0 +1,133 @@
+"""
+Envoi des campagnes: adaptateurs par canal derrière un limiteur de débit.
+
+- ChannelAdapter: interface d'un canal (send() retourne (succès, erreur)).
+- LocalChannelAdapter: n'envoie rien, garde les messages en mémoire (tests, préproduction).
+- ChannelAdapterPool: un adaptateur + un RateLimiter (token bucket) par canal. En mode
+  "live" les adaptateurs réels (Twilio, EmailJS) sont fournis par le serveur.
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FIRST_NAME_PLACEHOLDERS = ["{prénom}", "{Prénom}", "{PRÉNOM}", "{prenom}", "{Prenom}", "{PRENOM}"]
+
+
+def personalize_message(message: str, contact_name: str) -> str:
+    """Remplace {prénom}/{prenom}/{nom} comme le fait le dashboard"""
+    first_name = (contact_name or "").split(" ")[0] or "ami(e)"
+    for placeholder in FIRST_NAME_PLACEHOLDERS:
+        message = message.replace(placeholder, first_name)
+    return message.replace("{nom}", contact_name or "")
+
+
+def format_phone_e164(phone: str) -> str:
+    """Même logique que formatPhoneE164 (whatsappService.js)"""
+    cleaned = "".join(ch for ch in (phone or "") if ch.isdigit() or ch == "+")
+    if not cleaned:
+        return ""
+    if not cleaned.startswith("+"):
+        if cleaned.startswith("0"):
+            cleaned = "+41" + cleaned[1:]
+        elif len(cleaned) > 10:
+            cleaned = "+" + cleaned
+        else:
+            cleaned = "+41" + cleaned
+    return cleaned
+
+
+class RateLimiter:
+    """Token bucket asyncio: au plus `rate` acquisitions par seconde (rafale max: max(1, rate))"""
+    def __init__(self, rate: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ChannelAdapter(ABC):
+    """Interface d'un canal d'envoi"""
+    channel = ""
+
+    @abstractmethod
+    async def send(self, result: dict, campaign: dict) -> tuple:
+        """(succès, erreur) pour un résultat {contactName, contactEmail, contactPhone, ...}"""
+
+    async def close(self):
+        pass
+
+
+class LocalChannelAdapter(ChannelAdapter):
+    """Adaptateur local (CAMPAIGN_DISPATCH_MODE=local): n'envoie rien, garde les messages en mémoire"""
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.sent: List[dict] = []
+
+    async def send(self, result: dict, campaign: dict) -> tuple:
+        target = result.get("contactPhone") if self.channel == "whatsapp" else result.get("contactEmail")
+        if not target:
+            return False, "Destinataire manquant"
+        self.sent.append({
+            "campaignId": campaign.get("id"),
+            "to": target,
+            "message": personalize_message(campaign.get("message", ""), result.get("contactName", ""))
+        })
+        return True, None
+
+
+class ChannelAdapterPool:
+    """
+    Adaptateurs par canal, chacun derrière son propre RateLimiter.
+    - mode: "live" (live_adapters[canal]() construit l'adaptateur réel) ou "local"
+    """
+    def __init__(
+        self,
+        mode: str,
+        rates: Dict[str, float],
+        live_adapters: Optional[Dict[str, Callable[[], ChannelAdapter]]] = None
+    ):
+        if mode not in ("live", "local"):
+            raise ValueError(f"Mode d'envoi inconnu: {mode}")
+        self.mode = mode
+        self.rates = rates
+        self.adapters: Dict[str, ChannelAdapter] = {}
+        self.limiters: Dict[str, RateLimiter] = {}
+        for channel, rate in rates.items():
+            if mode == "local":
+                self.adapters[channel] = LocalChannelAdapter(channel)
+            else:
+                self.adapters[channel] = (live_adapters or {})[channel]()
+            self.limiters[channel] = RateLimiter(rate)
+
+    def supports(self, channel: str) -> bool:
+        return channel in self.adapters
+
+    async def send(self, result: dict, campaign: dict) -> tuple:
+        channel = result.get("channel")
+        await self.limiters[channel].acquire()
+        try:
+            return await self.adapters[channel].send(result, campaign)
+        except Exception as e:
+            logger.warning(f"[Dispatch] Échec {channel} -> {result.get('contactId')}: {e}")
+            return False, str(e)
+
+    async def close(self):
+        for adapter in self.adapters.values():
+            await adapter.close()
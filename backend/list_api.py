@@ -0,0 +1,320 @@
+"""
+Listes de collections: une seule couche pour toutes les routes GET de liste.
+
+- Sans paramètre: liste complète (plus de to_list(N) qui tronque), envoyée en flux JSON
+  par lots (tableau, même forme qu'avant).
+- limit / cursor: pagination par curseur (keyset sur le champ de tri + _id), réponse
+  {"data": [...], "pagination": {"limit", "nextCursor"}}. Le coût d'une page ne dépend pas
+  de sa position (pas de skip).
+- fields=a,b,c: projection Mongo limitée aux champs autorisés.
+- Filtres (égalité) et tris (sort=champ ou sort=-champ) limités à une liste blanche par route.
+- Documents mis en forme d'après le modèle (conform_documents): projection et valeurs par défaut
+  calculées une fois par modèle, appliquées aux dicts bruts, sans validation Pydantic par requête.
+- Schéma OpenAPI des routes: list_response_model(model) décrit les deux formes de réponse.
+"""
+import base64
+import copy
+import re
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+import orjson
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, create_model
+from pydantic_core import PydanticUndefined
+from pymongo import ASCENDING, DESCENDING
+
+STREAM_BATCH_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+_FIELD_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+
+def _parse_bool(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in ("1", "true", "yes"):
+        return True
+    if lowered in ("0", "false", "no"):
+        return False
+    raise ValueError(value)
+
+
+FILTER_PARSERS = {bool: _parse_bool, int: int, float: float, str: str}
+
+
+# --- Mise en forme par le modèle ---
+class DocumentShape:
+    """Champs d'un modèle (ou ceux demandés) et leurs valeurs par défaut, calculés une fois"""
+    def __init__(self, model, fields: Optional[FrozenSet[str]] = None):
+        self.names = frozenset(name for name in model.model_fields if fields is None or name in fields)
+        self.defaults: Dict[str, Any] = {}
+        self.factories: Dict[str, Callable[[], Any]] = {}
+        for name in self.names:
+            field = model.model_fields[name]
+            if field.default_factory is not None:
+                self.factories[name] = field.default_factory
+            elif field.default is PydanticUndefined:
+                continue
+            elif isinstance(field.default, (list, dict, set)):
+                # Défaut mutable: une copie par document, comme Pydantic
+                self.factories[name] = partial(copy.deepcopy, field.default)
+            else:
+                self.defaults[name] = field.default
+
+    def apply(self, doc: dict) -> dict:
+        """Complète le document sur place (défauts des champs absents) et retire les champs hors modèle"""
+        if not doc.keys() <= self.names:
+            for name in [name for name in doc if name not in self.names]:
+                del doc[name]
+        for name, value in self.defaults.items():
+            if name not in doc:
+                doc[name] = value
+        for name, factory in self.factories.items():
+            if name not in doc:
+                doc[name] = factory()
+        return doc
+
+
+@lru_cache(maxsize=256)
+def document_shape(model, fields: Optional[FrozenSet[str]] = None) -> DocumentShape:
+    return DocumentShape(model, fields)
+
+
+def conform_documents(model, docs: List[dict], fields: Optional[set] = None) -> List[dict]:
+    """
+    Documents Mongo -> dicts limités aux champs du modèle (ou `fields`), valeurs par défaut et
+    default_factory ajoutées. Les valeurs stockées sont renvoyées telles quelles (pas de coercition):
+    les écritures passent déjà par les modèles et les dates historiques sont migrées au démarrage.
+    """
+    shape = document_shape(model, frozenset(fields) if fields is not None else None)
+    return [shape.apply(doc) for doc in docs]
+
+
+class Pagination(BaseModel):
+    limit: int
+    nextCursor: Optional[str] = None
+
+
+@lru_cache(maxsize=None)
+def list_response_model(model):
+    """response_model d'une route de liste: tableau complet, ou page {data, pagination} avec limit/cursor"""
+    page = create_model(f"{model.__name__}Page", data=(List[model], ...), pagination=(Pagination, ...))
+    return Union[List[model], page]
+
+
+class ListSpec:
+    """
+    Description d'une liste:
+    - model: modèle Pydantic (champs autorisés + valeurs par défaut), None = documents libres
+    - filters: {paramètre: type} filtres d'égalité autorisés
+    - sorts: champs triables; default_sort: "-createdAt" ou "_id" (ordre d'insertion)
+    - exclude: champs jamais renvoyés (sans model)
+    - transform: enrichissement async d'un lot de documents (ex: résultats de campagne)
+    """
+    def __init__(
+        self,
+        model=None,
+        filters: Optional[Dict[str, type]] = None,
+        sorts: Tuple[str, ...] = (),
+        default_sort: str = "_id",
+        exclude: Tuple[str, ...] = (),
+        transform: Optional[Callable[[List[dict], Optional[set]], Awaitable[None]]] = None
+    ):
+        self.model = model
+        self.filters = filters or {}
+        self.sorts = set(sorts) | {"_id"}
+        self.default_sort = default_sort
+        self.exclude = exclude
+        self.transform = transform
+        # Projection de la liste complète, construite une fois
+        if model is not None:
+            self._projection = {name: 1 for name in model.model_fields}
+        elif exclude:
+            self._projection = {name: 0 for name in exclude}
+        else:
+            self._projection = None
+
+    # --- Paramètres ---
+    def requested_fields(self, fields: Optional[str]) -> Optional[set]:
+        if not fields:
+            return None
+        names = {name.strip() for name in fields.split(",") if name.strip()}
+        invalid = [
+            name for name in names
+            if not _FIELD_NAME.match(name)
+            or (self.model is not None and name not in self.model.model_fields)
+            or name in self.exclude
+        ]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Champs inconnus: {', '.join(sorted(invalid))}")
+        return names | {"id"} if self.model is None or "id" in self.model.model_fields else names
+
+    def projection(self, fields: Optional[set], sort_field: str) -> Optional[dict]:
+        """Projection Mongo; _id et le champ de tri sont toujours lus (curseur) puis retirés"""
+        if fields is not None:
+            return {**{name: 1 for name in fields}, sort_field: 1}
+        if self.model is None:
+            return self._projection
+        if sort_field in self._projection:
+            return self._projection
+        return {**self._projection, sort_field: 1}
+
+    def query(self, params) -> dict:
+        query = {}
+        for name, kind in self.filters.items():
+            value = params.get(name)
+            if value is None:
+                continue
+            try:
+                query[name] = FILTER_PARSERS[kind](value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Filtre {name} invalide: {value}")
+        return query
+
+    def sort(self, sort: Optional[str]) -> Tuple[str, int]:
+        sort = sort or self.default_sort
+        field, direction = (sort[1:], DESCENDING) if sort.startswith("-") else (sort, ASCENDING)
+        if field not in self.sorts:
+            raise HTTPException(status_code=400, detail=f"Tri non autorisé: {field}")
+        return field, direction
+
+    # --- Mise en forme ---
+    def shape_many(self, docs: List[dict], fields: Optional[set], sort_field: str) -> List[dict]:
+        for doc in docs:
+            doc.pop("_id", None)
+            if fields is not None and sort_field not in fields:
+                doc.pop(sort_field, None)
+        if self.model is None:
+            return docs
+        return conform_documents(self.model, docs, fields)
+
+    def shape(self, doc: dict, fields: Optional[set], sort_field: str) -> dict:
+        return self.shape_many([doc], fields, sort_field)[0]
+
+
+# --- Curseurs ---
+def encode_cursor(value: Any, oid: ObjectId) -> str:
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    raw = orjson.dumps([value, str(oid)])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Any, ObjectId]:
+    try:
+        value, oid = orjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if isinstance(value, dict) and "$date" in value:
+            value = datetime.fromisoformat(value["$date"])
+        return value, ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+
+
+# Ordre de tri MongoDB entre types, après null/absent. $lt/$gt ne comparent qu'au sein d'un même
+# type: un champ de types mixtes (ex: createdAt str et Date) demande des branches par type.
+BSON_SORT_TYPES = ("number", "string", "object", "array", "binData", "objectId", "bool", "date", "timestamp", "regex")
+
+
+def _bson_sort_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    raise HTTPException(status_code=400, detail="Curseur invalide")
+
+
+def keyset_query(sort_field: str, direction: int, value: Any, oid: ObjectId) -> dict:
+    """Documents situés strictement après (value, oid) dans l'ordre (sort_field, _id), tous types BSON confondus"""
+    op = "$gt" if direction == ASCENDING else "$lt"
+    if sort_field == "_id":
+        return {"_id": {op: oid}}
+    tie = {sort_field: value, "_id": {op: oid}}
+    if value is None:
+        # null est la plus petite valeur: en ordre croissant tout le reste suit, en décroissant rien
+        return {"$or": [{sort_field: {"$ne": None}}, tie]} if direction == ASCENDING else tie
+    rank = BSON_SORT_TYPES.index(_bson_sort_type(value))
+    branches = [{sort_field: {op: value}}, tie]
+    if direction == ASCENDING:
+        if rank + 1 < len(BSON_SORT_TYPES):
+            branches.append({sort_field: {"$type": list(BSON_SORT_TYPES[rank + 1:])}})
+    else:
+        # Types inférieurs, puis null et champ absent, en fin d'ordre décroissant
+        if rank:
+            branches.append({sort_field: {"$type": list(BSON_SORT_TYPES[:rank])}})
+        branches.append({sort_field: None})
+    return {"$or": branches}
+
+
+async def _stream_array(cursor, spec: ListSpec, fields: Optional[set], sort_field: str):
+    yield b"["
+    first = True
+    batch: List[dict] = []
+
+    async def flush():
+        if spec.transform:
+            await spec.transform(batch, fields)
+        return orjson.dumps(spec.shape_many(batch, fields, sort_field))[1:-1]
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            chunk = await flush()
+            yield chunk if first else b"," + chunk
+            first = False
+            batch = []
+    if batch:
+        chunk = await flush()
+        yield chunk if first else b"," + chunk
+    yield b"]"
+
+
+async def list_response(
+    spec: ListSpec, collection, params, headers: Optional[dict] = None, query: Optional[dict] = None
+):
+    """Réponse d'une route de liste à partir des query params de la requête (query: filtre imposé par la route)"""
+    fields = spec.requested_fields(params.get("fields"))
+    sort_field, direction = spec.sort(params.get("sort"))
+    query = {**spec.query(params), **(query or {})}
+    projection = spec.projection(fields, sort_field)
+    order = [(sort_field, direction)] if sort_field == "_id" else [(sort_field, direction), ("_id", direction)]
+
+    limit, cursor = params.get("limit"), params.get("cursor")
+    if limit is None and cursor is None:
+        documents = collection.find(query, projection).sort(order).batch_size(STREAM_BATCH_SIZE)
+        return StreamingResponse(
+            _stream_array(documents, spec, fields, sort_field), media_type="application/json", headers=headers
+        )
+
+    try:
+        limit = max(1, min(int(limit or 100), MAX_PAGE_SIZE))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"limit invalide: {limit}")
+    if cursor:
+        query = {"$and": [query, keyset_query(sort_field, direction, *decode_cursor(cursor))]}
+    docs = await collection.find(query, projection).sort(order).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1].get(sort_field), docs[-1]["_id"])
+    if spec.transform:
+        await spec.transform(docs, fields)
+    return ORJSONResponse(
+        {
+            "data": spec.shape_many(docs, fields, sort_field),
+            "pagination": {"limit": limit, "nextCursor": next_cursor}
+        },
+        headers=headers
+    )
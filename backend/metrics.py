@@ -0,0 +1,249 @@
+"""
+Métriques Prometheus intégrées (sans dépendance externe).
+
+- MetricsMiddleware (ASGI pur): latence par route (histogramme), statuts HTTP,
+  messages WebSocket entrants/sortants et connexions actives par route.
+- MongoCommandListener (pymongo): nombre et durée des commandes MongoDB, au global
+  et rattachés à la requête HTTP en cours via un contextvar (Motor copie le contexte
+  vers ses threads d'exécution).
+- MetricsRegistry.render(): format texte Prometheus pour /metrics.
+
+Les labels de route sont les chemins déclarés ("/api/courses/{course_id}"), pas les URLs
+réelles: la cardinalité reste bornée par le nombre de routes.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    """Compteurs de la requête en cours (objet mutable partagé par les contextes copiés)"""
+    __slots__ = ("mongo_durations",)
+
+    def __init__(self):
+        # list.append est atomique: sûr depuis les threads d'exécution de Motor
+        self.mongo_durations: List[float] = []
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "afroboost"):
+        self.prefix = prefix
+        self.started_at = time.time()
+        # HTTP (mis à jour sur la boucle asyncio uniquement)
+        self.http_latency: Dict[tuple, Histogram] = {}
+        self.http_status: Dict[tuple, int] = {}
+        self.http_mongo_calls: Dict[tuple, int] = {}
+        self.http_mongo_seconds: Dict[tuple, float] = {}
+        # WebSocket
+        self.ws_messages: Dict[tuple, int] = {}
+        self.ws_active: Dict[str, int] = {}
+        # MongoDB (mis à jour depuis les threads de Motor)
+        self._mongo_lock = threading.Lock()
+        self.mongo_commands: Dict[str, List[float]] = {}  # commande -> [appels, secondes, échecs]
+
+    # --- Enregistrement ---
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        histogram = self.http_latency.get(key)
+        if histogram is None:
+            histogram = self.http_latency[key] = Histogram()
+        histogram.observe(seconds)
+        status_key = (method, route, status)
+        self.http_status[status_key] = self.http_status.get(status_key, 0) + 1
+        if stats.mongo_durations:
+            self.http_mongo_calls[key] = self.http_mongo_calls.get(key, 0) + len(stats.mongo_durations)
+            self.http_mongo_seconds[key] = self.http_mongo_seconds.get(key, 0.0) + sum(stats.mongo_durations)
+
+    def observe_mongo(self, command: str, seconds: float, failed: bool):
+        with self._mongo_lock:
+            entry = self.mongo_commands.get(command)
+            if entry is None:
+                entry = self.mongo_commands[command] = [0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            if failed:
+                entry[2] += 1
+        stats = _current_request.get()
+        if stats is not None:
+            stats.mongo_durations.append(seconds)
+
+    def observe_ws_message(self, route: str, direction: str):
+        key = (route, direction)
+        self.ws_messages[key] = self.ws_messages.get(key, 0) + 1
+
+    def ws_connected(self, route: str, delta: int):
+        self.ws_active[route] = self.ws_active.get(route, 0) + delta
+
+    # --- Exposition ---
+    def render(self) -> str:
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_process_start_time_seconds Start time of the process since unix epoch.",
+            f"# TYPE {p}_process_start_time_seconds gauge",
+            f"{p}_process_start_time_seconds {self.started_at:.3f}",
+            f"# HELP {p}_http_request_duration_seconds HTTP request latency by route.",
+            f"# TYPE {p}_http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.http_latency.items()):
+            for bound, total in histogram.cumulative():
+                lines.append(f"{p}_http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {total}")
+            lines.append(f"{p}_http_request_duration_seconds_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.count}")
+            lines.append(f"{p}_http_request_duration_seconds_sum{_labels(method=method, route=route)} {histogram.sum:.6f}")
+            lines.append(f"{p}_http_request_duration_seconds_count{_labels(method=method, route=route)} {histogram.count}")
+
+        lines += [f"# HELP {p}_http_responses_total HTTP responses by route and status.",
+                  f"# TYPE {p}_http_responses_total counter"]
+        for (method, route, status), count in sorted(self.http_status.items()):
+            lines.append(f"{p}_http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+
+        lines += [f"# HELP {p}_http_mongo_commands_total MongoDB commands issued while serving a route.",
+                  f"# TYPE {p}_http_mongo_commands_total counter"]
+        for (method, route), count in sorted(self.http_mongo_calls.items()):
+            lines.append(f"{p}_http_mongo_commands_total{_labels(method=method, route=route)} {count}")
+        lines += [f"# HELP {p}_http_mongo_seconds_total MongoDB time spent while serving a route.",
+                  f"# TYPE {p}_http_mongo_seconds_total counter"]
+        for (method, route), seconds in sorted(self.http_mongo_seconds.items()):
+            lines.append(f"{p}_http_mongo_seconds_total{_labels(method=method, route=route)} {seconds:.6f}")
+
+        with self._mongo_lock:
+            mongo = sorted((command, list(entry)) for command, entry in self.mongo_commands.items())
+        lines += [f"# HELP {p}_mongo_commands_total MongoDB commands by name.",
+                  f"# TYPE {p}_mongo_commands_total counter"]
+        lines += [f"{p}_mongo_commands_total{_labels(command=c)} {e[0]}" for c, e in mongo]
+        lines += [f"# HELP {p}_mongo_command_seconds_total MongoDB command time by name.",
+                  f"# TYPE {p}_mongo_command_seconds_total counter"]
+        lines += [f"{p}_mongo_command_seconds_total{_labels(command=c)} {e[1]:.6f}" for c, e in mongo]
+        lines += [f"# HELP {p}_mongo_command_failures_total Failed MongoDB commands by name.",
+                  f"# TYPE {p}_mongo_command_failures_total counter"]
+        lines += [f"{p}_mongo_command_failures_total{_labels(command=c)} {e[2]}" for c, e in mongo]
+
+        lines += [f"# HELP {p}_websocket_messages_total WebSocket messages by route and direction.",
+                  f"# TYPE {p}_websocket_messages_total counter"]
+        for (route, direction), count in sorted(self.ws_messages.items()):
+            lines.append(f"{p}_websocket_messages_total{_labels(route=route, direction=direction)} {count}")
+        lines += [f"# HELP {p}_websocket_connections Open WebSocket connections by route.",
+                  f"# TYPE {p}_websocket_connections gauge"]
+        for route, count in sorted(self.ws_active.items()):
+            lines.append(f"{p}_websocket_connections{_labels(route=route)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """À passer dans event_listeners du client Motor"""
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.registry.observe_mongo(event.command_name, event.duration_micros / 1e6, failed=False)
+
+    def failed(self, event):
+        self.registry.observe_mongo(event.command_name, event.duration_micros / 1e6, failed=True)
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Middleware ASGI pur (pas de BaseHTTPMiddleware: ni tâche ni copie du corps par requête)"""
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _http(self, scope, receive, send):
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            self.registry.observe_request(
+                scope["method"], _route_of(scope), status, time.perf_counter() - started, stats
+            )
+
+    async def _websocket(self, scope, receive, send):
+        registry = self.registry
+        accepted = False
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "websocket.receive":
+                registry.observe_ws_message(_route_of(scope), "in")
+            return message
+
+        async def send_wrapper(message):
+            nonlocal accepted
+            if message["type"] == "websocket.send":
+                registry.observe_ws_message(_route_of(scope), "out")
+            elif message["type"] == "websocket.accept" and not accepted:
+                accepted = True
+                registry.ws_connected(_route_of(scope), 1)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if accepted:
+                registry.ws_connected(_route_of(scope), -1)
@@ -0,0 +1,133 @@
+"""
+Recherche d'offres côté serveur (index inversé en mémoire).
+
+- Normalisation française: minuscules, accents retirés (NFD), ponctuation et élisions
+  ("l'abonnement" -> "abonnement") séparées, mots vides ignorés.
+- Index inversé token -> {offre: poids} sur name (x3), keywords (x2) et description (x1).
+- Requête: tous les mots doivent correspondre (mot exact, préfixe ou synonyme),
+  score = somme des poids (préfixe et synonyme pondérés moins qu'un mot exact).
+- Reconstruit entièrement à partir de la collection offers quand sa version change:
+  quelques centaines d'offres, reconstruction en quelques millisecondes.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+FIELD_WEIGHTS = (("name", 3.0), ("keywords", 2.0), ("description", 1.0))
+PREFIX_FACTOR = 0.5
+SYNONYM_FACTOR = 0.6
+
+STOPWORDS = {
+    "a", "au", "aux", "de", "des", "du", "en", "et", "la", "le", "les", "l", "d",
+    "un", "une", "pour", "par", "sur", "avec", "the", "and", "of"
+}
+
+# Mêmes synonymes que la recherche locale de la page de réservation (App.js)
+SYNONYMS = {
+    "session": ["seance", "cours", "class"],
+    "seance": ["session", "cours", "class"],
+    "abonnement": ["abo", "forfait", "pack"],
+    "abo": ["abonnement", "forfait", "pack"],
+    "cardio": ["fitness", "sport", "entrainement"],
+    "afrobeat": ["afro", "danse", "dance"],
+    "produit": ["article", "shop", "boutique"],
+    "tshirt": ["tee", "haut"],
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents ni ponctuation ("T-shirt Été" -> "t shirt ete")"""
+    decomposed = unicodedata.normalize("NFD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", stripped.lower()).strip()
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """
+    Mots indexables. "T-shirt" donne "t" + "shirt": la forme collée "tshirt" est ajoutée
+    à l'index, et remplace les deux morceaux dans une requête.
+    """
+    words = fold(text).split()
+    joined = [a + b for a, b in zip(words, words[1:]) if len(a) == 1 and a not in STOPWORDS]
+    if query and joined:
+        parts = {w for a, b in zip(words, words[1:]) if a + b in joined for w in (a, b)}
+        words = [w for w in words if w not in parts]
+    return [w for w in words if w not in STOPWORDS] + joined
+
+
+class OfferSearchIndex:
+    def __init__(self):
+        self.version = None
+        self.offers: List[dict] = []
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.vocabulary: List[str] = []  # trié, pour la recherche par préfixe (bisect)
+
+    def build(self, offers: List[dict], version=None):
+        postings: Dict[str, Dict[int, float]] = {}
+        for position, offer in enumerate(offers):
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(offer.get(field) or ""):
+                    entry = postings.setdefault(token, {})
+                    entry[position] = entry.get(position, 0.0) + weight
+        self.offers = offers
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+        self.version = version
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocabulary, prefix)
+        matches = []
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            if token != prefix:
+                matches.append(token)
+        return matches
+
+    def _term_scores(self, term: str) -> Dict[int, float]:
+        """Offres correspondant à un mot de la requête: exact, préfixe puis synonymes"""
+        scores: Dict[int, float] = dict(self.postings.get(term, {}))
+        for token in self._prefixed(term):
+            for position, weight in self.postings[token].items():
+                scores[position] = max(scores.get(position, 0.0), weight * PREFIX_FACTOR)
+        for synonym in SYNONYMS.get(term, ()):
+            for position, weight in self.postings.get(synonym, {}).items():
+                scores[position] = max(scores.get(position, 0.0), weight * SYNONYM_FACTOR)
+        return scores
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        is_product: Optional[bool] = None,
+        page: int = 1,
+        limit: int = 20
+    ) -> Tuple[int, List[dict]]:
+        """(nombre total de résultats, page demandée) triés par pertinence puis par nom"""
+        terms = [t for t in tokenize(query, query=True) if len(t) > 1] or tokenize(query, query=True)
+        if terms:
+            scores = self._term_scores(terms[0])
+            for term in terms[1:]:
+                if not scores:
+                    break
+                term_scores = self._term_scores(term)
+                scores = {p: s + term_scores[p] for p, s in scores.items() if p in term_scores}
+        else:
+            scores = {position: 0.0 for position in range(len(self.offers))}
+
+        wanted_category = fold(category) if category else None
+        ranked = []
+        for position, score in scores.items():
+            offer = self.offers[position]
+            if wanted_category and fold(offer.get("category") or "") != wanted_category:
+                continue
+            if is_product is not None and bool(offer.get("isProduct")) != is_product:
+                continue
+            ranked.append((-score, fold(offer.get("name") or ""), position))
+        ranked.sort()
+
+        start = (max(page, 1) - 1) * limit
+        return len(ranked), [self.offers[position] for _, _, position in ranked[start:start + limit]]
@@ -0,0 +1,132 @@
+"""
+Couche HTTP sortante partagée (OAuth, Stripe, LLM, canaux de campagne).
+
+Un seul httpx.AsyncClient par processus, ouvert et fermé par le cycle de vie de
+l'application: connexions keep-alive réutilisées (pas de DNS+TLS à chaque appel),
+limite de connexions simultanées par hôte, timeouts et retry avec backoff.
+"""
+import asyncio
+import logging
+import os
+import random
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Méthodes rejouables sans risque de double effet
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class OutboundHTTP:
+    """
+    Client HTTP sortant mutualisé.
+    - max_connections / max_keepalive: taille du pool httpx
+    - max_per_host: requêtes simultanées max vers un même hôte
+    - retries / backoff: nouvelles tentatives (erreurs réseau et 429/502/503/504)
+    """
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        max_per_host: int = 20,
+        timeout: float = 15.0,
+        connect_timeout: float = 5.0,
+        retries: int = 2,
+        backoff: float = 0.3
+    ):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_env(cls) -> "OutboundHTTP":
+        return cls(
+            max_connections=int(os.environ.get("OUTBOUND_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive=int(os.environ.get("OUTBOUND_HTTP_MAX_KEEPALIVE", "20")),
+            max_per_host=int(os.environ.get("OUTBOUND_HTTP_MAX_PER_HOST", "20")),
+            timeout=float(os.environ.get("OUTBOUND_HTTP_TIMEOUT", "15")),
+            connect_timeout=float(os.environ.get("OUTBOUND_HTTP_CONNECT_TIMEOUT", "5")),
+            retries=int(os.environ.get("OUTBOUND_HTTP_RETRIES", "2")),
+            backoff=float(os.environ.get("OUTBOUND_HTTP_BACKOFF", "0.3"))
+        )
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Client httpx partagé (ouvert à la demande si le lifespan n'a pas encore tourné)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    def _semaphore_for(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return semaphore
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), 30.0)
+        # Backoff exponentiel avec jitter
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        retries: Optional[int] = None,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Exécute une requête avec le client partagé.
+        Les méthodes non idempotentes (POST...) ne sont rejouées que si retries est passé explicitement.
+        """
+        method = method.upper()
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        retry_statuses = set(retry_statuses)
+
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore_for(url):
+                    response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= retries:
+                    raise
+                delay = self._delay(attempt)
+                logger.warning(f"[HTTP] {method} {url} erreur réseau ({e!r}), nouvel essai dans {delay:.2f}s")
+            else:
+                if response.status_code not in retry_statuses or attempt >= retries:
+                    return response
+                delay = self._delay(attempt, response)
+                logger.warning(f"[HTTP] {method} {url} -> {response.status_code}, nouvel essai dans {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
@@ -1,8 +1,13 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, Depends
+from fastapi.responses import JSONResponse, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, ASCENDING
+from pymongo.errors import BulkWriteError, OperationFailure, DuplicateKeyError
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from bson.codec_options import CodecOptions
 import os
 import logging
 from pathlib import Path
@@ -10,8 +15,22 @@ from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Set
 import uuid
 from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
 import asyncio
 import json
+import orjson
+import socket
+import time
+import hashlib
+from contextlib import asynccontextmanager
+from pymongo import UpdateOne, DeleteMany
+
+from outbound_http import OutboundHTTP
+from offer_search import OfferSearchIndex
+from list_api import ListSpec, conform_documents, list_response, list_response_model
+from metrics import MetricsRegistry, MetricsMiddleware, MongoCommandListener
+from auth_cache import PrincipalCache
+from campaign_dispatch import ChannelAdapter, ChannelAdapterPool, format_phone_e164, personalize_message
 
 # Stripe Checkout Integration
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
@@ -24,34 +43,174 @@ mongo_url = os.environ.get('MONGO_URL')
 if not mongo_url:
     raise RuntimeError("MONGO_URL environment variable is required")
 
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'afroboost_db')]
+# Métriques Prometheus (latence par route, appels MongoDB par requête, messages WebSocket)
+metrics = MetricsRegistry()
+
+# Pool de connexions réglable par environnement. Motor se connecte paresseusement:
+# le pool est préchauffé par le lifespan avant que l'application ne soit déclarée prête.
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "300000"))
+
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    event_listeners=[MongoCommandListener(metrics)]
+)
+DB_NAME = os.environ.get('DB_NAME', 'afroboost_db')
+# Les dates sont stockées en BSON Date et relues en datetime UTC "aware" (pas de parsing par ligne)
+DB_CODEC_OPTIONS = CodecOptions(tz_aware=True, tzinfo=timezone.utc)
+
+# Handle principal: lectures sur le primaire (paiements, validations, campagnes en cours d'envoi,
+# configuration, tout ce qui suit une écriture)
+db = client.get_database(DB_NAME, codec_options=DB_CODEC_OPTIONS)
+
+# Handle "analytics" pour les lectures lourdes (rapports, exports, dashboards) qui tolèrent
+# un léger retard: routées vers un secondaire du replica set pour soulager le primaire.
+# Sur un serveur standalone, secondaryPreferred lit simplement le primaire.
+ANALYTICS_READ_PREFERENCE = os.environ.get("ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+ANALYTICS_MAX_STALENESS_SECONDS = int(os.environ.get("ANALYTICS_MAX_STALENESS_SECONDS", "120"))  # -1 = illimité, sinon >= 90
+
+def _read_preference(mode: str, max_staleness: int = -1):
+    modes = {
+        "primaryPreferred": PrimaryPreferred,
+        "secondary": Secondary,
+        "secondaryPreferred": SecondaryPreferred,
+        "nearest": Nearest
+    }
+    if mode == "primary":
+        return Primary()
+    if mode not in modes:
+        raise RuntimeError(f"Read preference inconnue: {mode}")
+    return modes[mode](max_staleness=max_staleness)
+
+db_analytics = client.get_database(
+    DB_NAME,
+    codec_options=DB_CODEC_OPTIONS,
+    read_preference=_read_preference(ANALYTICS_READ_PREFERENCE, ANALYTICS_MAX_STALENESS_SECONDS)
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Cycle de vie: ressources ouvertes avant de servir le trafic, fermées à l'arrêt"""
+    await startup_tasks()
+    try:
+        yield
+    finally:
+        await shutdown_db_client()
 
-app = FastAPI(title="Afroboost API")
+# orjson pour toutes les réponses (datetime natif, ~5-10x plus rapide que json stdlib)
+app = FastAPI(title="Afroboost API", default_response_class=ORJSONResponse, lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Client HTTP sortant partagé (OAuth, Stripe, LLM, campagnes) - ouvert/fermé au démarrage/arrêt
+outbound_http = OutboundHTTP.from_env()
+
 # ==================== HEALTH CHECK (Required for Kubernetes) ====================
+# Le ping MongoDB tourne en tâche de fond toutes les HEALTH_PROBE_INTERVAL secondes;
+# les sondes Kubernetes lisent le dernier résultat sans toucher à la base.
+
+HEALTH_PROBE_INTERVAL = float(os.environ.get("HEALTH_PROBE_INTERVAL", "10"))
+MONGO_WARMUP_TIMEOUT = float(os.environ.get("MONGO_WARMUP_TIMEOUT", "60"))
+
+class DatabaseHealth:
+    """Sonde MongoDB en arrière-plan + état de disponibilité (readiness) de l'application"""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.ready = False  # True une fois le lifespan démarré, False pendant l'arrêt
+        self.connected = False
+        self.latency_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None  # time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+    
+    async def probe(self) -> bool:
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), timeout=MONGO_SERVER_SELECTION_TIMEOUT_MS / 1000)
+            self.connected, self.error = True, None
+            self.latency_ms = round((time.monotonic() - started) * 1000, 1)
+        except Exception as e:
+            if self.connected:
+                logger.error(f"[Health] MongoDB injoignable: {e}")
+            self.connected, self.error, self.latency_ms = False, str(e), None
+        self.checked_at = time.monotonic()
+        return self.connected
+    
+    async def warm_up(self):
+        """Attend MongoDB puis ouvre minPoolSize connexions avant de servir le trafic"""
+        deadline = time.monotonic() + MONGO_WARMUP_TIMEOUT
+        while not await self.probe():
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"MongoDB indisponible après {MONGO_WARMUP_TIMEOUT:.0f}s: {self.error}")
+            await asyncio.sleep(1)
+        # Pings concurrents: chacun emprunte une connexion distincte du pool
+        await asyncio.gather(*[client.admin.command("ping") for _ in range(MONGO_MIN_POOL_SIZE)])
+        logger.info(f"[Health] Pool MongoDB préchauffé ({MONGO_MIN_POOL_SIZE} connexions, ping {self.latency_ms}ms)")
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe()
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        self.ready = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def snapshot(self) -> tuple:
+        """(code HTTP, corps) pour /health"""
+        age = time.monotonic() - self.checked_at if self.checked_at else None
+        stale = age is None or age > self.interval * 3
+        body = {
+            "status": "healthy",
+            "database": "connected" if self.connected else "disconnected",
+            "ready": self.ready,
+            "latency_ms": self.latency_ms,
+            "checked_seconds_ago": round(age, 1) if age is not None else None
+        }
+        if not self.ready:
+            body["status"] = "starting"
+            return 503, body
+        if not self.connected or stale:
+            body["status"] = "unhealthy"
+            body["error"] = self.error or "probe stale"
+            return 503, body
+        return 200, body
+
+database_health = DatabaseHealth(HEALTH_PROBE_INTERVAL)
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for Kubernetes liveness/readiness probes"""
-    try:
-        # Test MongoDB connection
-        await client.admin.command('ping')
-        return JSONResponse(
-            status_code=200,
-            content={"status": "healthy", "database": "connected"}
-        )
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return JSONResponse(
-            status_code=503,
-            content={"status": "unhealthy", "database": "disconnected", "error": str(e)}
-        )
+    """Health check endpoint for Kubernetes liveness/readiness probes (résultat en cache)"""
+    status_code, body = database_health.snapshot()
+    return JSONResponse(status_code=status_code, content=body)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Exposition Prometheus (scrapée directement sur le pod)"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/api/health")
 async def api_health_check():
@@ -521,6 +680,7 @@ class Course(BaseModel):
     archived: bool = False  # Archive au lieu de supprimer
     playlist: Optional[List[str]] = None  # Liste des URLs audio pour ce cours
     authorEmail: Optional[str] = None  # Email du coach propriétaire (None = tous les coachs)
+    capacity: int = -1  # Casques disponibles par séance (-1 = illimité)
 
 class CourseCreate(BaseModel):
     name: str
@@ -532,6 +692,7 @@ class CourseCreate(BaseModel):
     archived: bool = False
     playlist: Optional[List[str]] = None  # Liste des URLs audio
     authorEmail: Optional[str] = None  # Email du coach propriétaire
+    capacity: int = -1  # Casques disponibles par séance (-1 = illimité)
 
 class Offer(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -584,6 +745,9 @@ class UserCreate(BaseModel):
     email: str
     whatsapp: Optional[str] = ""
 
+class UsersBulkUpsert(BaseModel):
+    users: List[UserCreate]
+
 class Reservation(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -607,7 +771,7 @@ class Reservation(BaseModel):
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     # E-commerce / Shipping fields
     validated: bool = False
-    validatedAt: Optional[str] = None
+    validatedAt: Optional[datetime] = None
     selectedVariants: Optional[dict] = None  # { size: "M", color: "Noir" }
     variantsText: Optional[str] = None  # "Taille: M, Couleur: Noir"
     shippingAddress: Optional[str] = None  # Adresse de livraison
@@ -694,7 +858,7 @@ class CampaignResult(BaseModel):
     contactPhone: Optional[str] = ""
     channel: str  # "whatsapp", "email", "instagram"
     status: str = "pending"  # "pending", "sent", "failed"
-    sentAt: Optional[str] = None
+    sentAt: Optional[datetime] = None
 
 class Campaign(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -706,11 +870,17 @@ class Campaign(BaseModel):
     targetType: str = "all"  # "all" or "selected"
     selectedContacts: List[str] = []
     channels: dict = Field(default_factory=lambda: {"whatsapp": True, "email": False, "instagram": False})
-    scheduledAt: Optional[str] = None  # ISO date or null for immediate
-    status: str = "draft"  # "draft", "scheduled", "sending", "completed"
-    results: List[dict] = []
-    createdAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
-    updatedAt: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    scheduledAt: Optional[datetime] = None  # Date d'envoi programmé (UTC) ou null pour immédiat
+    status: str = "draft"  # "draft", "scheduled", "launching", "sending", "completed", "missed"
+    results: List[dict] = []  # Hydraté depuis la collection campaign_results (non stocké dans la campagne)
+    # Compteurs maintenus par $inc (détection de fin de campagne en O(1))
+    resultsTotal: int = 0
+    resultsPending: int = 0
+    resultsSent: int = 0
+    resultsFailed: int = 0
+    launchProgress: Optional[dict] = None  # {processed, lastContactId, done, heartbeatAt} pendant le lancement
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updatedAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class CampaignCreate(BaseModel):
     name: str
@@ -862,7 +1032,7 @@ class Lead(BaseModel):
     firstName: str
     whatsapp: str
     email: str
-    createdAt: str = ""
+    createdAt: Optional[datetime] = None
     source: str = "widget_ia"
 
 class ChatMessage(BaseModel):
@@ -876,24 +1046,155 @@ class ChatMessage(BaseModel):
 async def root():
     return {"message": "Afroboost API"}
 
+# ==================== SÉRIALISATION RAPIDE DES LISTES ====================
+# Les listes ne passent plus par response_model + jsonable_encoder: les documents sont mis en
+# forme par list_api.conform_documents (projection et valeurs par défaut du modèle calculées une
+# fois, sans validation par requête) puis sérialisés avec orjson. Voir aussi list_api.ListSpec.
+
+# ==================== REQUÊTES CONDITIONNELLES (ETag / If-None-Match) ====================
+# Chaque collection du catalogue a un compteur de version (collection_versions), incrémenté
+# par toutes les routes d'écriture. L'ETag en dérive: une revalidation coûte une lecture par _id
+# et renvoie 304 sans corps si rien n'a changé.
+
+CATALOG_CACHE_MAX_AGE = int(os.environ.get("CATALOG_CACHE_MAX_AGE", "0"))
+
+async def _bump_collection_version(name: str):
+    """À appeler après chaque écriture sur une collection du catalogue"""
+    await db.collection_versions.update_one(
+        {"_id": name},
+        {"$inc": {"v": 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+        upsert=True
+    )
+
+async def _collection_version(name: str) -> dict:
+    version = await db.collection_versions.find_one({"_id": name})
+    if not version:
+        # L'epoch distingue deux bases (ou une base réinitialisée) au même numéro de version
+        version = await db.collection_versions.find_one_and_update(
+            {"_id": name},
+            {"$setOnInsert": {"v": 0, "epoch": uuid.uuid4().hex[:8]}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    return version
+
+async def _collection_versions(names: List[str]) -> Dict[str, dict]:
+    """Versions de plusieurs collections en une requête"""
+    found = {v["_id"]: v async for v in db.collection_versions.find({"_id": {"$in": list(names)}})}
+    for name in names:
+        if name not in found:
+            found[name] = await _collection_version(name)
+    return found
+
+async def _collection_etag(name: str) -> str:
+    """ETag faible: le contenu est identique, mais GZipMiddleware peut changer l'encodage des octets"""
+    version = await _collection_version(name)
+    return f'W/"{name}-{version["epoch"]}-{version["v"]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Comparaison faible (RFC 9110), seule valable pour If-None-Match
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+async def _catalog_validators(request: Request, name: str) -> tuple:
+    """
+    Retourne (headers, réponse 304 ou None).
+    Les headers (ETag + Cache-Control) sont à poser sur la réponse 200.
+    """
+    etag = await _collection_etag(name)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}, must-revalidate"
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return headers, Response(status_code=304, headers=headers)
+    return headers, None
+
+# ==================== BOOTSTRAP PUBLIC (page de réservation) ====================
+# Un seul appel au premier affichage au lieu de six: cours et offres visibles, concept et
+# partie publique des liens de paiement. Aucune donnée client ni code promo.
+# Le corps est pré-rendu (orjson) et gardé en mémoire tant que les versions ne changent pas.
+
+PUBLIC_BOOTSTRAP_COLLECTIONS = ["courses", "offers", "concept", "payment_links"]
+PUBLIC_PAYMENT_LINK_FIELDS = ["stripe", "paypal", "twint", "coachWhatsapp"]
+PRIVATE_CATALOG_FIELDS = {"authorEmail"}  # Email du coach propriétaire: usage interne
+
+_public_bootstrap_snapshot = {"etag": None, "body": None}
+_public_bootstrap_lock = asyncio.Lock()
+
+def _public_fields(model) -> set:
+    return {name for name in model.model_fields if name not in PRIVATE_CATALOG_FIELDS}
+
+def _public_projection(model) -> dict:
+    return {"_id": 0, **{name: 1 for name in _public_fields(model)}}
+
+async def _build_public_bootstrap() -> bytes:
+    visible = {"visible": {"$ne": False}}
+    courses, offers, concept, links = await asyncio.gather(
+        db.courses.find({**visible, "archived": {"$ne": True}}, _public_projection(Course)).to_list(None),
+        db.offers.find(visible, _public_projection(Offer)).to_list(None),
+        db.concept.find_one({"id": "concept"}, {"_id": 0}),
+        db.payment_links.find_one({"id": "payment_links"}, {"_id": 0, **{f: 1 for f in PUBLIC_PAYMENT_LINK_FIELDS}})
+    )
+    links = {**{f: "" for f in PUBLIC_PAYMENT_LINK_FIELDS}, **(links or {})}
+    return orjson.dumps({
+        "courses": conform_documents(Course, courses, _public_fields(Course)),
+        "offers": conform_documents(Offer, offers, _public_fields(Offer)),
+        "concept": {**Concept().model_dump(), **(concept or {})},
+        "paymentLinks": links
+    })
+
+@api_router.get("/public/bootstrap")
+async def get_public_bootstrap(request: Request):
+    """Données publiques de la page de réservation (ETag = versions des collections sources)"""
+    versions = await _collection_versions(PUBLIC_BOOTSTRAP_COLLECTIONS)
+    version_key = "|".join(f'{n}-{versions[n]["epoch"]}-{versions[n]["v"]}' for n in PUBLIC_BOOTSTRAP_COLLECTIONS)
+    etag = f'W/"bootstrap-{hashlib.sha1(version_key.encode()).hexdigest()[:16]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}, must-revalidate"
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    if _public_bootstrap_snapshot["etag"] != etag:
+        async with _public_bootstrap_lock:
+            # Une seule reconstruction même si plusieurs visiteurs arrivent après une modification
+            if _public_bootstrap_snapshot["etag"] != etag:
+                body = await _build_public_bootstrap()
+                _public_bootstrap_snapshot.update(etag=etag, body=body)
+    return Response(content=_public_bootstrap_snapshot["body"], media_type="application/json", headers=headers)
+
 # --- Courses ---
-@api_router.get("/courses", response_model=List[Course])
-async def get_courses():
-    courses = await db.courses.find({}, {"_id": 0}).to_list(100)
-    if not courses:
-        # Insert default courses
-        default_courses = [
-            {"id": str(uuid.uuid4()), "name": "Afroboost Silent – Session Cardio", "weekday": 3, "time": "18:30", "locationName": "Rue des Vallangines 97, Neuchâtel", "mapsUrl": ""},
-            {"id": str(uuid.uuid4()), "name": "Afroboost Silent – Sunday Vibes", "weekday": 0, "time": "18:30", "locationName": "Rue des Vallangines 97, Neuchâtel", "mapsUrl": ""}
-        ]
-        await db.courses.insert_many(default_courses)
-        return default_courses
-    return courses
+# Cours par défaut, insérés au démarrage (_seed_default_data) sur une base vierge.
+# Ids fixes: deux workers qui démarrent ensemble ne peuvent pas les dupliquer.
+DEFAULT_COURSES = [
+    {"id": "default-course-cardio", "name": "Afroboost Silent – Session Cardio", "weekday": 3, "time": "18:30", "locationName": "Rue des Vallangines 97, Neuchâtel", "mapsUrl": ""},
+    {"id": "default-course-sunday", "name": "Afroboost Silent – Sunday Vibes", "weekday": 0, "time": "18:30", "locationName": "Rue des Vallangines 97, Neuchâtel", "mapsUrl": ""}
+]
+
+COURSES_LIST = ListSpec(
+    Course, filters={"weekday": int, "visible": bool, "archived": bool, "authorEmail": str},
+    sorts=("name", "weekday", "time")
+)
+
+@api_router.get("/courses", response_model=list_response_model(Course))
+async def get_courses(request: Request):
+    """Liste des cours (liste complète, ou paginée avec limit/cursor; fields, filtres et sort: voir list_api)"""
+    headers, not_modified = await _catalog_validators(request, "courses")
+    if not_modified:
+        return not_modified
+    return await list_response(COURSES_LIST, db.courses, request.query_params, headers)
 
 @api_router.post("/courses", response_model=Course)
 async def create_course(course: CourseCreate):
     course_obj = Course(**course.model_dump())
     await db.courses.insert_one(course_obj.model_dump())
+    await _bump_collection_version("courses")
     return course_obj
 
 @api_router.put("/courses/{course_id}", response_model=Course)
@@ -908,6 +1209,9 @@ async def update_course(course_id: str, course_update: dict):
     update_data = {k: v for k, v in course_update.items() if v is not None}
     
     await db.courses.update_one({"id": course_id}, {"$set": update_data})
+    await _bump_collection_version("courses")
+    if "capacity" in update_data:
+        await _sync_occurrence_capacity(course_id, int(update_data["capacity"]))
     updated = await db.courses.find_one({"id": course_id}, {"_id": 0})
     return updated
 
@@ -915,37 +1219,89 @@ async def update_course(course_id: str, course_update: dict):
 async def archive_course(course_id: str):
     """Archive a course instead of deleting it"""
     await db.courses.update_one({"id": course_id}, {"$set": {"archived": True}})
+    await _bump_collection_version("courses")
     updated = await db.courses.find_one({"id": course_id}, {"_id": 0})
     return {"success": True, "course": updated}
 
 @api_router.delete("/courses/{course_id}")
 async def delete_course(course_id: str):
     await db.courses.delete_one({"id": course_id})
+    await _bump_collection_version("courses")
     return {"success": True}
 
 # --- Offers ---
-@api_router.get("/offers", response_model=List[Offer])
-async def get_offers():
-    offers = await db.offers.find({}, {"_id": 0}).to_list(100)
-    if not offers:
-        default_offers = [
-            {"id": str(uuid.uuid4()), "name": "Cours à l'unité", "price": 30, "thumbnail": "", "videoUrl": "", "description": "", "visible": True},
-            {"id": str(uuid.uuid4()), "name": "Carte 10 cours", "price": 150, "thumbnail": "", "videoUrl": "", "description": "", "visible": True},
-            {"id": str(uuid.uuid4()), "name": "Abonnement 1 mois", "price": 109, "thumbnail": "", "videoUrl": "", "description": "", "visible": True}
-        ]
-        await db.offers.insert_many(default_offers)
-        return default_offers
-    return offers
+DEFAULT_OFFERS = [
+    {"id": "default-offer-single", "name": "Cours à l'unité", "price": 30, "thumbnail": "", "videoUrl": "", "description": "", "visible": True},
+    {"id": "default-offer-card10", "name": "Carte 10 cours", "price": 150, "thumbnail": "", "videoUrl": "", "description": "", "visible": True},
+    {"id": "default-offer-month", "name": "Abonnement 1 mois", "price": 109, "thumbnail": "", "videoUrl": "", "description": "", "visible": True}
+]
+
+OFFERS_LIST = ListSpec(
+    Offer, filters={"category": str, "isProduct": bool, "visible": bool, "authorEmail": str},
+    sorts=("name", "price", "stock")
+)
+
+@api_router.get("/offers", response_model=list_response_model(Offer))
+async def get_offers(request: Request):
+    """Liste des offres (liste complète, ou paginée avec limit/cursor; fields, filtres et sort: voir list_api)"""
+    headers, not_modified = await _catalog_validators(request, "offers")
+    if not_modified:
+        return not_modified
+    return await list_response(OFFERS_LIST, db.offers, request.query_params, headers)
+
+# Index de recherche en mémoire (offres visibles, champs publics), reconstruit quand la version change
+offer_search_index = OfferSearchIndex()
+_offer_search_lock = asyncio.Lock()
+
+async def _fresh_offer_search_index() -> OfferSearchIndex:
+    version = await _collection_version("offers")
+    key = (version["epoch"], version["v"])
+    if offer_search_index.version != key:
+        async with _offer_search_lock:
+            if offer_search_index.version != key:
+                offers = await db.offers.find({"visible": {"$ne": False}}, _public_projection(Offer)).to_list(None)
+                offer_search_index.build(conform_documents(Offer, offers, _public_fields(Offer)), key)
+    return offer_search_index
+
+@api_router.get("/offers/search")
+async def search_offers(
+    q: str = "",
+    category: Optional[str] = None,
+    is_product: Optional[bool] = None,
+    page: int = 1,
+    limit: int = 20
+):
+    """
+    Recherche dans les offres visibles (nom, mots-clés, description).
+    Insensible aux accents, préfixes acceptés ("abon" -> "Abonnement"), résultats triés par pertinence.
+    - category / is_product: filtres
+    - page / limit: pagination (limit max 100)
+    """
+    limit = max(1, min(limit, 100))
+    page = max(page, 1)  # Page renvoyée = page effectivement servie
+    index = await _fresh_offer_search_index()
+    total, results = index.search(q, category=category, is_product=is_product, page=page, limit=limit)
+    return {
+        "data": results,
+        "pagination": {
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "pages": (total + limit - 1) // limit
+        }
+    }
 
 @api_router.post("/offers", response_model=Offer)
 async def create_offer(offer: OfferCreate):
     offer_obj = Offer(**offer.model_dump())
     await db.offers.insert_one(offer_obj.model_dump())
+    await _bump_collection_version("offers")
     return offer_obj
 
 @api_router.put("/offers/{offer_id}", response_model=Offer)
 async def update_offer(offer_id: str, offer: OfferCreate):
     await db.offers.update_one({"id": offer_id}, {"$set": offer.model_dump()})
+    await _bump_collection_version("offers")
     updated = await db.offers.find_one({"id": offer_id}, {"_id": 0})
     return updated
 
@@ -954,6 +1310,7 @@ async def delete_offer(offer_id: str):
     """Supprime une offre et nettoie les références dans les codes promo"""
     # 1. Supprimer l'offre
     await db.offers.delete_one({"id": offer_id})
+    await _bump_collection_version("offers")
     
     # 2. Nettoyer les références dans les codes promo (retirer l'offre des 'courses'/articles autorisés)
     await db.discount_codes.update_many(
@@ -965,7 +1322,11 @@ async def delete_offer(offer_id: str):
 
 # --- Product Categories ---
 @api_router.get("/categories")
-async def get_categories():
+async def get_categories(request: Request, response: Response):
+    headers, not_modified = await _catalog_validators(request, "categories")
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
     categories = await db.categories.find({}, {"_id": 0}).to_list(100)
     return categories if categories else [
         {"id": "service", "name": "Services & Cours", "icon": "🎧"},
@@ -979,6 +1340,8 @@ async def get_categories():
 async def create_category(category: dict):
     category["id"] = category.get("id") or str(uuid.uuid4())[:8]
     await db.categories.insert_one(category)
+    await _bump_collection_version("categories")
+    category.pop("_id", None)
     return category
 
 # --- Shipping / Tracking ---
@@ -999,29 +1362,144 @@ async def update_tracking(reservation_id: str, tracking_data: dict):
     return {"success": True, "reservation": updated}
 
 # --- Users ---
-@api_router.get("/users", response_model=List[User])
-async def get_users():
-    users = await db.users.find({}, {"_id": 0}).to_list(1000)
-    for user in users:
-        if isinstance(user.get('createdAt'), str):
-            user['createdAt'] = datetime.fromisoformat(user['createdAt'].replace('Z', '+00:00'))
-    return users
+USERS_LIST = ListSpec(User, filters={"email": str, "whatsapp": str}, sorts=("name", "email", "createdAt"))
+
+@api_router.get("/users", response_model=list_response_model(User))
+async def get_users(request: Request):
+    return await list_response(USERS_LIST, db.users, request.query_params)
+
+# Un contact est identifié par son email normalisé (ou, à défaut, son téléphone E.164):
+# champ contactKey sous index unique, pour que POST /users soit un upsert idempotent.
+
+def _contact_key(email: Optional[str], whatsapp: Optional[str]) -> Optional[str]:
+    email = (email or "").strip().lower()
+    if email:
+        return f"email:{email}"
+    phone = format_phone_e164(whatsapp or "")
+    return f"phone:{phone}" if phone else None
+
+def _user_upsert_update(user: UserCreate, key: str) -> dict:
+    """$set des infos de contact (dernières connues), $setOnInsert de l'identité"""
+    fields = {"name": user.name.strip()}
+    if user.whatsapp:
+        fields["whatsapp"] = user.whatsapp.strip()  # Ne pas effacer un numéro connu
+    return {
+        "$set": fields,
+        "$setOnInsert": {
+            "id": str(uuid.uuid4()),
+            "email": user.email.strip(),
+            "contactKey": key,
+            "createdAt": datetime.now(timezone.utc),
+            **({} if user.whatsapp else {"whatsapp": ""})
+        }
+    }
+
+async def _ensure_user_indexes():
+    """Calcule contactKey pour les contacts existants (par lots: une requête $in par lot) puis crée l'index unique"""
+    seen = set()
+    duplicates = 0
+    
+    async def flush(batch: List[tuple]):
+        nonlocal duplicates
+        keys = list({key for _, key in batch})
+        taken = {
+            doc["contactKey"]
+            async for doc in db.users.find({"contactKey": {"$in": keys}}, {"_id": 0, "contactKey": 1})
+        }
+        operations = []
+        for _id, key in batch:
+            if key in seen or key in taken:
+                duplicates += 1  # Doublon historique: laissé sans clé (le plus ancien reste canonique)
+                continue
+            seen.add(key)
+            operations.append(UpdateOne({"_id": _id}, {"$set": {"contactKey": key}}))
+        if operations:
+            await db.users.bulk_write(operations, ordered=False)
+    
+    batch: List[tuple] = []
+    cursor = db.users.find(
+        {"contactKey": {"$exists": False}}, {"_id": 1, "email": 1, "whatsapp": 1}
+    ).sort("createdAt", ASCENDING)
+    async for doc in cursor:
+        key = _contact_key(doc.get("email"), doc.get("whatsapp"))
+        if key:
+            batch.append((doc["_id"], key))
+        if len(batch) >= 500:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    if duplicates:
+        logger.warning(f"[Users] {duplicates} contact(s) en double conservés sans contactKey")
+    await db.users.create_index(
+        "contactKey", unique=True, name="user_contact_key",
+        partialFilterExpression={"contactKey": {"$type": "string"}}
+    )
 
 @api_router.post("/users", response_model=User)
 async def create_user(user: UserCreate):
-    user_obj = User(**user.model_dump())
-    doc = user_obj.model_dump()
-    doc['createdAt'] = doc['createdAt'].isoformat()
-    await db.users.insert_one(doc)
-    return user_obj
+    """Crée le contact ou met à jour l'existant (même email / téléphone): renvoie le contact canonique"""
+    key = _contact_key(user.email, user.whatsapp)
+    if not key:
+        raise HTTPException(status_code=400, detail="Email ou téléphone requis")
+    for attempt in range(2):
+        try:
+            return await db.users.find_one_and_update(
+                {"contactKey": key},
+                _user_upsert_update(user, key),
+                upsert=True,
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Deux upserts simultanés du même contact: le second relit celui créé par le premier
+            if attempt:
+                raise
+
+@api_router.post("/users/bulk")
+async def bulk_upsert_users(data: UsersBulkUpsert):
+    """Import de contacts (CSV) en un seul appel: upsert par email/téléphone normalisé"""
+    by_key: Dict[str, UserCreate] = {}
+    skipped = 0
+    for user in data.users:
+        key = _contact_key(user.email, user.whatsapp)
+        if key and user.name.strip():
+            by_key[key] = user  # Doublons dans le fichier: la dernière ligne l'emporte
+        else:
+            skipped += 1
+    
+    created = updated = 0
+    if by_key:
+        operations = [
+            UpdateOne({"contactKey": key}, _user_upsert_update(user, key), upsert=True)
+            for key, user in by_key.items()
+        ]
+        try:
+            result = await db.users.bulk_write(operations, ordered=False)
+            created, updated = result.upserted_count, result.matched_count
+        except BulkWriteError as e:
+            # Course avec un upsert concurrent sur la même clé: contact déjà présent
+            details = e.details
+            created, updated = details.get("nUpserted", 0), details.get("nMatched", 0)
+            skipped += len(details.get("writeErrors", []))
+    
+    ids = {
+        doc["contactKey"]: doc["id"]
+        async for doc in db.users.find({"contactKey": {"$in": list(by_key)}}, {"_id": 0, "contactKey": 1, "id": 1})
+    }
+    return {
+        "success": True,
+        "created": created,
+        "updated": updated,
+        "skipped": skipped,
+        "users": [{"email": by_key[key].email, "id": ids.get(key)} for key in by_key]
+    }
 
 @api_router.get("/users/{user_id}", response_model=User)
 async def get_user(user_id: str):
     user = await db.users.find_one({"id": user_id}, {"_id": 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if isinstance(user.get('createdAt'), str):
-        user['createdAt'] = datetime.fromisoformat(user['createdAt'].replace('Z', '+00:00'))
     return user
 
 @api_router.put("/users/{user_id}", response_model=User)
@@ -1032,10 +1510,17 @@ async def update_user(user_id: str, user: UserCreate):
         raise HTTPException(status_code=404, detail="User not found")
     
     update_data = user.model_dump()
-    await db.users.update_one({"id": user_id}, {"$set": update_data})
+    key = _contact_key(user.email, user.whatsapp)
+    if key:
+        update = {"$set": {**update_data, "contactKey": key}}
+    else:
+        # Ni email ni téléphone: l'ancienne clé unique ne doit pas rester sur le document
+        update = {"$set": update_data, "$unset": {"contactKey": ""}}
+    try:
+        await db.users.update_one({"id": user_id}, update)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Un autre contact utilise déjà cet email")
     updated = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if isinstance(updated.get('createdAt'), str):
-        updated['createdAt'] = datetime.fromisoformat(updated['createdAt'].replace('Z', '+00:00'))
     return updated
 
 @api_router.delete("/users/{user_id}")
@@ -1060,6 +1545,391 @@ async def delete_user(user_id: str):
     
     return {"success": True, "message": "Contact supprimé et références nettoyées"}
 
+# ==================== INVENTAIRE (stock des offres, casques par séance) ====================
+# Sans verrou: chaque prise est un $inc conditionnel (filtre "reste assez") sur un seul document.
+# - offers.stock: décrémenté de la quantité (-1 = illimité, jamais décrémenté)
+# - course_occurrences {courseId, date, capacity, booked, held}: un casque par date réservée.
+#   'held' = réservé temporairement pendant un checkout Stripe, 'booked' = réservation confirmée.
+
+COURSE_TIMEZONE = ZoneInfo(os.environ.get("COURSE_TIMEZONE", "Europe/Zurich"))
+# Durée de la réservation temporaire pendant le checkout Stripe (libérée ensuite si non payé)
+CHECKOUT_HOLD_MINUTES = int(os.environ.get("CHECKOUT_HOLD_MINUTES", "60"))
+INVENTORY_SWEEP_INTERVAL = float(os.environ.get("INVENTORY_SWEEP_INTERVAL", "60"))
+
+def _occurrence_date(value: str) -> Optional[str]:
+    """Date locale (YYYY-MM-DD, fuseau du cours) d'une date ISO envoyée par le client"""
+    if not value:
+        return None
+    if len(value) == 10:
+        return value
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(COURSE_TIMEZONE).date().isoformat()
+
+def _reservation_dates(selected_dates: Optional[List[str]], fallback: Optional[str]) -> List[str]:
+    dates = {_occurrence_date(d) for d in (selected_dates or [fallback])}
+    return sorted(d for d in dates if d)
+
+async def _take_offer_stock(offer_id: str, quantity: int) -> int:
+    """Décrément atomique du stock; retourne la quantité prise (0 si illimité ou offre inconnue)"""
+    if quantity <= 0:
+        return 0
+    taken = await db.offers.find_one_and_update(
+        {"id": offer_id, "stock": {"$gte": quantity}},
+        {"$inc": {"stock": -quantity}},
+        projection={"_id": 0, "stock": 1}
+    )
+    if taken:
+        await _bump_collection_version("offers")
+        return quantity
+    offer = await db.offers.find_one({"id": offer_id}, {"_id": 0, "stock": 1})
+    if offer is None or offer.get("stock", -1) < 0:
+        return 0
+    raise HTTPException(status_code=409, detail="Stock insuffisant pour cette offre")
+
+async def _return_offer_stock(offer_id: str, quantity: int):
+    if quantity > 0:
+        await db.offers.update_one({"id": offer_id, "stock": {"$gte": 0}}, {"$inc": {"stock": quantity}})
+        await _bump_collection_version("offers")
+
+async def _ensure_occurrence(course_id: str, date: str, capacity: int):
+    try:
+        result = await db.course_occurrences.update_one(
+            {"courseId": course_id, "date": date},
+            {"$setOnInsert": {"id": str(uuid.uuid4()), "capacity": capacity, "booked": 0, "held": 0}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return  # Créée au même instant par une autre requête
+    if result.upserted_id is not None:
+        # Séance hors calendrier matérialisé: compter aussi les réservations antérieures
+        booked = (await _aggregate_booked([course_id], date)).get((course_id, date), 0)
+        if booked:
+            await db.course_occurrences.update_one({"courseId": course_id, "date": date}, {"$max": {"booked": booked}})
+
+async def _take_seat(course_id: str, date: str, field: str) -> bool:
+    """+1 sur 'held' ou 'booked' seulement s'il reste un casque (booked + held < capacity)"""
+    result = await db.course_occurrences.update_one(
+        {
+            "courseId": course_id,
+            "date": date,
+            "$or": [
+                {"capacity": {"$lt": 0}},
+                {"$expr": {"$lt": [{"$add": ["$booked", "$held"]}, "$capacity"]}}
+            ]
+        },
+        {"$inc": {field: 1}}
+    )
+    return result.modified_count == 1
+
+async def _acquire_inventory(offer_id: str, quantity: int, course_id: str, dates: List[str], field: str) -> dict:
+    """
+    Prend le stock de l'offre et un casque par date ('held' ou 'booked').
+    Unité de stock: un article pour un produit (quantity), une réservation (une personne) pour
+    un cours, quel que soit le nombre de dates choisies; les casques sont comptés par date.
+    Tout ou rien: ce qui a déjà été pris est rendu si une date est complète (409).
+    """
+    inventory = {"offerId": offer_id, "stock": 0, "courseId": course_id, "dates": []}
+    course = await db.courses.find_one({"id": course_id}, {"_id": 0, "capacity": 1}) if dates else None
+    inventory["stock"] = await _take_offer_stock(offer_id, 1 if course is not None else quantity)
+    try:
+        if course is not None:
+            capacity = course.get("capacity", -1)
+            for date in dates:
+                await _ensure_occurrence(course_id, date, capacity)
+                if not await _take_seat(course_id, date, field):
+                    raise HTTPException(status_code=409, detail=f"Plus de casque disponible pour la séance du {date}")
+                inventory["dates"].append(date)
+    except Exception:
+        await _release_inventory(inventory, field)
+        raise
+    return inventory
+
+async def _release_inventory(inventory: dict, field: str):
+    await _return_offer_stock(inventory["offerId"], inventory["stock"])
+    if inventory["dates"]:
+        await db.course_occurrences.update_many(
+            {"courseId": inventory["courseId"], "date": {"$in": inventory["dates"]}, field: {"$gt": 0}},
+            {"$inc": {field: -1}}
+        )
+
+async def _sync_occurrence_capacity(course_id: str, capacity: int):
+    """Nouvelle capacité du cours appliquée aux séances à venir"""
+    today = datetime.now(COURSE_TIMEZONE).date().isoformat()
+    await db.course_occurrences.update_many(
+        {"courseId": course_id, "date": {"$gte": today}}, {"$set": {"capacity": capacity}}
+    )
+
+async def _hold_checkout_inventory(checkout_data) -> dict:
+    """Réservation temporaire (held) pendant le checkout Stripe"""
+    dates = _reservation_dates(checkout_data.selected_dates, checkout_data.course_datetime)
+    return await _acquire_inventory(
+        checkout_data.offer_id, checkout_data.quantity, checkout_data.course_id, dates, "held"
+    )
+
+async def _confirm_checkout_hold(session_id: str) -> Optional[dict]:
+    """Paiement confirmé: held -> booked (une seule fois, transition atomique sur la transaction)"""
+    transaction = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id, "holdStatus": "held"},
+        {"$set": {"holdStatus": "booked"}, "$unset": {"holdExpiresAt": ""}},
+        projection={"_id": 0, "inventory": 1}
+    )
+    if transaction:
+        inventory = transaction["inventory"]
+        if inventory["dates"]:
+            await db.course_occurrences.update_many(
+                {"courseId": inventory["courseId"], "date": {"$in": inventory["dates"]}},
+                {"$inc": {"held": -1, "booked": 1}}
+            )
+        return inventory
+    
+    transaction = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id, "holdStatus": "released"},
+        {"$set": {"holdStatus": "booked"}},
+        projection={"_id": 0, "inventory": 1}
+    )
+    if not transaction:
+        return None
+    # Payé après libération de la réservation temporaire: le client a payé, on le place sans condition
+    inventory = transaction["inventory"]
+    logger.warning(f"[Inventaire] Paiement tardif {session_id}: places reprises sans contrôle de capacité")
+    if inventory["stock"] > 0:
+        await db.offers.update_one(
+            {"id": inventory["offerId"], "stock": {"$gte": 0}},
+            [{"$set": {"stock": {"$max": [0, {"$subtract": ["$stock", inventory["stock"]]}]}}}]
+        )
+        await _bump_collection_version("offers")
+    if inventory["dates"]:
+        await db.course_occurrences.update_many(
+            {"courseId": inventory["courseId"], "date": {"$in": inventory["dates"]}},
+            {"$inc": {"booked": 1}}
+        )
+    return inventory
+
+async def _release_checkout_hold(session_id: str) -> bool:
+    """Checkout expiré/abandonné: rend le stock et les casques (une seule fois, jamais après paiement)"""
+    transaction = await db.payment_transactions.find_one_and_update(
+        {"session_id": session_id, "holdStatus": "held", "payment_status": {"$ne": "paid"}},
+        {"$set": {"holdStatus": "released"}, "$unset": {"holdExpiresAt": ""}},
+        projection={"_id": 0, "inventory": 1}
+    )
+    if not transaction:
+        return False
+    await _release_inventory(transaction["inventory"], "held")
+    logger.info(f"[Inventaire] Réservation temporaire libérée: {session_id}")
+    return True
+
+class CheckoutHoldSweeper:
+    """Libère en arrière-plan les réservations temporaires dont le checkout n'a pas abouti à temps"""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+    
+    async def sweep(self) -> int:
+        expired = db.payment_transactions.find(
+            {"holdStatus": "held", "holdExpiresAt": {"$lte": datetime.now(timezone.utc)}},
+            {"_id": 0, "session_id": 1}
+        )
+        released = 0
+        async for transaction in expired:
+            released += await _release_checkout_hold(transaction["session_id"])
+        return released
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Inventaire] Erreur libération: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+checkout_hold_sweeper = CheckoutHoldSweeper(INVENTORY_SWEEP_INTERVAL)
+
+async def _ensure_inventory_indexes():
+    await db.course_occurrences.create_index(
+        [("courseId", ASCENDING), ("date", ASCENDING)], unique=True, name="occurrence_course_date"
+    )
+    await db.course_occurrences.create_index([("date", ASCENDING), ("startsAt", ASCENDING)], name="occurrence_date")
+    await db.reservations.create_index("courseId", name="reservation_course")
+    await db.payment_transactions.create_index("holdExpiresAt", sparse=True, name="checkout_hold_expiry")
+
+# ==================== CALENDRIER DES SÉANCES ====================
+# Les séances datées des OCCURRENCE_WEEKS prochaines semaines sont matérialisées dans
+# course_occurrences (mêmes documents que les compteurs d'inventaire): une seule requête
+# indexée donne les dates et la disponibilité, pour la page de réservation comme pour le coach.
+# Recalcul à la modification des cours (version de collection) et au changement de jour.
+
+OCCURRENCE_WEEKS = int(os.environ.get("OCCURRENCE_WEEKS", "8"))
+
+_occurrence_calendar = {"key": None}
+_occurrence_lock = asyncio.Lock()
+
+def _course_dates(course: dict, today, weeks: int) -> List[tuple]:
+    """
+    [(YYYY-MM-DD, début UTC)] des `weeks` prochaines séances d'un cours (weekday: 0 = dimanche).
+    La séance du jour n'en fait partie que si elle n'a pas encore commencé.
+    """
+    offset = (course.get("weekday", 0) - (today.weekday() + 1) % 7) % 7
+    try:
+        hour, minute = (int(part) for part in (course.get("time") or "00:00").split(":")[:2])
+    except ValueError:
+        hour, minute = 0, 0
+    now = datetime.now(timezone.utc)
+    dates = []
+    for week in range(weeks + 1):
+        day = today + timedelta(days=offset + 7 * week)
+        starts_at = datetime(day.year, day.month, day.day, hour, minute, tzinfo=COURSE_TIMEZONE)
+        if starts_at <= now:
+            continue
+        dates.append((day.isoformat(), starts_at.astimezone(timezone.utc)))
+    return dates[:weeks]
+
+async def _aggregate_booked(course_ids: List[str], from_date: str) -> Dict[tuple, int]:
+    """
+    Casques réservés par (courseId, date), calculés depuis les réservations: dates de
+    l'inventaire si présentes, sinon selectedDates / datetime (réservations antérieures).
+    """
+    client_dates = {"$map": {
+        "input": {"$ifNull": ["$selectedDates", ["$datetime"]]},
+        "as": "d",
+        "in": {"$dateToString": {
+            "format": "%Y-%m-%d",
+            "timezone": str(COURSE_TIMEZONE),
+            "date": {"$dateFromString": {"dateString": "$$d", "onError": None, "onNull": None}}
+        }}
+    }}
+    pipeline = [
+        {"$match": {"courseId": {"$in": course_ids}}},
+        {"$project": {"courseId": 1, "dates": {"$ifNull": ["$inventory.dates", client_dates]}}},
+        {"$unwind": "$dates"},
+        {"$match": {"dates": {"$gte": from_date}}},
+        {"$group": {"_id": {"courseId": "$courseId", "date": "$dates"}, "booked": {"$sum": 1}}}
+    ]
+    booked = {}
+    async for row in db.reservations.aggregate(pipeline):
+        booked[(row["_id"]["courseId"], row["_id"]["date"])] = row["booked"]
+    return booked
+
+async def _materialize_occurrences(weeks: int = OCCURRENCE_WEEKS) -> int:
+    """Crée/met à jour les séances à venir et supprime celles qui ne correspondent plus à un cours"""
+    today = datetime.now(COURSE_TIMEZONE).date()
+    from_date = today.isoformat()
+    # Fin de la fenêtre matérialisée: au-delà, les séances créées à la demande (_ensure_occurrence)
+    # ne sont pas connues d'ici et ne doivent pas être supprimées
+    window = {"$gte": from_date, "$lte": (today + timedelta(weeks=weeks)).isoformat()}
+    course_ids: List[str] = []
+    upserted = 0
+
+    async def flush(courses: List[dict]) -> int:
+        booked = await _aggregate_booked([c["id"] for c in courses], from_date)
+        operations = []
+        for course in courses:
+            dates = _course_dates(course, today, weeks)
+            for date, starts_at in dates:
+                operations.append(UpdateOne(
+                    {"courseId": course["id"], "date": date},
+                    {
+                        "$set": {"startsAt": starts_at, "capacity": course.get("capacity", -1)},
+                        "$setOnInsert": {"id": str(uuid.uuid4()), "held": 0},
+                        # Compteur tenu par $inc, recalé ici sur les réservations existantes: $max corrige
+                        # un sous-comptage (séance créée par _ensure_occurrence avant des réservations
+                        # plus anciennes) sans jamais baisser un compteur qu'une réservation en cours vient d'incrémenter
+                        "$max": {"booked": booked.get((course["id"], date), 0)}
+                    },
+                    upsert=True
+                ))
+            # Jour/heure modifiés: les anciennes séances sans réservation disparaissent
+            operations.append(DeleteMany({
+                "courseId": course["id"], "date": {**window, "$nin": [d for d, _ in dates]},
+                "booked": 0, "held": 0
+            }))
+        return await _write_occurrences(operations)
+
+    batch: List[dict] = []
+    async for course in db.courses.find(
+        {"archived": {"$ne": True}}, {"_id": 0, "id": 1, "weekday": 1, "time": 1, "capacity": 1}
+    ):
+        course_ids.append(course["id"])
+        batch.append(course)
+        if len(batch) >= 500:
+            upserted += await flush(batch)
+            batch = []
+    if batch:
+        upserted += await flush(batch)
+    await _write_occurrences([DeleteMany({
+        "courseId": {"$nin": course_ids}, "date": window, "booked": 0, "held": 0
+    })])
+    return upserted
+
+async def _write_occurrences(operations: list) -> int:
+    try:
+        result = await db.course_occurrences.bulk_write(operations, ordered=False)
+        return result.upserted_count
+    except BulkWriteError as e:
+        # Upsert concurrent d'un autre worker sur l'index unique (courseId, date): sans conséquence
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nUpserted", 0)
+
+async def _ensure_occurrence_calendar():
+    """Recalcule le calendrier si les cours ont changé ou si le jour a changé"""
+    version = await _collection_version("courses")
+    key = (version["epoch"], version["v"], datetime.now(COURSE_TIMEZONE).date())
+    if _occurrence_calendar["key"] == key:
+        return
+    async with _occurrence_lock:
+        if _occurrence_calendar["key"] != key:
+            await _materialize_occurrences()
+            _occurrence_calendar["key"] = key
+
+@api_router.get("/courses/occurrences")
+async def get_course_occurrences(
+    course_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """
+    Séances datées avec leur disponibilité (casques).
+    - course_id: un seul cours (sinon tous)
+    - start / end: bornes YYYY-MM-DD incluses (défaut: à partir d'aujourd'hui)
+    """
+    await _ensure_occurrence_calendar()
+    date_filter = {"$gte": start or datetime.now(COURSE_TIMEZONE).date().isoformat()}
+    if end:
+        date_filter["$lte"] = end
+    query = {"date": date_filter}
+    if not start:
+        # Séances du jour déjà commencées: plus réservables (séances créées à la demande: sans startsAt)
+        query["startsAt"] = {"$not": {"$lte": datetime.now(timezone.utc)}}
+    if course_id:
+        query["courseId"] = course_id
+    occurrences = await db.course_occurrences.find(
+        query, {"_id": 0, "id": 1, "courseId": 1, "date": 1, "startsAt": 1, "capacity": 1, "booked": 1, "held": 1}
+    ).sort([("date", ASCENDING), ("startsAt", ASCENDING)]).to_list(2000)
+    for occurrence in occurrences:
+        capacity = occurrence.get("capacity", -1)
+        occurrence["available"] = max(0, capacity - occurrence["booked"] - occurrence["held"]) if capacity >= 0 else None
+    return occurrences
+
 # --- Reservations ---
 @api_router.get("/reservations")
 async def get_reservations(
@@ -1101,7 +1971,7 @@ async def get_reservations(
     
     if all_data:
         # Pour l'export CSV, récupérer tous les champs
-        reservations = await db.reservations.find({}, {"_id": 0}).sort("createdAt", -1).to_list(10000)
+        reservations = await db_analytics.reservations.find({}, {"_id": 0}).sort("createdAt", -1).to_list(10000)
     else:
         # Pagination avec tri par date de création (les plus récentes en premier)
         skip = (page - 1) * limit
@@ -1110,10 +1980,6 @@ async def get_reservations(
     # Compter le total pour la pagination
     total_count = await db.reservations.count_documents({})
     
-    for res in reservations:
-        if isinstance(res.get('createdAt'), str):
-            res['createdAt'] = datetime.fromisoformat(res['createdAt'].replace('Z', '+00:00'))
-    
     return {
         "data": reservations,
         "pagination": {
@@ -1129,7 +1995,12 @@ async def create_reservation(reservation: ReservationCreate):
     res_code = f"AFR-{str(uuid.uuid4())[:6].upper()}"
     res_obj = Reservation(**reservation.model_dump(), reservationCode=res_code)
     doc = res_obj.model_dump()
-    doc['createdAt'] = doc['createdAt'].isoformat()
+    
+    # Stock de l'offre et casques des séances choisies (409 si complet)
+    doc['inventory'] = await _acquire_inventory(
+        reservation.offerId, reservation.quantity, reservation.courseId,
+        _reservation_dates(reservation.selectedDates, reservation.datetime), "booked"
+    )
     
     # ========== CALCUL DE LA COMMISSION ADMIN (10%) ==========
     total_price = float(doc.get('totalPrice', 0))
@@ -1144,7 +2015,11 @@ async def create_reservation(reservation: ReservationCreate):
         'totalAmount': total_price
     }
     
-    await db.reservations.insert_one(doc)
+    try:
+        await db.reservations.insert_one(doc)
+    except Exception:
+        await _release_inventory(doc['inventory'], "booked")
+        raise
     
     # Log de la commission pour le suivi
     logger.info(f"[Commission] Réservation {res_code}: Total={total_price}CHF, Admin={commission_amount}CHF (10%), Coach={coach_amount}CHF")
@@ -1174,8 +2049,8 @@ async def get_admin_commissions(period: str = "month"):
         start_date = datetime(2020, 1, 1, tzinfo=timezone.utc)
     
     # Récupérer toutes les réservations de la période
-    reservations = await db.reservations.find(
-        {"createdAt": {"$gte": start_date.isoformat()}},
+    reservations = await db_analytics.reservations.find(
+        {"createdAt": {"$gte": start_date}},
         {"_id": 0, "totalPrice": 1, "commission": 1, "createdAt": 1, "reservationCode": 1}
     ).to_list(10000)
     
@@ -1218,6 +2093,63 @@ async def get_admin_commissions(period: str = "month"):
         'recentTransactions': sorted(transactions, key=lambda x: x['date'], reverse=True)[:20]
     }
 
+# Attente longue (long-poll) d'une réservation: retour Stripe avant/pendant la réception du webhook
+RESERVATION_WAIT_MAX_SECONDS = float(os.environ.get("RESERVATION_WAIT_MAX_SECONDS", "25"))
+# Relecture périodique en base: le webhook peut être traité par un autre worker
+RESERVATION_WAIT_POLL_SECONDS = float(os.environ.get("RESERVATION_WAIT_POLL_SECONDS", "1.0"))
+
+# reservationCode -> événements des requêtes en attente dans ce processus
+_reservation_waiters: Dict[str, Set[asyncio.Event]] = {}
+
+def _notify_reservation_created(reservation_code: str):
+    """Réveille immédiatement les requêtes en attente de cette réservation (même worker)"""
+    for event in _reservation_waiters.get(reservation_code, ()):
+        event.set()
+
+async def _find_reservation_by_code(reservation_code: str, wait: float = 0) -> Optional[dict]:
+    """
+    Lecture indexée par reservationCode. Avec wait > 0, attend jusqu'à `wait` secondes
+    (plafonné à RESERVATION_WAIT_MAX_SECONDS) que la réservation soit créée.
+    """
+    query = {"reservationCode": reservation_code}
+    reservation = await db.reservations.find_one(query, {"_id": 0})
+    wait = min(wait, RESERVATION_WAIT_MAX_SECONDS)
+    if reservation or wait <= 0:
+        return reservation
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    event = asyncio.Event()
+    _reservation_waiters.setdefault(reservation_code, set()).add(event)
+    try:
+        while reservation is None:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, RESERVATION_WAIT_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            reservation = await db.reservations.find_one(query, {"_id": 0})
+    finally:
+        waiters = _reservation_waiters.get(reservation_code)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del _reservation_waiters[reservation_code]
+    return reservation
+
+@api_router.get("/reservations/by-code/{reservation_code}")
+async def get_reservation_by_code(reservation_code: str, wait: float = 0):
+    """
+    Récupère une réservation par son code (index reservation_code).
+    - wait: secondes d'attente maximale si la réservation n'existe pas encore (retour Stripe)
+    """
+    reservation = await _find_reservation_by_code(reservation_code.upper(), wait)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Réservation non trouvée")
+    return reservation
+
 @api_router.post("/reservations/{reservation_code}/validate")
 async def validate_reservation(reservation_code: str):
     """Validate a reservation by QR code scan (coach action)"""
@@ -1228,13 +2160,16 @@ async def validate_reservation(reservation_code: str):
     # Mark as validated
     await db.reservations.update_one(
         {"reservationCode": reservation_code},
-        {"$set": {"validated": True, "validatedAt": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"validated": True, "validatedAt": datetime.now(timezone.utc)}}
     )
     return {"success": True, "message": "Réservation validée", "reservation": reservation}
 
 @api_router.delete("/reservations/{reservation_id}")
 async def delete_reservation(reservation_id: str):
-    await db.reservations.delete_one({"id": reservation_id})
+    deleted = await db.reservations.find_one_and_delete({"id": reservation_id}, projection={"inventory": 1})
+    if deleted and deleted.get("inventory"):
+        # Casques et stock rendus disponibles
+        await _release_inventory(deleted["inventory"], "booked")
     return {"success": True}
 
 # ==================== COACH NOTIFICATIONS ====================
@@ -1297,10 +2232,13 @@ Notification automatique Afroboost"""
         return {"success": False, "message": str(e)}
 
 # --- Discount Codes ---
-@api_router.get("/discount-codes", response_model=List[DiscountCode])
-async def get_discount_codes():
-    codes = await db.discount_codes.find({}, {"_id": 0}).to_list(1000)
-    return codes
+DISCOUNT_CODES_LIST = ListSpec(
+    DiscountCode, filters={"active": bool, "type": str, "assignedEmail": str}, sorts=("code", "used")
+)
+
+@api_router.get("/discount-codes", response_model=list_response_model(DiscountCode))
+async def get_discount_codes(request: Request):
+    return await list_response(DISCOUNT_CODES_LIST, db.discount_codes, request.query_params)
 
 @api_router.post("/discount-codes", response_model=DiscountCode)
 async def create_discount_code(code: DiscountCodeCreate):
@@ -1438,20 +2376,161 @@ async def sanitize_data():
     }
 
 # --- Campaigns (Marketing Module) ---
+# Les résultats d'envoi (un par contact x canal) vivent dans la collection campaign_results,
+# indexée sur (campaignId, contactId, channel). La campagne ne garde que des compteurs
+# maintenus par $inc, ce qui évite de réécrire un gros document à chaque envoi.
+
+RESULT_STATUS_COUNTERS = {
+    "pending": "resultsPending",
+    "sent": "resultsSent",
+    "failed": "resultsFailed"
+}
+
+CAMPAIGN_COUNTER_FIELDS = ["resultsTotal", "resultsPending", "resultsSent", "resultsFailed"]
+
+async def _ensure_campaign_indexes():
+    """Index de la collection campaign_results"""
+    await db.campaign_results.create_index(
+        [("campaignId", ASCENDING), ("contactId", ASCENDING), ("channel", ASCENDING)],
+        unique=True,
+        name="campaign_contact_channel"
+    )
+    await db.campaign_results.create_index(
+        [("campaignId", ASCENDING), ("seq", ASCENDING)],
+        name="campaign_seq"
+    )
+    # Le lancement parcourt les contacts triés par id (reprise après redémarrage)
+    await db.users.create_index("id", name="user_id")
+
+async def _load_campaign_results(campaign_ids: List[str]) -> Dict[str, List[dict]]:
+    """Récupère les résultats de plusieurs campagnes en une seule requête, groupés par campagne"""
+    grouped = {cid: [] for cid in campaign_ids}
+    if not campaign_ids:
+        return grouped
+    cursor = db.campaign_results.find(
+        {"campaignId": {"$in": campaign_ids}},
+        {"_id": 0, "seq": 0}
+    ).sort([("campaignId", ASCENDING), ("seq", ASCENDING)])
+    async for result in cursor:
+        grouped.setdefault(result.pop("campaignId"), []).append(result)
+    return grouped
+
+async def _with_campaign_results(campaign: dict) -> dict:
+    """Ajoute le champ 'results' attendu par le dashboard"""
+    grouped = await _load_campaign_results([campaign["id"]])
+    campaign["results"] = grouped.get(campaign["id"], [])
+    return campaign
+
+async def _apply_campaign_counter_deltas(campaign_id: str, deltas: Dict[str, int]) -> Optional[dict]:
+    """
+    Applique les variations de compteurs ({status: delta}) via $inc et
+    passe la campagne en 'completed' quand plus aucun résultat n'est en attente.
+    """
+    now = datetime.now(timezone.utc)
+    inc = {RESULT_STATUS_COUNTERS[status]: delta for status, delta in deltas.items() if delta}
+    update = {"$set": {"updatedAt": now}}
+    if inc:
+        update["$inc"] = inc
+    
+    projection = {"_id": 0, "id": 1, "status": 1, **{f: 1 for f in CAMPAIGN_COUNTER_FIELDS}}
+    campaign = await db.campaigns.find_one_and_update(
+        {"id": campaign_id},
+        update,
+        projection=projection,
+        return_document=ReturnDocument.AFTER
+    )
+    if not campaign:
+        return None
+    
+    if campaign.get("status") == "sending" and campaign.get("resultsPending", 0) <= 0:
+        completed = await db.campaigns.update_one(
+            {"id": campaign_id, "status": "sending", "resultsPending": {"$lte": 0}},
+            {"$set": {"status": "completed", "updatedAt": now}}
+        )
+        if completed.modified_count:
+            campaign["status"] = "completed"
+    return campaign
+
+async def _migrate_embedded_campaign_results():
+    """
+    Migration: déplace les anciens tableaux 'results' embarqués dans les campagnes
+    vers la collection campaign_results et initialise les compteurs.
+    Idempotente grâce à l'index unique (campaignId, contactId, channel).
+    """
+    migrated = 0
+    cursor = db.campaigns.find({"results.0": {"$exists": True}}, {"_id": 0, "id": 1, "results": 1})
+    async for campaign in cursor:
+        campaign_id = campaign["id"]
+        docs = []
+        counters = {field: 0 for field in CAMPAIGN_COUNTER_FIELDS}
+        seen = set()
+        for result in campaign.get("results", []):
+            key = (result.get("contactId"), result.get("channel"))
+            if not key[0] or key in seen:
+                continue  # Sans contact ou en double: collision sur l'index unique
+            seen.add(key)
+            status = result.get("status", "pending")
+            if status not in RESULT_STATUS_COUNTERS:
+                status = "pending"
+            docs.append({**result, "status": status, "campaignId": campaign_id, "seq": len(docs)})
+            counters["resultsTotal"] += 1
+            counters[RESULT_STATUS_COUNTERS[status]] += 1
+        await _insert_campaign_results(docs)  # Doublons ignorés: déjà migrés (redémarrage en cours de migration)
+        await db.campaigns.update_one(
+            {"id": campaign_id},
+            {"$set": counters, "$unset": {"results": ""}}
+        )
+        migrated += 1
+    if migrated:
+        logger.info(f"[Campaigns] {migrated} campagne(s) migrée(s) vers campaign_results")
+
+# Liste: compteurs seulement (resultsTotal/Pending/Sent/Failed). Les résultats d'une campagne,
+# dont le nombre croît avec l'audience, se lisent page par page via /campaigns/{id}/results.
+CAMPAIGNS_LIST = ListSpec(
+    filters={"status": str, "targetType": str}, sorts=("createdAt", "updatedAt", "scheduledAt", "name"),
+    default_sort="-createdAt", exclude=("results",)
+)
+
 @api_router.get("/campaigns")
-async def get_campaigns():
-    campaigns = await db.campaigns.find({}, {"_id": 0}).sort("createdAt", -1).to_list(100)
-    return campaigns
+async def get_campaigns(request: Request):
+    return await list_response(CAMPAIGNS_LIST, db.campaigns, request.query_params)
 
 @api_router.get("/campaigns/{campaign_id}")
 async def get_campaign(campaign_id: str):
-    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0})
+    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0, "results": 0})
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
-    return campaign
+    return await _with_campaign_results(campaign)
+
+@api_router.get("/campaigns/{campaign_id}/results")
+async def get_campaign_results(campaign_id: str, status: Optional[str] = None, page: int = 1, limit: int = 100):
+    """Résultats paginés d'une campagne (filtrables par statut)"""
+    query = {"campaignId": campaign_id}
+    if status:
+        query["status"] = status
+    skip = (page - 1) * limit
+    results = await db.campaign_results.find(query, {"_id": 0, "campaignId": 0, "seq": 0}) \
+        .sort("seq", ASCENDING).skip(skip).limit(limit).to_list(limit)
+    total = await db.campaign_results.count_documents(query)
+    return {
+        "data": results,
+        "pagination": {
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "pages": (total + limit - 1) // limit
+        }
+    }
+
+def _campaign_schedule_or_400(value) -> Optional[datetime]:
+    try:
+        return _parse_scheduled_at(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"scheduledAt invalide: {value}")
 
 @api_router.post("/campaigns")
 async def create_campaign(campaign: CampaignCreate):
+    scheduled_at = _campaign_schedule_or_400(campaign.scheduledAt)
     campaign_data = Campaign(
         name=campaign.name,
         message=campaign.message,
@@ -1460,45 +2539,149 @@ async def create_campaign(campaign: CampaignCreate):
         targetType=campaign.targetType,
         selectedContacts=campaign.selectedContacts,
         channels=campaign.channels,
-        scheduledAt=campaign.scheduledAt,
-        status="scheduled" if campaign.scheduledAt else "draft"
-    ).model_dump()
+        scheduledAt=scheduled_at,
+        status="scheduled" if scheduled_at else "draft"
+    ).model_dump(exclude={"results"})
     await db.campaigns.insert_one(campaign_data)
-    return {k: v for k, v in campaign_data.items() if k != "_id"}
+    return {**{k: v for k, v in campaign_data.items() if k != "_id"}, "results": []}
 
 @api_router.put("/campaigns/{campaign_id}")
 async def update_campaign(campaign_id: str, data: dict):
-    data["updatedAt"] = datetime.now(timezone.utc).isoformat()
+    # Les résultats, compteurs et la progression ne sont modifiés que par launch / mark-sent
+    for field in ["results", "launchProgress", "dispatch", "dispatchLease", "dispatchFinishedAt", *CAMPAIGN_COUNTER_FIELDS]:
+        data.pop(field, None)
+    data.pop("createdAt", None)
+    if "scheduledAt" in data:
+        data["scheduledAt"] = _campaign_schedule_or_400(data["scheduledAt"])
+    data["updatedAt"] = datetime.now(timezone.utc)
     await db.campaigns.update_one({"id": campaign_id}, {"$set": data})
-    return await db.campaigns.find_one({"id": campaign_id}, {"_id": 0})
+    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0, "results": 0})
+    return await _with_campaign_results(campaign) if campaign else None
 
 @api_router.delete("/campaigns/{campaign_id}")
 async def delete_campaign(campaign_id: str):
     await db.campaigns.delete_one({"id": campaign_id})
+    await db.campaign_results.delete_many({"campaignId": campaign_id})
     return {"success": True}
 
-@api_router.post("/campaigns/{campaign_id}/launch")
-async def launch_campaign(campaign_id: str):
-    """Mark campaign as sending and prepare results"""
-    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0})
+# ========== LANCEMENT EN STREAMING ==========
+# Les contacts sont lus par lots depuis un curseur (pas de limite d'audience) et les
+# résultats écrits avec insert_many. La progression est enregistrée après chaque lot
+# (launchProgress) pour permettre la reprise si le worker redémarre en plein lancement.
+
+CAMPAIGN_LAUNCH_BATCH_SIZE = int(os.environ.get("CAMPAIGN_LAUNCH_BATCH_SIZE", "500"))
+CAMPAIGN_LAUNCH_LEASE_SECONDS = int(os.environ.get("CAMPAIGN_LAUNCH_LEASE_SECONDS", "120"))
+
+# Références vers les tâches de fond (évite leur destruction par le garbage collector)
+_background_tasks: Set[asyncio.Task] = set()
+
+def _spawn_background(coro) -> asyncio.Task:
+    """Lance une coroutine en tâche de fond en gardant une référence"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_task_done)
+    return task
+
+def _on_background_task_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"[Background] Tâche échouée: {task.exception()}")
+
+async def _recount_campaign_results(campaign_id: str) -> dict:
+    """Recalcule les compteurs depuis campaign_results (utilisé à la reprise d'un lancement)"""
+    counters = {field: 0 for field in CAMPAIGN_COUNTER_FIELDS}
+    pipeline = [
+        {"$match": {"campaignId": campaign_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]
+    async for row in db.campaign_results.aggregate(pipeline):
+        counter = RESULT_STATUS_COUNTERS.get(row["_id"])
+        if counter:
+            counters[counter] += row["count"]
+        counters["resultsTotal"] += row["count"]
+    return counters
+
+async def _insert_campaign_results(docs: List[dict]) -> int:
+    """insert_many non ordonné; les doublons (lot rejoué après reprise) sont ignorés"""
+    if not docs:
+        return 0
+    try:
+        result = await db.campaign_results.insert_many(docs, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+def _new_launch_progress(now: datetime, previous_status: Optional[str]) -> dict:
+    """launchProgress initial; previousStatus sert à rendre la campagne si le lancement échoue"""
+    return {"processed": 0, "lastContactId": None, "done": False, "startedAt": now, "heartbeatAt": now,
+            "previousStatus": previous_status}
+
+async def _run_campaign_launch(campaign_id: str, resume: bool = False):
+    """Lancement; en cas d'échec la campagne quitte 'launching' (pas d'attente de l'expiration du bail)"""
+    try:
+        await _stream_campaign_launch(campaign_id, resume)
+    except Exception as e:
+        logger.error(f"[Campaigns] Lancement {campaign_id} échoué: {e}")
+        await db.campaigns.update_one(
+            {"id": campaign_id, "status": "launching"},
+            [{"$set": {
+                "status": {"$ifNull": ["$launchProgress.previousStatus", "draft"]},
+                "launchProgress.error": str(e),
+                "updatedAt": datetime.now(timezone.utc)
+            }}]
+        )
+        raise
+
+async def _stream_campaign_launch(campaign_id: str, resume: bool = False):
+    """
+    Pipeline de lancement: parcourt les contacts par lots triés par id,
+    écrit les résultats et met à jour launchProgress après chaque lot.
+    """
+    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0, "results": 0})
     if not campaign:
-        raise HTTPException(status_code=404, detail="Campaign not found")
-    
-    # Get contacts based on targetType
-    if campaign.get("targetType") == "all":
-        contacts = await db.users.find({}, {"_id": 0}).to_list(1000)
-    else:
-        selected_ids = campaign.get("selectedContacts", [])
-        contacts = await db.users.find({"id": {"$in": selected_ids}}, {"_id": 0}).to_list(1000)
-    
-    # Prepare results for each contact and channel
-    results = []
-    channels = campaign.get("channels", {})
-    for contact in contacts:
-        for channel, enabled in channels.items():
-            if enabled:
-                results.append({
-                    "contactId": contact.get("id", ""),
+        return
+    
+    progress = campaign.get("launchProgress") or {}
+    channels = [channel for channel, enabled in (campaign.get("channels") or {}).items() if enabled]
+    
+    # Contacts sans id exclus: ils entreraient en collision sur l'index unique (campaignId, contactId, channel)
+    id_filter = {"$nin": [None, ""]}
+    if campaign.get("targetType") != "all":
+        id_filter["$in"] = campaign.get("selectedContacts", [])
+    if progress.get("lastContactId"):
+        id_filter["$gt"] = progress["lastContactId"]
+    query = {"id": id_filter}
+    
+    counters = {field: 0 for field in CAMPAIGN_COUNTER_FIELDS}
+    if resume:
+        # Un lot a pu être écrit sans que la progression soit enregistrée: on repart du réel
+        counters = await _recount_campaign_results(campaign_id)
+        await db.campaigns.update_one({"id": campaign_id}, {"$set": counters})
+    seq = counters["resultsTotal"]
+    processed = progress.get("processed", 0)
+    
+    projection = {"_id": 0, "id": 1, "name": 1, "email": 1, "whatsapp": 1}
+    cursor = db.users.find(query, projection).sort("id", ASCENDING).batch_size(CAMPAIGN_LAUNCH_BATCH_SIZE)
+    
+    batch: List[dict] = []
+    last_contact_id = progress.get("lastContactId")
+    
+    async def flush(contacts: List[dict]):
+        nonlocal seq, processed, last_contact_id
+        docs = []
+        for contact in contacts:
+            # Curseur trié par id: un id répété (doublon dans users) suit immédiatement le premier
+            if contact["id"] == last_contact_id:
+                continue
+            last_contact_id = contact["id"]
+            processed += 1
+            for channel in channels:
+                docs.append({
+                    "campaignId": campaign_id,
+                    "seq": seq + len(docs),
+                    "contactId": contact["id"],
                     "contactName": contact.get("name", ""),
                     "contactEmail": contact.get("email", ""),
                     "contactPhone": contact.get("whatsapp", ""),
@@ -1506,18 +2689,141 @@ async def launch_campaign(campaign_id: str):
                     "status": "pending",
                     "sentAt": None
                 })
+        inserted = await _insert_campaign_results(docs)
+        seq += len(docs)
+        await db.campaigns.update_one(
+            {"id": campaign_id},
+            {
+                "$inc": {"resultsTotal": inserted, "resultsPending": inserted},
+                "$set": {
+                    "launchProgress.processed": processed,
+                    "launchProgress.lastContactId": last_contact_id,
+                    "launchProgress.heartbeatAt": datetime.now(timezone.utc)
+                }
+            }
+        )
     
-    # Update campaign
+    async for contact in cursor:
+        batch.append(contact)
+        if len(batch) >= CAMPAIGN_LAUNCH_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    
+    now = datetime.now(timezone.utc)
     await db.campaigns.update_one(
-        {"id": campaign_id},
+        {"id": campaign_id, "status": "launching"},
+        {"$set": {"status": "sending", "launchProgress.done": True, "launchProgress.finishedAt": now,
+                  "updatedAt": now}}
+    )
+    # Audience vide ou déjà traitée: la campagne est terminée immédiatement
+    await _apply_campaign_counter_deltas(campaign_id, {})
+    logger.info(f"[Campaigns] Lancement {campaign_id} terminé: {processed} contact(s), {seq} résultat(s)")
+
+async def _resume_interrupted_launches():
+    """Reprend les lancements dont le worker a disparu (lease expiré)"""
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=CAMPAIGN_LAUNCH_LEASE_SECONDS)
+    while True:
+        campaign = await db.campaigns.find_one_and_update(
+            {"status": "launching", "$or": [
+                {"launchProgress.heartbeatAt": {"$lt": stale_before}},
+                # Lancements démarrés avant le passage en BSON Date (heartbeat ISO string)
+                {"launchProgress.heartbeatAt": {"$type": "string"}}
+            ]},
+            {"$set": {"launchProgress.heartbeatAt": datetime.now(timezone.utc)}},
+            projection={"_id": 0, "id": 1}
+        )
+        if not campaign:
+            break
+        logger.info(f"[Campaigns] Reprise du lancement interrompu {campaign['id']}")
+        _spawn_background(_run_campaign_launch(campaign["id"], resume=True))
+
+class CampaignLaunchWatchdog:
+    """
+    Reprise périodique des lancements bloqués (worker disparu en plein lancement) quand le
+    planificateur est désactivé; sinon CampaignScheduler.tick s'en charge.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await _resume_interrupted_launches()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Campaigns] Erreur reprise des lancements: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+campaign_launch_watchdog = CampaignLaunchWatchdog(CAMPAIGN_LAUNCH_LEASE_SECONDS / 2)
+
+@api_router.post("/campaigns/{campaign_id}/launch")
+async def launch_campaign(campaign_id: str, background: bool = False):
+    """
+    Mark campaign as sending and prepare results.
+    - background: si True, le lancement tourne en tâche de fond (suivre via /launch-progress)
+    """
+    now = datetime.now(timezone.utc)
+    previous = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0, "status": 1})
+    claimed = previous and await db.campaigns.find_one_and_update(
+        {
+            "id": campaign_id,
+            "status": previous.get("status"),
+            # Jamais pendant un lancement ou un envoi serveur: les compteurs et résultats seraient écrasés
+            "$nor": [
+                {"status": "launching"},
+                {"status": "sending", "dispatch": "server", "dispatchFinishedAt": {"$exists": False}},
+                {"dispatchLease.expiresAt": {"$gt": now}}
+            ]
+        },
         {"$set": {
-            "status": "sending",
-            "results": results,
-            "updatedAt": datetime.now(timezone.utc).isoformat()
-        }}
+            "status": "launching",
+            "launchProgress": _new_launch_progress(now, previous.get("status")),
+            "dispatch": "manual",  # Envoi depuis le dashboard (le planificateur gère les campagnes programmées)
+            **{field: 0 for field in CAMPAIGN_COUNTER_FIELDS},
+            "updatedAt": now
+        }, "$unset": {"dispatchFinishedAt": "", "dispatchLease": ""}},
+        projection={"_id": 0, "id": 1}
     )
+    if not claimed:
+        if previous:
+            raise HTTPException(status_code=409, detail="Lancement ou envoi déjà en cours")
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    # Un relancement repart d'une liste de résultats vierge
+    await db.campaign_results.delete_many({"campaignId": campaign_id})
     
-    return await db.campaigns.find_one({"id": campaign_id}, {"_id": 0})
+    if background:
+        _spawn_background(_run_campaign_launch(campaign_id))
+        return await db.campaigns.find_one({"id": campaign_id}, {"_id": 0, "results": 0})
+    
+    await _run_campaign_launch(campaign_id)
+    return await get_campaign(campaign_id)
+
+@api_router.get("/campaigns/{campaign_id}/launch-progress")
+async def get_campaign_launch_progress(campaign_id: str):
+    """Progression du lancement (contacts traités, résultats écrits)"""
+    projection = {"_id": 0, "id": 1, "status": 1, "launchProgress": 1, **{f: 1 for f in CAMPAIGN_COUNTER_FIELDS}}
+    campaign = await db.campaigns.find_one({"id": campaign_id}, projection)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
 
 @api_router.post("/campaigns/{campaign_id}/mark-sent")
 async def mark_campaign_sent(campaign_id: str, data: dict):
@@ -1525,35 +2831,378 @@ async def mark_campaign_sent(campaign_id: str, data: dict):
     contact_id = data.get("contactId")
     channel = data.get("channel")
     
-    await db.campaigns.update_one(
-        {"id": campaign_id, "results.contactId": contact_id, "results.channel": channel},
-        {"$set": {
-            "results.$.status": "sent",
-            "results.$.sentAt": datetime.now(timezone.utc).isoformat()
-        }}
+    # Mise à jour ciblée par l'index unique; on récupère l'ancien statut pour les compteurs
+    previous = await db.campaign_results.find_one_and_update(
+        {"campaignId": campaign_id, "contactId": contact_id, "channel": channel, "status": {"$ne": "sent"}},
+        {"$set": {"status": "sent", "sentAt": datetime.now(timezone.utc)}},
+        projection={"_id": 0, "status": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    # Check if all results are sent
-    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0})
-    if campaign:
-        all_sent = all(r.get("status") == "sent" for r in campaign.get("results", []))
-        if all_sent:
+    if previous:
+        await _apply_campaign_counter_deltas(campaign_id, {previous.get("status", "pending"): -1, "sent": 1})
+    
+    return {"success": True}
+
+# ==================== CAMPAIGN SCHEDULER & DISPATCH WORKER ====================
+# Planificateur asyncio en processus: réclame atomiquement les campagnes programmées
+# arrivées à échéance (find_one_and_update => un seul worker les lance), puis envoie
+# les messages via un pool d'adaptateurs par canal, limités en débit, et enregistre
+# les résultats par lots.
+
+# Désactivé par défaut: à activer explicitement (envois réels via Twilio/EmailJS en mode "live")
+CAMPAIGN_SCHEDULER_ENABLED = os.environ.get("CAMPAIGN_SCHEDULER_ENABLED", "false").lower() == "true"
+CAMPAIGN_SCHEDULER_INTERVAL = float(os.environ.get("CAMPAIGN_SCHEDULER_INTERVAL", "30"))
+CAMPAIGN_DISPATCH_MODE = os.environ.get("CAMPAIGN_DISPATCH_MODE", "live")  # "live" ou "local" (adaptateurs de test)
+CAMPAIGN_DISPATCH_BATCH_SIZE = int(os.environ.get("CAMPAIGN_DISPATCH_BATCH_SIZE", "50"))
+CAMPAIGN_DISPATCH_LEASE_SECONDS = int(os.environ.get("CAMPAIGN_DISPATCH_LEASE_SECONDS", "300"))
+# Au-delà de ce retard, une campagne programmée n'est plus envoyée: elle passe en 'missed'
+CAMPAIGN_SCHEDULE_MAX_LATENESS_HOURS = float(os.environ.get("CAMPAIGN_SCHEDULE_MAX_LATENESS_HOURS", "6"))
+# Fuseau des dates programmées saisies sans fuseau par le dashboard ("2025-12-25T10:00:00")
+CAMPAIGN_SCHEDULE_TIMEZONE = ZoneInfo(os.environ.get("CAMPAIGN_SCHEDULE_TIMEZONE", "Europe/Zurich"))
+# Débit par canal (messages/seconde)
+CAMPAIGN_CHANNEL_RATES = {
+    "whatsapp": float(os.environ.get("CAMPAIGN_RATE_WHATSAPP", "1")),
+    "email": float(os.environ.get("CAMPAIGN_RATE_EMAIL", "2"))
+}
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+def _parse_scheduled_at(value) -> Optional[datetime]:
+    """scheduledAt -> BSON Date UTC; sans fuseau = heure de CAMPAIGN_SCHEDULE_TIMEZONE (ValueError si illisible)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=CAMPAIGN_SCHEDULE_TIMEZONE)
+    return value.astimezone(timezone.utc)
+
+class WhatsAppChannelAdapter(ChannelAdapter):
+    """Envoi WhatsApp via l'API Twilio (config en base: whatsapp_config)"""
+    channel = "whatsapp"
+    
+    async def send(self, result: dict, campaign: dict) -> tuple:
+        config = await db.whatsapp_config.find_one({"id": "whatsapp_config"}, {"_id": 0}) or {}
+        if not (config.get("accountSid") and config.get("authToken") and config.get("fromNumber")):
+            return False, "WhatsApp API non configuré"
+        to_number = format_phone_e164(result.get("contactPhone", ""))
+        if len(to_number) < 10:
+            return False, "Numéro de téléphone invalide"
+        
+        form = {
+            "From": f"whatsapp:{format_phone_e164(config['fromNumber'])}",
+            "To": f"whatsapp:{to_number}",
+            "Body": personalize_message(campaign.get("message", ""), result.get("contactName", ""))
+        }
+        if campaign.get("mediaUrl"):
+            form["MediaUrl"] = campaign["mediaUrl"]
+        response = await outbound_http.post(
+            f"https://api.twilio.com/2010-04-01/Accounts/{config['accountSid']}/Messages.json",
+            data=form,
+            auth=(config["accountSid"], config["authToken"])
+        )
+        if response.status_code >= 400:
+            return False, f"Twilio HTTP {response.status_code}"
+        return True, None
+
+class EmailChannelAdapter(ChannelAdapter):
+    """Envoi email via l'API REST EmailJS (config en base: emailjs_config)"""
+    channel = "email"
+    
+    async def send(self, result: dict, campaign: dict) -> tuple:
+        config = await db.emailjs_config.find_one({"id": "emailjs_config"}, {"_id": 0}) or {}
+        if not (config.get("serviceId") and config.get("templateId") and config.get("publicKey")):
+            return False, "EmailJS non configuré"
+        if "@" not in (result.get("contactEmail") or ""):
+            return False, "Email manquant"
+        
+        message = personalize_message(campaign.get("message", ""), result.get("contactName", ""))
+        if campaign.get("mediaUrl"):
+            message = f"{message}\n\n🔗 Voir le visuel: {campaign['mediaUrl']}"
+        response = await outbound_http.post("https://api.emailjs.com/api/v1.0/email/send", json={
+            "service_id": config["serviceId"],
+            "template_id": config["templateId"],
+            "user_id": config["publicKey"],
+            "template_params": {
+                "to_email": result.get("contactEmail"),
+                "to_name": result.get("contactName") or "Client",
+                "subject": campaign.get("name") or "Afroboost - Message",
+                "message": message,
+                "from_name": "Afroboost",
+                "reply_to": AUTHORIZED_COACH_EMAIL
+            }
+        })
+        if response.status_code >= 400:
+            return False, f"EmailJS HTTP {response.status_code}"
+        return True, None
+
+async def _record_campaign_results(campaign_id: str, updates: List[dict]) -> Optional[dict]:
+    """
+    Applique une liste de {contactId, channel, status} avec un bulk_write par statut cible,
+    puis un seul $inc des compteurs et une seule vérification de fin de campagne.
+    Les transitions pending -> X sont comptées exactement; un résultat 'failed' peut
+    être repassé en 'sent' (renvoi manuel).
+    """
+    now = datetime.now(timezone.utc)
+    by_status: Dict[str, List[dict]] = {}
+    for update in updates:
+        status = update.get("status", "sent")
+        if status not in ("sent", "failed"):
+            continue
+        by_status.setdefault(status, []).append(update)
+    
+    deltas: Dict[str, int] = {}
+    
+    async def apply(target: str, from_status: str, items: List[dict]) -> int:
+        operations = [
+            UpdateOne(
+                {"campaignId": campaign_id, "contactId": item.get("contactId"), "channel": item.get("channel"), "status": from_status},
+                {"$set": {
+                    "status": target,
+                    "sentAt": now if target == "sent" else None,
+                    "error": item.get("error")
+                }}
+            )
+            for item in items
+        ]
+        if not operations:
+            return 0
+        result = await db.campaign_results.bulk_write(operations, ordered=False)
+        if result.modified_count:
+            deltas[from_status] = deltas.get(from_status, 0) - result.modified_count
+            deltas[target] = deltas.get(target, 0) + result.modified_count
+        return result.modified_count
+    
+    for target, items in by_status.items():
+        modified = await apply(target, "pending", items)
+        # Renvois: seuls les éléments non trouvés en 'pending' peuvent venir de 'failed'
+        if target == "sent" and modified < len(items):
+            await apply("sent", "failed", items)
+    
+    return await _apply_campaign_counter_deltas(campaign_id, deltas)
+
+class CampaignResultUpdate(BaseModel):
+    contactId: str
+    channel: str
+    status: str = "sent"  # "sent" ou "failed"
+    error: Optional[str] = None
+
+class CampaignResultsBatch(BaseModel):
+    results: List[CampaignResultUpdate]
+
+@api_router.post("/campaigns/{campaign_id}/mark-sent/batch")
+async def mark_campaign_sent_batch(campaign_id: str, batch: CampaignResultsBatch):
+    """
+    Marque plusieurs résultats en une fois: bulk_write, un seul $inc des compteurs
+    et une seule vérification de fin de campagne. Retourne les compteurs à jour.
+    """
+    invalid = [r.status for r in batch.results if r.status not in ("sent", "failed")]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Statut invalide: {invalid[0]}")
+    
+    campaign = await _record_campaign_results(campaign_id, [r.model_dump() for r in batch.results])
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return {"success": True, "campaign": campaign}
+
+class CampaignScheduler:
+    """
+    Boucle de fond: reprend les lancements interrompus, déclenche les campagnes
+    programmées arrivées à échéance et envoie les campagnes en mode 'server'.
+    """
+    def __init__(self, pool: ChannelAdapterPool, interval: float, worker_id: str = WORKER_ID):
+        self.pool = pool
+        self.interval = interval
+        self.worker_id = worker_id
+        self.task: Optional[asyncio.Task] = None
+        self.last_tick_at: Optional[str] = None
+    
+    def start(self):
+        if not self.task:
+            self.task = asyncio.create_task(self._loop())
+            logger.info(f"[Scheduler] Démarré ({self.worker_id}, mode={self.pool.mode}, intervalle={self.interval}s)")
+            if self.pool.mode == "live":
+                logger.warning(
+                    "[Scheduler] Mode live: les campagnes programmées sont envoyées réellement (Twilio/EmailJS), "
+                    f"retard toléré {CAMPAIGN_SCHEDULE_MAX_LATENESS_HOURS}h"
+                )
+    
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.pool.close()
+    
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Scheduler] Erreur: {e}")
+            await asyncio.sleep(self.interval)
+    
+    async def tick(self):
+        self.last_tick_at = datetime.now(timezone.utc).isoformat()
+        await _resume_interrupted_launches()
+        await self._mark_missed_campaigns()
+        while await self._fire_next_due_campaign():
+            pass
+        while await self._dispatch_next_campaign():
+            pass
+    
+    async def _mark_missed_campaigns(self) -> int:
+        """Campagnes programmées trop en retard (serveur arrêté, planificateur activé après coup): jamais envoyées"""
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(hours=CAMPAIGN_SCHEDULE_MAX_LATENESS_HOURS)
+        result = await db.campaigns.update_many(
+            {"status": "scheduled", "scheduledAt": {"$lt": cutoff}},
+            {"$set": {"status": "missed", "updatedAt": now}}
+        )
+        if result.modified_count:
+            logger.warning(f"[Scheduler] {result.modified_count} campagne(s) programmée(s) manquée(s) (retard > {CAMPAIGN_SCHEDULE_MAX_LATENESS_HOURS}h)")
+        return result.modified_count
+    
+    async def _fire_next_due_campaign(self) -> bool:
+        """Réclame atomiquement une campagne programmée échue (dans la fenêtre de retard) et la lance"""
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(hours=CAMPAIGN_SCHEDULE_MAX_LATENESS_HOURS)
+        campaign = await db.campaigns.find_one_and_update(
+            {"status": "scheduled", "scheduledAt": {"$gte": cutoff, "$lte": now}},
+            {"$set": {
+                "status": "launching",
+                "dispatch": "server",
+                "claimedBy": self.worker_id,
+                "launchProgress": _new_launch_progress(now, "scheduled"),
+                **{field: 0 for field in CAMPAIGN_COUNTER_FIELDS},
+                "updatedAt": now
+            }, "$unset": {"dispatchFinishedAt": "", "dispatchLease": ""}},
+            projection={"_id": 0, "id": 1, "name": 1}
+        )
+        if not campaign:
+            return False
+        logger.info(f"[Scheduler] Lancement de la campagne programmée {campaign['id']} ({campaign.get('name')})")
+        await db.campaign_results.delete_many({"campaignId": campaign["id"]})
+        await _run_campaign_launch(campaign["id"])
+        return True
+    
+    async def _dispatch_next_campaign(self) -> bool:
+        """Prend le bail d'envoi d'une campagne 'server' et envoie ses résultats en attente"""
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex  # Identifie ce bail: chaque écriture de l'envoi le vérifie
+        campaign = await db.campaigns.find_one_and_update(
+            {
+                "status": "sending",
+                "dispatch": "server",
+                "dispatchFinishedAt": {"$exists": False},
+                "$or": [
+                    {"dispatchLease.expiresAt": {"$exists": False}},
+                    {"dispatchLease.expiresAt": {"$lt": now}},
+                    {"dispatchLease.expiresAt": {"$type": "string"}}  # Bail ISO d'une version précédente
+                ]
+            },
+            {"$set": {"dispatchLease": {
+                "owner": self.worker_id,
+                "token": token,
+                "expiresAt": now + timedelta(seconds=CAMPAIGN_DISPATCH_LEASE_SECONDS)
+            }}},
+            projection={"_id": 0, "id": 1, "name": 1, "message": 1, "mediaUrl": 1}
+        )
+        if not campaign:
+            return False
+        try:
+            await self._dispatch_campaign(campaign, token)
+        finally:
             await db.campaigns.update_one(
-                {"id": campaign_id},
-                {"$set": {"status": "completed", "updatedAt": datetime.now(timezone.utc).isoformat()}}
+                {"id": campaign["id"], "dispatchLease.token": token},
+                {"$unset": {"dispatchLease": ""}}
             )
+        return True
     
-    return {"success": True}
+    async def _renew_lease(self, campaign_id: str, token: str) -> bool:
+        """Prolonge le bail s'il appartient toujours à cet envoi (False: relancé ou repris ailleurs)"""
+        renewed = await db.campaigns.update_one(
+            {"id": campaign_id, "dispatchLease.token": token},
+            {"$set": {"dispatchLease.expiresAt": datetime.now(timezone.utc) + timedelta(seconds=CAMPAIGN_DISPATCH_LEASE_SECONDS)}}
+        )
+        if not renewed.matched_count:
+            logger.warning(f"[Scheduler] Bail d'envoi perdu pour la campagne {campaign_id}")
+        return renewed.matched_count == 1
+    
+    async def _dispatch_campaign(self, campaign: dict, token: str):
+        campaign_id = campaign["id"]
+        channels = list(self.pool.adapters.keys())
+        last_seq = -1
+        while True:
+            batch = await db.campaign_results.find(
+                {"campaignId": campaign_id, "status": "pending", "channel": {"$in": channels}, "seq": {"$gt": last_seq}},
+                {"_id": 0}
+            ).sort("seq", ASCENDING).limit(CAMPAIGN_DISPATCH_BATCH_SIZE).to_list(CAMPAIGN_DISPATCH_BATCH_SIZE)
+            if not batch:
+                break
+            last_seq = batch[-1]["seq"]
+            
+            # Bail vérifié (et prolongé) avant d'envoyer et avant d'écrire: une relance manuelle ou
+            # une reprise par un autre worker arrête cet envoi sans toucher à leurs résultats
+            if not await self._renew_lease(campaign_id, token):
+                return
+            outcomes = await asyncio.gather(*[self.pool.send(result, campaign) for result in batch])
+            updates = [
+                {"contactId": r["contactId"], "channel": r["channel"], "status": "sent" if ok else "failed", "error": error}
+                for r, (ok, error) in zip(batch, outcomes)
+            ]
+            if not await self._renew_lease(campaign_id, token):
+                return
+            await _record_campaign_results(campaign_id, updates)
+        
+        # Canaux sans adaptateur (ex: Instagram): restent à envoyer manuellement depuis le dashboard
+        await db.campaigns.update_one(
+            {"id": campaign_id, "dispatchLease.token": token},
+            {"$set": {"dispatchFinishedAt": datetime.now(timezone.utc)}}
+        )
+        logger.info(f"[Scheduler] Envoi terminé pour la campagne {campaign_id}")
+
+campaign_scheduler = CampaignScheduler(
+    ChannelAdapterPool(
+        CAMPAIGN_DISPATCH_MODE,
+        CAMPAIGN_CHANNEL_RATES,
+        live_adapters={"whatsapp": WhatsAppChannelAdapter, "email": EmailChannelAdapter}
+    ),
+    CAMPAIGN_SCHEDULER_INTERVAL
+)
+
+@api_router.get("/campaign-scheduler/status")
+async def get_campaign_scheduler_status():
+    """État du planificateur de ce worker (mode, débits, dernier passage)"""
+    status = {
+        "enabled": CAMPAIGN_SCHEDULER_ENABLED,
+        "running": campaign_scheduler.task is not None,
+        "workerId": campaign_scheduler.worker_id,
+        "mode": campaign_scheduler.pool.mode,
+        "rates": campaign_scheduler.pool.rates,
+        "lastTickAt": campaign_scheduler.last_tick_at
+    }
+    if campaign_scheduler.pool.mode == "local":
+        status["localSent"] = {
+            channel: len(adapter.sent) for channel, adapter in campaign_scheduler.pool.adapters.items()
+        }
+    return status
 
 # --- Payment Links ---
 @api_router.get("/payment-links", response_model=PaymentLinks)
-async def get_payment_links():
+async def get_payment_links(request: Request, response: Response):
+    headers, not_modified = await _catalog_validators(request, "payment_links")
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
     links = await db.payment_links.find_one({"id": "payment_links"}, {"_id": 0})
-    if not links:
-        default_links = PaymentLinks().model_dump()
-        await db.payment_links.insert_one(default_links)
-        return default_links
-    return links
+    return links or PaymentLinks().model_dump()
 
 @api_router.put("/payment-links")
 async def update_payment_links(links: PaymentLinksUpdate):
@@ -1562,17 +3211,18 @@ async def update_payment_links(links: PaymentLinksUpdate):
         {"$set": links.model_dump()}, 
         upsert=True
     )
+    await _bump_collection_version("payment_links")
     return await db.payment_links.find_one({"id": "payment_links"}, {"_id": 0})
 
 # --- Concept ---
 @api_router.get("/concept", response_model=Concept)
-async def get_concept():
+async def get_concept(request: Request, response: Response):
+    headers, not_modified = await _catalog_validators(request, "concept")
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
     concept = await db.concept.find_one({"id": "concept"}, {"_id": 0})
-    if not concept:
-        default_concept = Concept().model_dump()
-        await db.concept.insert_one(default_concept)
-        return default_concept
-    return concept
+    return concept or Concept().model_dump()
 
 @api_router.put("/concept")
 async def update_concept(concept: ConceptUpdate):
@@ -1581,6 +3231,7 @@ async def update_concept(concept: ConceptUpdate):
         print(f"Updating concept with: {updates}")
         result = await db.concept.update_one({"id": "concept"}, {"$set": updates}, upsert=True)
         print(f"Update result: matched={result.matched_count}, modified={result.modified_count}")
+        await _bump_collection_version("concept")
         updated = await db.concept.find_one({"id": "concept"}, {"_id": 0})
         return updated
     except Exception as e:
@@ -1591,11 +3242,7 @@ async def update_concept(concept: ConceptUpdate):
 @api_router.get("/config", response_model=AppConfig)
 async def get_config():
     config = await db.config.find_one({"id": "app_config"}, {"_id": 0})
-    if not config:
-        default_config = AppConfig().model_dump()
-        await db.config.insert_one(default_config)
-        return default_config
-    return config
+    return config or AppConfig().model_dump()
 
 @api_router.put("/config")
 async def update_config(config_update: dict):
@@ -1633,6 +3280,110 @@ class GoogleUser(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     last_login: Optional[datetime] = None
 
+# ========== CACHE DES SESSIONS AUTHENTIFIÉES ==========
+# /auth/me et les routes coach sont appelées à chaque écran du dashboard.
+# Le principal (session + utilisateur) est gardé dans un LRU borné (auth_cache.PrincipalCache).
+# Un échec de cache fait une seule requête (coach_sessions $lookup google_users).
+# Les révocations incrémentent la version "auth_revocations" (collection_versions): les autres
+# workers la relisent au plus toutes les AUTH_REVOCATION_POLL_SECONDS et vident leur cache.
+
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "1024"))
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_REVOCATION_POLL_SECONDS = float(os.environ.get("AUTH_REVOCATION_POLL_SECONDS", "1"))
+
+def _as_utc_datetime(value) -> Optional[datetime]:
+    """Convertit une date ISO (str) ou naïve en datetime UTC"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+principal_cache = PrincipalCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS, AUTH_REVOCATION_POLL_SECONDS)
+
+async def _revoke_principals(token: str = None, user_id: str = None, email: str = None):
+    """Révocation immédiate sur ce worker, propagée aux autres par la version partagée"""
+    if token:
+        principal_cache.invalidate_token(token)
+    if user_id or email:
+        principal_cache.invalidate_user(user_id=user_id, email=email)
+    await _bump_collection_version("auth_revocations")
+
+async def _sync_auth_revocations():
+    if principal_cache.revocation_check_due():
+        version = await _collection_version("auth_revocations")
+        principal_cache.sync_revocations((version["epoch"], version["v"]))
+
+async def _ensure_auth_indexes():
+    """Index utilisés par la recherche session -> utilisateur"""
+    await db.coach_sessions.create_index("session_token", name="session_token")
+    await db.coach_sessions.create_index("user_id", name="session_user_id")
+    await db.google_users.create_index("user_id", name="google_user_id")
+
+def _session_token_from_request(request: Request) -> Optional[str]:
+    """Token depuis le cookie ou le header Authorization"""
+    session_token = request.cookies.get("coach_session_token")
+    if not session_token:
+        auth_header = request.headers.get("Authorization", "")
+        if auth_header.startswith("Bearer "):
+            session_token = auth_header[7:]
+    return session_token
+
+async def _load_principal(session_token: str) -> tuple:
+    """Session + utilisateur en une seule requête. Retourne (session, user) ou (None, None)"""
+    pipeline = [
+        {"$match": {"session_token": session_token}},
+        {"$limit": 1},
+        {"$lookup": {"from": "google_users", "localField": "user_id", "foreignField": "user_id", "as": "user"}},
+        {"$project": {"_id": 0, "user._id": 0}}
+    ]
+    rows = await db.coach_sessions.aggregate(pipeline).to_list(1)
+    if not rows:
+        return None, None
+    session = rows[0]
+    users = session.pop("user", [])
+    return session, (users[0] if users else None)
+
+async def require_coach(request: Request) -> dict:
+    """
+    Dépendance FastAPI: retourne le coach authentifié ou lève 401.
+    Utilisable par toutes les routes coach: Depends(require_coach)
+    """
+    session_token = _session_token_from_request(request)
+    if not session_token:
+        raise HTTPException(status_code=401, detail="Non authentifié")
+    
+    await _sync_auth_revocations()
+    principal = principal_cache.get(session_token)
+    if principal:
+        return principal
+    
+    session, user = await _load_principal(session_token)
+    if not session:
+        raise HTTPException(status_code=401, detail="Session invalide")
+    
+    # Vérifier l'expiration
+    expires_at = _as_utc_datetime(session.get("expires_at"))
+    if expires_at < datetime.now(timezone.utc):
+        await db.coach_sessions.delete_one({"session_token": session_token})
+        raise HTTPException(status_code=401, detail="Session expirée")
+    
+    if not user:
+        raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
+    
+    principal = {
+        "user_id": user.get("user_id"),
+        "email": user.get("email"),
+        "name": user.get("name"),
+        "picture": user.get("picture"),
+        "is_coach": user.get("is_coach", True),
+        "is_super_admin": user.get("is_super_admin", user.get("email", "").lower() == AUTHORIZED_COACH_EMAIL.lower())
+    }
+    principal_cache.put(session_token, principal, expires_at)
+    return principal
+
 @api_router.post("/auth/google/session")
 async def process_google_session(request: Request, response: Response):
     """
@@ -1648,18 +3399,16 @@ async def process_google_session(request: Request, response: Response):
         if not session_id:
             raise HTTPException(status_code=400, detail="session_id requis")
         
-        # Appeler l'API Emergent pour récupérer les données de session
-        import httpx
-        async with httpx.AsyncClient() as client:
-            emergent_response = await client.get(
-                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers={"X-Session-ID": session_id}
-            )
-            
-            if emergent_response.status_code != 200:
-                raise HTTPException(status_code=401, detail="Session invalide ou expirée")
-            
-            user_data = emergent_response.json()
+        # Appeler l'API Emergent pour récupérer les données de session (client HTTP partagé)
+        emergent_response = await outbound_http.get(
+            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
+            headers={"X-Session-ID": session_id}
+        )
+        
+        if emergent_response.status_code != 200:
+            raise HTTPException(status_code=401, detail="Session invalide ou expirée")
+        
+        user_data = emergent_response.json()
         
         email = user_data.get("email", "").lower()
         name = user_data.get("name", "")
@@ -1722,6 +3471,7 @@ async def process_google_session(request: Request, response: Response):
         # Créer la session
         expires_at = datetime.now(timezone.utc) + timedelta(days=7)
         await db.coach_sessions.delete_many({"user_id": user_id})  # Supprimer les anciennes sessions
+        await _revoke_principals(user_id=user_id)
         await db.coach_sessions.insert_one({
             "session_id": str(uuid.uuid4()),
             "user_id": user_id,
@@ -1730,8 +3480,8 @@ async def process_google_session(request: Request, response: Response):
             "is_super_admin": is_super_admin,
             "subscription_active": subscription_active,
             "session_token": session_token,
-            "expires_at": expires_at.isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "expires_at": expires_at,  # BSON Date: expiration gérée par l'index TTL
+            "created_at": datetime.now(timezone.utc)
         })
         
         # Définir le cookie httpOnly
@@ -1765,69 +3515,23 @@ async def process_google_session(request: Request, response: Response):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/auth/me")
-async def get_current_user(request: Request):
+async def get_current_user(principal: dict = Depends(require_coach)):
     """
     Vérifie la session actuelle et retourne les infos utilisateur.
     Utilisé pour vérifier si l'utilisateur est connecté.
     """
-    # Récupérer le token depuis le cookie ou le header Authorization
-    session_token = request.cookies.get("coach_session_token")
-    
-    if not session_token:
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            session_token = auth_header[7:]
-    
-    if not session_token:
-        raise HTTPException(status_code=401, detail="Non authentifié")
-    
-    # Vérifier la session
-    session = await db.coach_sessions.find_one(
-        {"session_token": session_token},
-        {"_id": 0}
-    )
-    
-    if not session:
-        raise HTTPException(status_code=401, detail="Session invalide")
-    
-    # Vérifier l'expiration
-    expires_at = session.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
-    if expires_at < datetime.now(timezone.utc):
-        await db.coach_sessions.delete_one({"session_token": session_token})
-        raise HTTPException(status_code=401, detail="Session expirée")
-    
-    # Récupérer l'utilisateur
-    user = await db.google_users.find_one(
-        {"user_id": session.get("user_id")},
-        {"_id": 0}
-    )
-    
-    if not user:
-        raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
-    
-    return {
-        "user_id": user.get("user_id"),
-        "email": user.get("email"),
-        "name": user.get("name"),
-        "picture": user.get("picture"),
-        "is_coach": user.get("is_coach", True),
-        "is_super_admin": user.get("is_super_admin", user.get("email", "").lower() == AUTHORIZED_COACH_EMAIL.lower())
-    }
+    return principal
 
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response):
     """
     Déconnexion: supprime la session et le cookie.
     """
-    session_token = request.cookies.get("coach_session_token")
+    session_token = _session_token_from_request(request)  # Cookie ou Authorization: Bearer
     
     if session_token:
         await db.coach_sessions.delete_many({"session_token": session_token})
+        await _revoke_principals(token=session_token)
     
     response.delete_cookie(
         key="coach_session_token",
@@ -1840,11 +3544,15 @@ async def logout(request: Request, response: Response):
 
 # ==================== COACH MANAGEMENT (Super Admin Only) ====================
 
+COACHES_LIST = ListSpec(
+    filters={"coachEmail": str, "subscriptionActive": bool, "liveServiceEnabled": bool},
+    sorts=("coachEmail", "coachName", "createdAt")
+)
+
 @api_router.get("/coaches")
-async def get_all_coaches():
+async def get_all_coaches(request: Request):
     """Récupère la liste des coachs enregistrés (Super Admin seulement)"""
-    coaches = await db.coach_subscriptions.find({}, {"_id": 0}).to_list(100)
-    return coaches
+    return await list_response(COACHES_LIST, db.coach_subscriptions, request.query_params)
 
 @api_router.post("/coaches")
 async def register_coach(coach_data: dict):
@@ -1892,6 +3600,7 @@ async def update_coach(coach_email: str, coach_data: dict):
             {"coachEmail": coach_email.lower()},
             {"$set": update_fields}
         )
+        await _revoke_principals(email=coach_email)
     
     updated = await db.coach_subscriptions.find_one({"coachEmail": coach_email.lower()}, {"_id": 0})
     return {"success": True, "coach": updated}
@@ -1902,6 +3611,7 @@ async def delete_coach(coach_email: str):
     result = await db.coach_subscriptions.delete_one({"coachEmail": coach_email.lower()})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Coach non trouvé")
+    await _revoke_principals(email=coach_email)
     return {"success": True}
 
 @api_router.get("/live-service-status")
@@ -1929,45 +3639,37 @@ async def get_live_service_status(coach_email: str = None):
 
 # ==================== FILTERED DATA ENDPOINTS (For Coach Dashboard) ====================
 
+def _coach_catalog_query(coach_email: Optional[str], include_all: bool) -> dict:
+    """Super Admin (ou include_all): tout; coach normal: ses éléments + ceux sans auteur assigné"""
+    if include_all or (coach_email and coach_email.lower() == AUTHORIZED_COACH_EMAIL.lower()):
+        return {}
+    return {"$or": [
+        {"authorEmail": coach_email},
+        {"authorEmail": None},
+        {"authorEmail": {"$exists": False}}
+    ]}
+
+# Documents complets (liste libre), mêmes paramètres limit/cursor/fields/sort que les listes publiques
+COACH_COURSES_LIST = ListSpec(sorts=("name", "weekday", "time"))
+COACH_OFFERS_LIST = ListSpec(sorts=("name", "price", "stock"))
+
 @api_router.get("/coach/courses")
-async def get_coach_courses(coach_email: str = None, include_all: bool = False):
+async def get_coach_courses(request: Request, coach_email: str = None, include_all: bool = False):
     """
-    Récupère les cours filtrés par coach.
+    Récupère les cours filtrés par coach (liste complète, ou paginée avec limit/cursor).
     - Si include_all=True ou coach_email est Super Admin: retourne tous les cours
     - Sinon: retourne uniquement les cours de ce coach OU les cours sans auteur assigné
     """
-    if include_all or (coach_email and coach_email.lower() == AUTHORIZED_COACH_EMAIL.lower()):
-        # Super Admin voit tout
-        courses = await db.courses.find({}, {"_id": 0}).to_list(100)
-    else:
-        # Coach normal: voit ses cours + les cours sans auteur
-        courses = await db.courses.find(
-            {"$or": [
-                {"authorEmail": coach_email},
-                {"authorEmail": None},
-                {"authorEmail": {"$exists": False}}
-            ]},
-            {"_id": 0}
-        ).to_list(100)
-    return courses
+    query = _coach_catalog_query(coach_email, include_all)
+    return await list_response(COACH_COURSES_LIST, db.courses, request.query_params, query=query)
 
 @api_router.get("/coach/offers")
-async def get_coach_offers(coach_email: str = None, include_all: bool = False):
+async def get_coach_offers(request: Request, coach_email: str = None, include_all: bool = False):
     """
-    Récupère les offres filtrées par coach.
+    Récupère les offres filtrées par coach (liste complète, ou paginée avec limit/cursor).
     """
-    if include_all or (coach_email and coach_email.lower() == AUTHORIZED_COACH_EMAIL.lower()):
-        offers = await db.offers.find({}, {"_id": 0}).to_list(100)
-    else:
-        offers = await db.offers.find(
-            {"$or": [
-                {"authorEmail": coach_email},
-                {"authorEmail": None},
-                {"authorEmail": {"$exists": False}}
-            ]},
-            {"_id": 0}
-        ).to_list(100)
-    return offers
+    query = _coach_catalog_query(coach_email, include_all)
+    return await list_response(COACH_OFFERS_LIST, db.offers, request.query_params, query=query)
 
 @api_router.get("/coach/reservations")
 async def get_coach_reservations(
@@ -1995,7 +3697,7 @@ async def get_coach_reservations(
                 {"authorEmail": {"$exists": False}}
             ]},
             {"id": 1, "_id": 0}
-        ).to_list(100)
+        ).to_list(None)
         course_ids = [c.get("id") for c in coach_courses if c.get("id")]
         
         # Filtrer les réservations par ces cours
@@ -2038,6 +3740,16 @@ async def coach_login(login: CoachLogin):
 # ==================== FEATURE FLAGS API (Super Admin Only) ====================
 # Business: Seul le Super Admin peut activer/désactiver les services globaux
 
+# Config par défaut (tout désactivé), insérée au démarrage si absente
+DEFAULT_FEATURE_FLAGS = {
+    "id": "feature_flags",
+    "AUDIO_SERVICE_ENABLED": False,
+    "VIDEO_SERVICE_ENABLED": False,
+    "STREAMING_SERVICE_ENABLED": False,
+    "updatedAt": None,
+    "updatedBy": None
+}
+
 @api_router.get("/feature-flags")
 async def get_feature_flags():
     """
@@ -2045,20 +3757,7 @@ async def get_feature_flags():
     Par défaut, tous les services additionnels sont désactivés
     """
     flags = await db.feature_flags.find_one({"id": "feature_flags"}, {"_id": 0})
-    if not flags:
-        # Créer la config par défaut (tout désactivé)
-        default_flags = {
-            "id": "feature_flags",
-            "AUDIO_SERVICE_ENABLED": False,
-            "VIDEO_SERVICE_ENABLED": False,
-            "STREAMING_SERVICE_ENABLED": False,
-            "updatedAt": None,
-            "updatedBy": None
-        }
-        await db.feature_flags.insert_one(default_flags.copy())  # .copy() pour éviter mutation
-        # Retourner sans _id
-        return {k: v for k, v in default_flags.items() if k != "_id"}
-    return flags
+    return flags or dict(DEFAULT_FEATURE_FLAGS)
 
 @api_router.put("/feature-flags")
 async def update_feature_flags(update: FeatureFlagsUpdate):
@@ -2080,6 +3779,23 @@ async def update_feature_flags(update: FeatureFlagsUpdate):
 # ==================== COACH SUBSCRIPTION API ====================
 # Business: Gestion des abonnements et droits des coachs
 
+def _default_coach_subscription(coach_email: str) -> dict:
+    """Abonnement par défaut (free, sans services additionnels)"""
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "id": str(uuid.uuid4()),
+        "coachEmail": coach_email,
+        "hasAudioService": False,
+        "hasVideoService": False,
+        "hasStreamingService": False,
+        "subscriptionPlan": "free",
+        "subscriptionStartDate": now,
+        "subscriptionEndDate": None,
+        "isActive": True,
+        "createdAt": now,
+        "updatedAt": None
+    }
+
 @api_router.get("/coach-subscription")
 async def get_coach_subscription():
     """
@@ -2099,26 +3815,8 @@ async def get_coach_subscription():
         {"_id": 0}
     )
     
-    if not subscription:
-        # Créer un abonnement par défaut (free, sans services additionnels)
-        default_sub = {
-            "id": str(uuid.uuid4()),
-            "coachEmail": coach_email,
-            "hasAudioService": False,
-            "hasVideoService": False,
-            "hasStreamingService": False,
-            "subscriptionPlan": "free",
-            "subscriptionStartDate": datetime.now(timezone.utc).isoformat(),
-            "subscriptionEndDate": None,
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc).isoformat(),
-            "updatedAt": None
-        }
-        await db.coach_subscriptions.insert_one(default_sub.copy())  # .copy() pour éviter mutation
-        # Retourner sans _id
-        return {k: v for k, v in default_sub.items() if k != "_id"}
-    
-    return subscription
+    # Abonnement par défaut (créé au démarrage, ou au premier PUT qui fait un upsert)
+    return subscription or _default_coach_subscription(coach_email)
 
 @api_router.put("/coach-subscription")
 async def update_coach_subscription(update: CoachSubscriptionUpdate):
@@ -2275,13 +3973,64 @@ class MigrationData(BaseModel):
     reservations: Optional[List[dict]] = None
     coachAuth: Optional[dict] = None
 
+# Réservations importées par lots: une requête $in + un insert_many par lot
+MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", "500"))
+
+async def _import_reservations(reservations: List[dict]) -> tuple:
+    """(insérées, ignorées): ignorées = sans code, en double dans l'envoi ou déjà en base"""
+    inserted = skipped = 0
+    seen = set()
+    pending = []
+    for res in reservations:
+        code = res.get("reservationCode")
+        if not code or code in seen:
+            skipped += 1
+            continue
+        seen.add(code)
+        pending.append(res)
+    
+    for start in range(0, len(pending), MIGRATION_BATCH_SIZE):
+        batch = pending[start:start + MIGRATION_BATCH_SIZE]
+        codes = [res["reservationCode"] for res in batch]
+        # Index reservation_code: une seule requête couverte pour tout le lot
+        existing = {
+            doc["reservationCode"]
+            for doc in await db.reservations.find(
+                {"reservationCode": {"$in": codes}}, {"_id": 0, "reservationCode": 1}
+            ).to_list(None)
+        }
+        docs = []
+        for res in batch:
+            if res["reservationCode"] in existing:
+                skipped += 1
+                continue
+            doc = {k: v for k, v in res.items() if k != "_id"}
+            try:
+                # Même format de stockage que les réservations créées par l'API (BSON Date)
+                doc["createdAt"] = _as_utc_datetime(doc.get("createdAt")) or datetime.now(timezone.utc)
+            except (AttributeError, TypeError, ValueError):
+                doc["createdAt"] = datetime.now(timezone.utc)
+            docs.append(doc)
+        if not docs:
+            continue
+        try:
+            inserted += len((await db.reservations.insert_many(docs, ordered=False)).inserted_ids)
+        except BulkWriteError as e:
+            # Index uniques (ex: stripeSessionId): doublons ignorés, le reste du lot est inséré
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            skipped += len(errors)
+    return inserted, skipped
+
 @api_router.post("/migrate-data")
 async def migrate_localstorage_to_mongodb(data: MigrationData):
     """
     Endpoint pour migrer les données du localStorage vers MongoDB.
     Appelé une seule fois lors de la première utilisation après la migration.
     """
-    migrated = {"emailJS": False, "whatsApp": False, "ai": False, "reservations": 0, "coachAuth": False}
+    migrated = {"emailJS": False, "whatsApp": False, "ai": False, "reservations": 0, "reservationsSkipped": 0, "coachAuth": False}
     
     # Migration EmailJS Config
     if data.emailJSConfig and data.emailJSConfig.get("serviceId"):
@@ -2318,12 +4067,7 @@ async def migrate_localstorage_to_mongodb(data: MigrationData):
     
     # Migration Reservations
     if data.reservations:
-        for res in data.reservations:
-            if res.get("reservationCode"):
-                existing = await db.reservations.find_one({"reservationCode": res["reservationCode"]})
-                if not existing:
-                    await db.reservations.insert_one(res)
-                    migrated["reservations"] += 1
+        migrated["reservations"], migrated["reservationsSkipped"] = await _import_reservations(data.reservations)
     
     # Migration Coach Auth
     if data.coachAuth:
@@ -2401,11 +4145,7 @@ class WhatsAppWebhook(BaseModel):
 @api_router.get("/ai-config")
 async def get_ai_config():
     config = await db.ai_config.find_one({"id": "ai_config"}, {"_id": 0})
-    if not config:
-        default_config = AIConfig().model_dump()
-        await db.ai_config.insert_one(default_config)
-        return default_config
-    return config
+    return config or AIConfig().model_dump()
 
 @api_router.put("/ai-config")
 async def update_ai_config(config: AIConfigUpdate):
@@ -2416,7 +4156,7 @@ async def update_ai_config(config: AIConfigUpdate):
 # --- AI Logs Routes ---
 @api_router.get("/ai-logs")
 async def get_ai_logs():
-    logs = await db.ai_logs.find({}, {"_id": 0}).sort("timestamp", -1).to_list(50)
+    logs = await db_analytics.ai_logs.find({}, {"_id": 0}).sort("timestamp", -1).to_list(50)
     return logs
 
 @api_router.delete("/ai-logs")
@@ -2574,11 +4314,12 @@ async def test_ai_response(data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Leads Routes (Widget IA) ---
+LEADS_LIST = ListSpec(filters={"source": str, "email": str}, sorts=("createdAt", "firstName"), default_sort="-createdAt")
+
 @api_router.get("/leads")
-async def get_leads():
+async def get_leads(request: Request):
     """Récupère tous les leads capturés via le widget IA"""
-    leads = await db.leads.find({}, {"_id": 0}).sort("createdAt", -1).to_list(500)
-    return leads
+    return await list_response(LEADS_LIST, db_analytics.leads, request.query_params)
 
 @api_router.post("/leads")
 async def create_lead(lead: Lead):
@@ -2587,7 +4328,7 @@ async def create_lead(lead: Lead):
     
     lead_data = lead.model_dump()
     lead_data["id"] = f"lead_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{lead.whatsapp[-4:]}"
-    lead_data["createdAt"] = datetime.now(timezone.utc).isoformat()
+    lead_data["createdAt"] = datetime.now(timezone.utc)
     
     # Vérifier si le lead existe déjà (même email ou WhatsApp)
     existing = await db.leads.find_one({
@@ -2697,6 +4438,22 @@ async def chat_with_ai(data: ChatMessage):
 
 # ==================== STRIPE CHECKOUT INTEGRATION ====================
 
+# Durée de vie des transactions 'pending' (checkout Stripe abandonné)
+PAYMENT_PENDING_TTL_HOURS = int(os.environ.get("PAYMENT_PENDING_TTL_HOURS", "48"))
+
+# Instances StripeCheckout réutilisées (une par webhook_url) au lieu d'une par requête
+_stripe_checkout_clients: Dict[tuple, StripeCheckout] = {}
+
+def _get_stripe_checkout(webhook_url: str = "") -> StripeCheckout:
+    stripe_api_key = os.environ.get('STRIPE_API_KEY')
+    if not stripe_api_key:
+        raise HTTPException(status_code=500, detail="Stripe API key not configured")
+    key = (stripe_api_key, webhook_url)
+    checkout = _stripe_checkout_clients.get(key)
+    if checkout is None:
+        checkout = _stripe_checkout_clients[key] = StripeCheckout(api_key=stripe_api_key, webhook_url=webhook_url)
+    return checkout
+
 class StripeCheckoutRequest(BaseModel):
     """Request model for Stripe checkout"""
     offer_id: str
@@ -2707,6 +4464,9 @@ class StripeCheckoutRequest(BaseModel):
     course_id: str
     course_name: str
     origin_url: str  # URL du frontend pour redirect
+    quantity: int = 1
+    selected_dates: Optional[List[str]] = None  # Dates ISO des séances choisies
+    course_datetime: Optional[str] = None  # Date ISO de la séance si une seule date
 
 @api_router.post("/stripe/create-checkout")
 async def create_stripe_checkout(request: Request, checkout_data: StripeCheckoutRequest):
@@ -2715,10 +4475,6 @@ async def create_stripe_checkout(request: Request, checkout_data: StripeCheckout
     La réservation sera validée uniquement après réception du webhook checkout.session.completed.
     """
     try:
-        stripe_api_key = os.environ.get('STRIPE_API_KEY')
-        if not stripe_api_key:
-            raise HTTPException(status_code=500, detail="Stripe API key not configured")
-        
         # URLs de redirection
         host_url = str(request.base_url).rstrip('/')
         webhook_url = f"{host_url}/api/webhook/stripe"
@@ -2748,8 +4504,11 @@ async def create_stripe_checkout(request: Request, checkout_data: StripeCheckout
             "coach_amount": str(coach_amount)
         }
         
-        # Initialiser Stripe Checkout
-        stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url=webhook_url)
+        # Stripe Checkout (instance partagée)
+        stripe_checkout = _get_stripe_checkout(webhook_url)
+        
+        # Stock et casques réservés temporairement jusqu'au paiement ou à l'expiration (409 si complet)
+        inventory = await _hold_checkout_inventory(checkout_data)
         
         # Créer la session de paiement avec TWINT activé pour la Suisse
         # TWINT nécessite d'être activé dans le dashboard Stripe:
@@ -2763,9 +4522,14 @@ async def create_stripe_checkout(request: Request, checkout_data: StripeCheckout
             payment_methods=["card", "twint"]  # TWINT activé pour les clients suisses
         )
         
-        session: CheckoutSessionResponse = await stripe_checkout.create_checkout_session(checkout_request)
+        try:
+            session: CheckoutSessionResponse = await stripe_checkout.create_checkout_session(checkout_request)
+        except Exception:
+            await _release_inventory(inventory, "held")
+            raise
         
         # Créer une transaction de paiement PENDING dans la base
+        now = datetime.now(timezone.utc)
         payment_transaction = {
             "id": str(uuid.uuid4()),
             "session_id": session.session_id,
@@ -2774,9 +4538,19 @@ async def create_stripe_checkout(request: Request, checkout_data: StripeCheckout
             "currency": "chf",
             "payment_status": "pending",
             "metadata": metadata,
-            "createdAt": datetime.now(timezone.utc).isoformat()
+            "createdAt": now,
+            # Checkout abandonné: supprimé par l'index TTL (retiré dès que la transaction est payée)
+            "expiresAt": now + timedelta(hours=PAYMENT_PENDING_TTL_HOURS),
+            "inventory": inventory,
+            "holdStatus": "held",
+            "holdExpiresAt": now + timedelta(minutes=CHECKOUT_HOLD_MINUTES)
         }
-        await db.payment_transactions.insert_one(payment_transaction)
+        try:
+            await db.payment_transactions.insert_one(payment_transaction)
+        except Exception:
+            # Sans transaction locale ni URL renvoyée, la session ne sera pas payée: rien ne libérerait le hold
+            await _release_inventory(inventory, "held")
+            raise
         
         logger.info(f"[Stripe] Session créée: {session.session_id} pour {checkout_data.user_email}")
         
@@ -2786,91 +4560,230 @@ async def create_stripe_checkout(request: Request, checkout_data: StripeCheckout
             "reservation_code": temp_reservation_code
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[Stripe] Erreur création checkout: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Statut de paiement: état local d'abord, API Stripe uniquement pour les sessions encore 'pending'
+STRIPE_STATUS_CACHE_SECONDS = float(os.environ.get("STRIPE_STATUS_CACHE_SECONDS", "3"))
+# payment_status local terminal -> (status de session, payment_status) tels que renvoyés par Stripe
+STRIPE_TERMINAL_STATUSES = {"paid": ("complete", "paid"), "expired": ("expired", "unpaid")}
+_stripe_status_cache: Dict[str, tuple] = {}  # session_id -> (expiration monotonic, réponse pending)
+_stripe_status_inflight: Dict[str, asyncio.Future] = {}
+
+def _local_checkout_status(transaction: dict) -> dict:
+    status, payment_status = STRIPE_TERMINAL_STATUSES[transaction["payment_status"]]
+    return {
+        "status": status,
+        "payment_status": payment_status,
+        "amount_total": int(round(float(transaction.get("amount", 0)) * 100)),  # centimes, comme Stripe
+        "currency": transaction.get("currency", "chf"),
+        "metadata": transaction.get("metadata", {})
+    }
+
+async def _fetch_checkout_status(session_id: str) -> dict:
+    """Interroge Stripe et reporte un état terminal sur la transaction locale"""
+    stripe_checkout = _get_stripe_checkout()
+    status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
+    
+    if status.payment_status == "paid":
+        # Même transition atomique que le webhook: un seul des deux crée la réservation
+        await _complete_paid_checkout(session_id, status.metadata)
+    elif status.status == "expired":
+        # Terminal: les polls suivants sont servis localement (l'index TTL supprime ensuite la ligne)
+        await db.payment_transactions.update_one(
+            {"session_id": session_id, "payment_status": "pending"},
+            {"$set": {"payment_status": "expired"}}
+        )
+        await _release_checkout_hold(session_id)
+    
+    result = {
+        "status": status.status,
+        "payment_status": status.payment_status,
+        "amount_total": status.amount_total,
+        "currency": status.currency,
+        "metadata": status.metadata
+    }
+    if status.payment_status != "paid" and status.status != "expired":
+        now = time.monotonic()
+        if len(_stripe_status_cache) >= 1000:
+            for key in [k for k, (expires, _) in _stripe_status_cache.items() if expires <= now]:
+                del _stripe_status_cache[key]
+        _stripe_status_cache[session_id] = (now + STRIPE_STATUS_CACHE_SECONDS, result)
+    else:
+        _stripe_status_cache.pop(session_id, None)
+    return result
+
+async def _resolve_checkout_status(session_id: str) -> dict:
+    transaction = await db.payment_transactions.find_one(
+        {"session_id": session_id},
+        {"_id": 0, "payment_status": 1, "amount": 1, "currency": 1, "metadata": 1}
+    )
+    if transaction and transaction.get("payment_status") in STRIPE_TERMINAL_STATUSES:
+        return _local_checkout_status(transaction)
+    
+    cached = _stripe_status_cache.get(session_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    # Polls concurrents sur la même session: une seule requête Stripe partagée
+    future = _stripe_status_inflight.get(session_id)
+    if future is None:
+        future = _stripe_status_inflight[session_id] = asyncio.ensure_future(_fetch_checkout_status(session_id))
+        future.add_done_callback(lambda _: _stripe_status_inflight.pop(session_id, None))
+    # shield: l'annulation d'un client (déconnexion) n'interrompt pas la requête des autres
+    return await asyncio.shield(future)
+
 @api_router.get("/stripe/checkout-status/{session_id}")
 async def get_stripe_checkout_status(session_id: str):
     """Vérifie le statut d'une session de paiement Stripe"""
     try:
-        stripe_api_key = os.environ.get('STRIPE_API_KEY')
-        if not stripe_api_key:
-            raise HTTPException(status_code=500, detail="Stripe API key not configured")
-        
-        stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url="")
-        status: CheckoutStatusResponse = await stripe_checkout.get_checkout_status(session_id)
-        
-        # Mettre à jour la transaction dans la base si le statut a changé
-        if status.payment_status == "paid":
-            # Vérifier si déjà traité pour éviter les doublons
-            existing = await db.payment_transactions.find_one({"session_id": session_id})
-            if existing and existing.get("payment_status") != "paid":
-                await db.payment_transactions.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"payment_status": "paid", "paidAt": datetime.now(timezone.utc).isoformat()}}
-                )
-                
-                # Créer la réservation finale
-                await _create_paid_reservation(session_id, status.metadata)
-        
-        return {
-            "status": status.status,
-            "payment_status": status.payment_status,
-            "amount_total": status.amount_total,
-            "currency": status.currency,
-            "metadata": status.metadata
-        }
+        return await _resolve_checkout_status(session_id)
         
     except Exception as e:
         logger.error(f"[Stripe] Erreur vérification statut: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/stripe/session/{session_id}")
+async def get_stripe_session_reservation(session_id: str, wait: float = 0):
+    """
+    Retour de Stripe: transaction locale (index unique session_id) et réservation payée associée.
+    Sans appel à l'API Stripe. Avec wait > 0, la requête reste ouverte jusqu'à ce que le webhook
+    ait créé la réservation (ou jusqu'à l'expiration du délai), au lieu d'un polling côté client.
+    """
+    transaction = await db.payment_transactions.find_one(
+        {"session_id": session_id},
+        {"_id": 0, "reservation_code": 1, "payment_status": 1}
+    )
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Session de paiement inconnue")
+
+    reservation_code = transaction.get("reservation_code")
+    reservation = await _find_reservation_by_code(reservation_code, wait) if reservation_code else None
+    return {
+        "session_id": session_id,
+        "reservation_code": reservation_code,
+        # La réservation n'est créée qu'après paiement confirmé
+        "payment_status": "paid" if reservation else transaction.get("payment_status", "pending"),
+        "reservation": reservation
+    }
+
+# Événements Stripe déjà traités (Stripe réessaie pendant 3 jours au maximum)
+STRIPE_EVENT_TTL_DAYS = int(os.environ.get("STRIPE_EVENT_TTL_DAYS", "30"))
+
+async def _claim_stripe_event(event_id: str, event_type: str, session_id: str) -> bool:
+    """Enregistre l'événement; False si déjà reçu (retry Stripe): insertion sur index unique"""
+    try:
+        await db.stripe_events.insert_one({
+            "event_id": event_id,
+            "event_type": event_type,
+            "session_id": session_id,
+            "receivedAt": datetime.now(timezone.utc)
+        })
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def _claim_paid_transition(session_id: str, metadata: dict) -> bool:
+    """
+    Passage atomique de la transaction à 'paid'. True pour l'unique appelant qui effectue
+    la transition (webhook ou checkout-status), False si elle était déjà payée.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await db.payment_transactions.find_one_and_update(
+            {"session_id": session_id, "payment_status": {"$ne": "paid"}},
+            {
+                "$set": {"payment_status": "paid", "paidAt": now},
+                "$unset": {"expiresAt": ""},  # Une transaction payée ne doit jamais expirer
+                # Transaction locale absente (déjà expirée): reconstituée depuis les metadata
+                "$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "reservation_code": metadata.get("reservation_code"),
+                    "amount": float(metadata.get("total_price", 0)),
+                    "currency": "chf",
+                    "metadata": metadata,
+                    "createdAt": now
+                }
+            },
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # L'upsert a heurté l'index unique session_id: la transaction est déjà 'paid'
+        return False
+
+async def _complete_paid_checkout(session_id: str, metadata: dict) -> bool:
+    """Transition pending -> paid puis création de la réservation; no-op si déjà traité"""
+    if not await _claim_paid_transition(session_id, metadata):
+        return False
+    inventory = await _confirm_checkout_hold(session_id)
+    try:
+        await _create_paid_reservation(session_id, metadata, inventory)
+    except Exception:
+        # Rendre la main à un prochain essai (retry du webhook ou poll checkout-status)
+        if inventory:
+            await _release_inventory(inventory, "booked")
+        await db.payment_transactions.update_one(
+            {"session_id": session_id, "payment_status": "paid"},
+            {"$set": {
+                "payment_status": "pending",
+                # De nouveau en attente: l'index TTL doit pouvoir la supprimer si aucun essai n'aboutit
+                "expiresAt": datetime.now(timezone.utc) + timedelta(hours=PAYMENT_PENDING_TTL_HOURS),
+                **({"holdStatus": "released"} if inventory else {})
+            }, "$unset": {"paidAt": ""}}
+        )
+        raise
+    return True
+
 @api_router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
     """
     Webhook Stripe pour recevoir les événements de paiement.
     checkout.session.completed → Valide la réservation et génère le QR Code.
+    Idempotent: un événement déjà reçu (retry Stripe) est ignoré après une insertion indexée.
     """
     try:
-        stripe_api_key = os.environ.get('STRIPE_API_KEY')
-        if not stripe_api_key:
-            raise HTTPException(status_code=500, detail="Stripe API key not configured")
-        
         body = await request.body()
         signature = request.headers.get("Stripe-Signature")
         
-        stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url="")
+        stripe_checkout = _get_stripe_checkout()
         webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        logger.info(f"[Stripe Webhook] Event: {webhook_response.event_type}, Session: {webhook_response.session_id}")
-        
+    except Exception as e:
+        logger.error(f"[Stripe Webhook] Erreur: {str(e)}")
+        return {"received": False, "error": str(e)}
+    
+    event_id = webhook_response.event_id
+    session_id = webhook_response.session_id
+    logger.info(f"[Stripe Webhook] Event: {webhook_response.event_type} ({event_id}), Session: {session_id}")
+    
+    if event_id and not await _claim_stripe_event(event_id, webhook_response.event_type, session_id):
+        logger.info(f"[Stripe Webhook] Événement déjà traité: {event_id}")
+        return {"received": True, "duplicate": True}
+    
+    try:
         if webhook_response.event_type == "checkout.session.completed":
-            # Paiement confirmé - créer la réservation
-            session_id = webhook_response.session_id
+            # Paiement confirmé - créer la réservation (une seule fois, même si checkout-status l'a devancé)
             metadata = webhook_response.metadata
-            
-            # Éviter les doublons
-            existing_reservation = await db.reservations.find_one({"reservationCode": metadata.get("reservation_code")})
-            if not existing_reservation:
-                await _create_paid_reservation(session_id, metadata)
+            if await _complete_paid_checkout(session_id, metadata):
                 logger.info(f"[Stripe Webhook] Réservation créée: {metadata.get('reservation_code')}")
             else:
                 logger.info(f"[Stripe Webhook] Réservation déjà existante: {metadata.get('reservation_code')}")
-            
-            # Mettre à jour la transaction
-            await db.payment_transactions.update_one(
-                {"session_id": session_id},
-                {"$set": {"payment_status": "paid", "paidAt": datetime.now(timezone.utc).isoformat()}}
-            )
-        
-        return {"received": True}
-        
+        elif webhook_response.event_type == "checkout.session.expired":
+            # Checkout abandonné: stock et casques rendus sans attendre le balayage périodique
+            await _release_checkout_hold(session_id)
     except Exception as e:
-        logger.error(f"[Stripe Webhook] Erreur: {str(e)}")
-        return {"received": False, "error": str(e)}
+        # Événement oublié pour que le retry de Stripe (réponse non-2xx) le retraite
+        if event_id:
+            await db.stripe_events.delete_one({"event_id": event_id})
+        logger.error(f"[Stripe Webhook] Erreur traitement {event_id}: {str(e)}")
+        return JSONResponse(status_code=500, content={"received": False, "error": str(e)})
+    
+    return {"received": True}
 
-async def _create_paid_reservation(session_id: str, metadata: dict):
+async def _create_paid_reservation(session_id: str, metadata: dict, inventory: Optional[dict] = None):
     """Crée une réservation validée après paiement confirmé"""
     try:
         reservation_code = metadata.get("reservation_code")
@@ -2897,11 +4810,20 @@ async def _create_paid_reservation(session_id: str, metadata: dict):
                 "coachAmount": coach_amount,
                 "totalAmount": total_price
             },
-            "createdAt": datetime.now(timezone.utc).isoformat(),
-            "paidAt": datetime.now(timezone.utc).isoformat()
+            "createdAt": datetime.now(timezone.utc),
+            "paidAt": datetime.now(timezone.utc)
         }
+        if inventory:
+            reservation["inventory"] = inventory  # Rendu à la suppression de la réservation
         
-        await db.reservations.insert_one(reservation)
+        try:
+            await db.reservations.insert_one(reservation)
+        except DuplicateKeyError:
+            # Index unique stripeSessionId: réservation déjà créée pour cette session
+            reservation = await db.reservations.find_one({"stripeSessionId": session_id}, {"_id": 0})
+            logger.info(f"[Stripe] Réservation déjà existante pour la session {session_id}")
+            return reservation
+        _notify_reservation_created(reservation_code)
         logger.info(f"[Stripe] Réservation PAYÉE créée: {reservation_code} - {total_price}CHF")
         
         return reservation
@@ -2921,10 +4843,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression négociée (Accept-Encoding: gzip) des réponses HTTP au-delà d'un seuil.
+# Les petites réponses et les 304 ne sont pas compressées; les WebSockets ne passent pas par ce middleware.
+# La compression permessage-deflate des sockets Silent Disco est un réglage du serveur ASGI, pas de l'app:
+# uvicorn server:app --ws-per-message-deflate true|false (désactivable si le CPU compte plus que la bande passante).
+# GZIP_MINIMUM_SIZE=-1 désactive la compression (ex: déjà assurée par l'ingress).
+GZIP_MINIMUM_SIZE = int(os.environ.get("GZIP_MINIMUM_SIZE", "1024"))
+GZIP_COMPRESS_LEVEL = int(os.environ.get("GZIP_COMPRESS_LEVEL", "6"))
+if GZIP_MINIMUM_SIZE >= 0:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
+
+# Ajouté en dernier = middleware le plus externe: la latence mesurée inclut CORS et compression
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
 # Dynamic manifest.json endpoint for PWA
 @app.get("/api/manifest.json")
-async def get_dynamic_manifest():
+async def get_dynamic_manifest(request: Request):
     """Serve dynamic manifest.json with logo and name from coach settings"""
+    # Le manifest ne dépend que du concept: même version que /api/concept
+    headers, not_modified = await _catalog_validators(request, "concept")
+    if not_modified:
+        return not_modified
     concept = await db.concept.find_one({})
     
     # Use coach-configured favicon (priority) or logo as fallback
@@ -2999,8 +4938,183 @@ async def get_dynamic_manifest():
         ]
     
     from fastapi.responses import JSONResponse
-    return JSONResponse(content=manifest, media_type="application/manifest+json")
+    return JSONResponse(content=manifest, media_type="application/manifest+json", headers=headers)
+
+# ==================== EXPIRATION TTL (coach_sessions, payment_transactions) ====================
+# Les dates d'expiration sont stockées en BSON Date et supprimées par MongoDB (index TTL),
+# sans coût sur le chemin des requêtes.
+
+async def _migrate_string_dates(collection, fields: List[str], batch_size: int = 500, parse=_as_utc_datetime) -> int:
+    """Convertit les dates ISO (str) des champs donnés en BSON Date (via parse), par lots de bulk_write"""
+    converted = 0
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {"_id": 1, **{field: 1 for field in fields}}
+    operations = []
+    async for doc in collection.find(query, projection):
+        updates = {}
+        for field in fields:
+            value = doc.get(field)
+            if isinstance(value, str) and value:
+                try:
+                    updates[field] = parse(value)
+                except ValueError:
+                    logger.warning(f"[Migration] {collection.name}.{field} illisible: {value!r}")
+        if updates:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+        if len(operations) >= batch_size:
+            converted += (await collection.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        converted += (await collection.bulk_write(operations, ordered=False)).modified_count
+    if converted:
+        logger.info(f"[Migration] {converted} document(s) {collection.name} convertis en dates BSON")
+    return converted
+
+async def _ensure_ttl_indexes():
+    """Migration des dates existantes puis index TTL"""
+    await _migrate_string_dates(db.coach_sessions, ["expires_at", "created_at"])
+    await _migrate_string_dates(db.payment_transactions, ["createdAt", "paidAt"])
+    
+    # Transactions 'pending' antérieures: expiration calculée depuis createdAt
+    await db.payment_transactions.update_many(
+        {"payment_status": "pending", "expiresAt": {"$exists": False}, "createdAt": {"$type": "date"}},
+        [{"$set": {"expiresAt": {"$add": ["$createdAt", PAYMENT_PENDING_TTL_HOURS * 3600 * 1000]}}}]
+    )
+    
+    await db.coach_sessions.create_index("expires_at", expireAfterSeconds=0, name="session_ttl")
+    await db.payment_transactions.create_index("expiresAt", expireAfterSeconds=0, name="pending_payment_ttl")
+
+async def _ensure_payment_indexes():
+    """Index uniques garantissant un seul passage à 'paid' et une seule réservation par session Stripe"""
+    existing = await db.payment_transactions.index_information()
+    if "payment_session_id" in existing:
+        # Ancien index non unique sur la même clé: à supprimer avant de créer la version unique
+        await db.payment_transactions.drop_index("payment_session_id")
+    try:
+        await db.payment_transactions.create_index("session_id", unique=True, name="payment_session_id_unique")
+    except OperationFailure as e:
+        logger.warning(f"[Stripe] Index unique session_id impossible (doublons existants?): {e}")
+        await db.payment_transactions.create_index("session_id", name="payment_session_id")
+    try:
+        await db.reservations.create_index(
+            "stripeSessionId", unique=True, name="reservation_stripe_session",
+            partialFilterExpression={"stripeSessionId": {"$type": "string"}}
+        )
+    except OperationFailure as e:
+        logger.warning(f"[Stripe] Index unique impossible (doublons existants?): {e}")
+    await db.stripe_events.create_index("event_id", unique=True, name="stripe_event_id")
+    await db.stripe_events.create_index(
+        "receivedAt", expireAfterSeconds=STRIPE_EVENT_TTL_DAYS * 86400, name="stripe_event_ttl"
+    )
+
+async def _migrate_bson_dates():
+    """Migration du format de stockage: createdAt ISO (str) -> BSON Date"""
+    await _migrate_string_dates(db.reservations, ["createdAt", "validatedAt", "paidAt"])
+    await _migrate_string_dates(db.users, ["createdAt"])
+    await _migrate_string_dates(db.leads, ["createdAt", "updatedAt"])
+    await _migrate_string_dates(db.campaign_results, ["sentAt"])
+    await _migrate_string_dates(db.campaigns, ["createdAt", "updatedAt"])
+    # Dates programmées saisies en heure locale (fuseau CAMPAIGN_SCHEDULE_TIMEZONE)
+    await _migrate_string_dates(db.campaigns, ["scheduledAt"], parse=_parse_scheduled_at)
+    await db.reservations.create_index([("createdAt", -1)], name="reservation_created_at")
+
+async def _ensure_reservation_indexes():
+    """Lectures par code (retour Stripe, validation QR) sans parcours complet de la collection"""
+    await db.reservations.create_index("reservationCode", name="reservation_code")
+
+# ==================== AMORÇAGE DES DONNÉES PAR DÉFAUT ====================
+# Exécuté une fois au démarrage (et plus dans les GET): upserts $setOnInsert sur des ids fixes,
+# donc idempotent et sans double insertion si plusieurs workers démarrent en même temps.
+
+async def _seed_singleton(collection, doc: dict, key: str = "id"):
+    defaults = {k: v for k, v in doc.items() if k != key}
+    await collection.update_one({key: doc[key]}, {"$setOnInsert": defaults}, upsert=True)
+
+async def _seed_collection_once(name: str, docs: List[dict]):
+    """
+    Insère les documents par défaut d'une collection de catalogue une seule fois:
+    si le coach supprime ensuite tous ses cours, ils ne réapparaissent pas au redémarrage.
+    seed_state n'est marqué qu'après les upserts: un arrêt entre les deux relance l'amorçage
+    (upserts $setOnInsert idempotents, y compris entre workers concurrents).
+    """
+    collection = db[name]
+    if await db.seed_state.find_one({"_id": name}, {"_id": 1}):
+        return  # Déjà amorcée
+    default_ids = [doc["id"] for doc in docs]
+    # Base existante (documents du coach): ne rien ajouter. Seuls des défauts = amorçage interrompu
+    if not await collection.count_documents({"id": {"$nin": default_ids}}, limit=1):
+        inserted = 0
+        for doc in docs:
+            defaults = {k: v for k, v in doc.items() if k != "id"}
+            result = await collection.update_one({"id": doc["id"]}, {"$setOnInsert": defaults}, upsert=True)
+            inserted += result.upserted_id is not None
+        if inserted:
+            await _bump_collection_version(name)
+            logger.info(f"[Seed] {inserted} document(s) par défaut dans {name}")
+    await db.seed_state.update_one(
+        {"_id": name},
+        {"$setOnInsert": {"seededAt": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+async def _seed_default_data():
+    for name in ("courses", "offers"):
+        try:
+            await db[name].create_index("id", unique=True, name=f"{name}_id_unique")
+        except OperationFailure as e:
+            logger.warning(f"[Seed] Index unique {name}.id impossible (doublons existants?): {e}")
+    
+    await _seed_collection_once("courses", [Course(**c).model_dump() for c in DEFAULT_COURSES])
+    await _seed_collection_once("offers", [Offer(**o).model_dump() for o in DEFAULT_OFFERS])
+    
+    await _seed_singleton(db.payment_links, PaymentLinks().model_dump())
+    await _seed_singleton(db.concept, Concept().model_dump())
+    await _seed_singleton(db.config, AppConfig().model_dump())
+    await _seed_singleton(db.ai_config, AIConfig().model_dump())
+    await _seed_singleton(db.feature_flags, DEFAULT_FEATURE_FLAGS)
+    
+    coach_auth = await db.coach_auth.find_one({"id": "coach_auth"}, {"_id": 0, "email": 1})
+    if coach_auth:
+        coach_email = coach_auth.get("email", "coach@afroboost.com")
+        await _seed_singleton(db.coach_subscriptions, _default_coach_subscription(coach_email), key="coachEmail")
+
+def _configure_llm_http_client():
+    """Les appels LLM (emergentintegrations -> litellm) réutilisent le client HTTP partagé"""
+    try:
+        import litellm
+        litellm.aclient_session = outbound_http.client
+    except ImportError:
+        logger.warning("[HTTP] litellm indisponible, client LLM par défaut")
+
+async def startup_tasks():
+    """Démarrage (appelé par le lifespan): le trafic n'est servi qu'une fois tout prêt"""
+    await database_health.warm_up()
+    await outbound_http.start()
+    _configure_llm_http_client()
+    await _ensure_auth_indexes()
+    await _ensure_user_indexes()
+    await _ensure_ttl_indexes()
+    await _migrate_bson_dates()
+    await _ensure_reservation_indexes()
+    await _ensure_payment_indexes()
+    await _ensure_inventory_indexes()
+    await _seed_default_data()
+    await _ensure_occurrence_calendar()
+    await _ensure_campaign_indexes()
+    await _migrate_embedded_campaign_results()
+    if CAMPAIGN_SCHEDULER_ENABLED:
+        campaign_scheduler.start()
+    else:
+        campaign_launch_watchdog.start()  # Reprise immédiate puis périodique des lancements interrompus
+    checkout_hold_sweeper.start()
+    database_health.start()
+    database_health.ready = True
 
-@app.on_event("shutdown")
 async def shutdown_db_client():
+    """Arrêt (appelé par le lifespan): /health passe en 503 avant la fermeture des ressources"""
+    await database_health.stop()
+    await campaign_scheduler.stop()
+    await campaign_launch_watchdog.stop()
+    await checkout_hold_sweeper.stop()
+    await outbound_http.close()
     client.close()
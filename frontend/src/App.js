@@ -3384,12 +3384,11 @@ function App() {
   const [validationCode, setValidationCode] = useState(null); // For /validate/:code URL
 
   const [courses, setCourses] = useState([]);
+  const [occurrencesByCourse, setOccurrencesByCourse] = useState({}); // Séances datées + casques disponibles (serveur)
   const [offers, setOffers] = useState([]);
-  const [users, setUsers] = useState([]);
   const [paymentLinks, setPaymentLinks] = useState({ stripe: "", paypal: "", twint: "", coachWhatsapp: "" });
   const [concept, setConcept] = useState({ appName: "Afroboost", description: "", heroImageUrl: "", logoUrl: "", faviconUrl: "", termsText: "", googleReviewsUrl: "", defaultLandingSection: "sessions", externalLink1Title: "", externalLink1Url: "", externalLink2Title: "", externalLink2Url: "", paymentTwint: false, paymentPaypal: false, paymentCreditCard: false, eventPosterEnabled: false, eventPosterMediaUrl: "" });
   const [showEventPoster, setShowEventPoster] = useState(false);
-  const [discountCodes, setDiscountCodes] = useState([]);
 
   // ========== AUDIO PLAYER STATE ==========
   // isAudioMode: Permute l'affichage entre vidéo héro et lecteur audio intégré
@@ -3451,6 +3450,20 @@ function App() {
   // Navigation et filtrage
   const [activeFilter, setActiveFilter] = useState('all');
   const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null); // { query, offers } classées par /offers/search
+  
+  // Recherche d'offres côté serveur (debounce), la recherche locale sert en attendant la réponse
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) { setSearchResults(null); return; }
+    const timer = setTimeout(async () => {
+      try {
+        const res = await axios.get(`${API}/offers/search`, { params: { q: query, limit: 100 } });
+        setSearchResults({ query, offers: res.data.data });
+      } catch (err) { console.error('Search error:', err); }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
   
   // Indicateur de scroll pour les nouveaux utilisateurs
   const showScrollIndicator = useScrollIndicator();
@@ -3478,24 +3491,31 @@ function App() {
       // Si on revient de Stripe avec un session_id
       if (sessionId && pendingSession && sessionId === pendingSession) {
         try {
-          // Vérifier le statut du paiement
-          const response = await axios.get(`${API}/stripe/checkout-status/${sessionId}`);
-          
-          if (response.data.payment_status === 'paid') {
-            // Paiement réussi ! Récupérer la réservation créée
-            const reservationRes = await axios.get(`${API}/reservations?code=${pendingReservationCode}`);
-            if (reservationRes.data?.data?.length > 0) {
-              const reservation = reservationRes.data.data[0];
-              setLastReservation(reservation);
-              setShowSuccess(true);
-              
-              // Nettoyer
-              localStorage.removeItem('pending_stripe_session');
-              localStorage.removeItem('pending_reservation_code');
-              
-              // Nettoyer l'URL
-              window.history.replaceState({}, document.title, window.location.pathname);
+          // Le serveur garde la requête ouverte jusqu'à ce que le webhook ait créé la réservation
+          const sessionRes = await axios.get(`${API}/stripe/session/${sessionId}`, { params: { wait: 20 } });
+          let reservation = sessionRes.data.reservation;
+
+          if (!reservation) {
+            // Webhook pas encore reçu: vérification directe auprès de Stripe (crée la réservation si payé)
+            const response = await axios.get(`${API}/stripe/checkout-status/${sessionId}`);
+            if (response.data.payment_status === 'paid') {
+              const code = sessionRes.data.reservation_code || pendingReservationCode;
+              const reservationRes = await axios.get(`${API}/reservations/by-code/${code}`);
+              reservation = reservationRes.data;
             }
+          }
+
+          if (reservation) {
+            // Paiement réussi !
+            setLastReservation(reservation);
+            setShowSuccess(true);
+            
+            // Nettoyer
+            localStorage.removeItem('pending_stripe_session');
+            localStorage.removeItem('pending_reservation_code');
+            
+            // Nettoyer l'URL
+            window.history.replaceState({}, document.title, window.location.pathname);
           } else {
             console.log('Payment not completed yet');
             // Optionnel: afficher un message
@@ -3637,10 +3657,7 @@ function App() {
   // === SYSTÈME DE CACHE OPTIMISÉ ===
   // Cache en mémoire avec TTL pour éviter les re-téléchargements inutiles
   const cacheRef = useRef({
-    courses: { data: null, timestamp: 0 },
-    offers: { data: null, timestamp: 0 },
-    concept: { data: null, timestamp: 0 },
-    paymentLinks: { data: null, timestamp: 0 }
+    bootstrap: { data: null, timestamp: 0 }
   });
 
   // Vérifier si le cache est valide (TTL: 5 minutes)
@@ -3651,87 +3668,27 @@ function App() {
   }, []);
 
   // Fonction pour charger les données avec cache
+  // Un seul appel: cours/offres visibles, concept et liens de paiement publics (revalidé par ETag)
   const fetchData = useCallback(async (forceRefresh = false) => {
     try {
-      // Utiliser le cache si disponible et pas de force refresh
-      const cachedCourses = !forceRefresh && isCacheValid('courses') ? cacheRef.current.courses.data : null;
-      const cachedOffers = !forceRefresh && isCacheValid('offers') ? cacheRef.current.offers.data : null;
-      const cachedConcept = !forceRefresh && isCacheValid('concept') ? cacheRef.current.concept.data : null;
-      const cachedLinks = !forceRefresh && isCacheValid('paymentLinks') ? cacheRef.current.paymentLinks.data : null;
-
-      // Construire les requêtes uniquement pour les données non cachées
-      const requests = [];
-      const requestMap = {};
-
-      if (!cachedCourses) {
-        requestMap.courses = requests.length;
-        requests.push(axios.get(`${API}/courses`));
-      }
-      if (!cachedOffers) {
-        requestMap.offers = requests.length;
-        requests.push(axios.get(`${API}/offers`));
-      }
-      if (!cachedLinks) {
-        requestMap.links = requests.length;
-        requests.push(axios.get(`${API}/payment-links`));
-      }
-      if (!cachedConcept) {
-        requestMap.concept = requests.length;
-        requests.push(axios.get(`${API}/concept`));
-      }
-
-      // Toujours récupérer users et discount codes (données dynamiques)
-      requestMap.users = requests.length;
-      requests.push(axios.get(`${API}/users`));
-      requestMap.codes = requests.length;
-      requests.push(axios.get(`${API}/discount-codes`));
-
-      const responses = await Promise.all(requests);
-
-      // Mettre à jour le cache et les états
-      const now = Date.now();
-
-      if (cachedCourses) {
-        setCourses(cachedCourses);
-      } else if (requestMap.courses !== undefined) {
-        const coursesData = responses[requestMap.courses].data;
-        cacheRef.current.courses = { data: coursesData, timestamp: now };
-        setCourses(coursesData);
+      const cached = !forceRefresh && isCacheValid('bootstrap') ? cacheRef.current.bootstrap.data : null;
+      const data = cached || (await axios.get(`${API}/public/bootstrap`)).data;
+      if (!cached) {
+        cacheRef.current.bootstrap = { data, timestamp: Date.now() };
       }
 
-      if (cachedOffers) {
-        setOffers(cachedOffers);
-      } else if (requestMap.offers !== undefined) {
-        const offersData = responses[requestMap.offers].data;
-        cacheRef.current.offers = { data: offersData, timestamp: now };
-        setOffers(offersData);
-      }
+      setCourses(data.courses);
+      setOffers(data.offers);
+      setPaymentLinks(data.paymentLinks);
+      setConcept(data.concept);
 
-      if (cachedLinks) {
-        setPaymentLinks(cachedLinks);
-      } else if (requestMap.links !== undefined) {
-        const linksData = responses[requestMap.links].data;
-        cacheRef.current.paymentLinks = { data: linksData, timestamp: now };
-        setPaymentLinks(linksData);
-      }
+      console.log(`📦 Cache: ${cached ? '✓' : '↓'}bootstrap`);
 
-      if (cachedConcept) {
-        setConcept(cachedConcept);
-      } else if (requestMap.concept !== undefined) {
-        const conceptData = responses[requestMap.concept].data;
-        cacheRef.current.concept = { data: conceptData, timestamp: now };
-        setConcept(conceptData);
-      }
-
-      // Données dynamiques (toujours rafraîchies)
-      if (requestMap.users !== undefined) {
-        setUsers(responses[requestMap.users].data);
-      }
-      if (requestMap.codes !== undefined) {
-        setDiscountCodes(responses[requestMap.codes].data);
-      }
-
-      console.log(`📦 Cache: ${cachedCourses ? '✓' : '↓'}courses ${cachedOffers ? '✓' : '↓'}offers ${cachedConcept ? '✓' : '↓'}concept`);
+      // Disponibilité par séance: jamais mise en cache (change à chaque réservation)
+      const occurrences = (await axios.get(`${API}/courses/occurrences`)).data;
+      const byCourse = {};
+      occurrences.forEach(o => { (byCourse[o.courseId] = byCourse[o.courseId] || []).push(o); });
+      setOccurrencesByCourse(byCourse);
 
     } catch (err) { console.error("Error:", err); }
   }, [isCacheValid]);
@@ -4141,7 +4098,7 @@ function App() {
       offerId: selectedOffer.id, 
       offerName: selectedOffer.name,
       price: selectedOffer.price, 
-      quantity: dateCount, // Nombre de dates sélectionnées comme quantité
+      quantity: isPhysicalProduct ? quantity : dateCount, // Articles (produit) ou nombre de dates (cours)
       totalPrice,
       discountCode: appliedDiscount?.code || null,
       discountType: appliedDiscount?.type || null,
@@ -4178,7 +4135,13 @@ function App() {
         
         setShowSuccess(true);
         resetFormKeepClient();
-      } catch (err) { console.error(err); }
+      } catch (err) {
+        console.error(err);
+        if (err.response?.status === 409) {
+          setValidationMessage(err.response.data.detail);
+          setTimeout(() => setValidationMessage(""), 4000);
+        }
+      }
       setLoading(false);
       return;
     }
@@ -4201,7 +4164,10 @@ function App() {
         user_email: userEmail,
         course_id: selectedCourse.id,
         course_name: selectedCourse.name,
-        origin_url: window.location.origin
+        origin_url: window.location.origin,
+        quantity: reservation.quantity,
+        selected_dates: selectedDates,
+        course_datetime: reservation.datetime
       });
       
       if (stripeResponse.data.url) {
@@ -4216,6 +4182,13 @@ function App() {
       }
     } catch (err) {
       console.error('Stripe checkout error:', err);
+      if (err.response?.status === 409) {
+        // Complet (stock ou casques): pas de paiement manuel de secours
+        setValidationMessage(err.response.data.detail);
+        setTimeout(() => setValidationMessage(""), 4000);
+        setLoading(false);
+        return;
+      }
       setValidationMessage('Erreur lors de la création du paiement. Veuillez réessayer.');
       setTimeout(() => setValidationMessage(""), 4000);
       
@@ -4254,16 +4227,24 @@ function App() {
   };
 
   const renderDates = (course) => {
-    const dates = getNextOccurrences(course.weekday);
+    // Séances calculées par le serveur (avec casques restants), sinon calcul local
+    // La valeur envoyée est celle du serveur (début UTC de la séance), jamais recalculée en heure locale
+    const serverDates = (occurrencesByCourse[course.id] || []).slice(0, 4).map(o => {
+      const [y, m, d] = o.date.split('-').map(Number);
+      return { date: new Date(y, m - 1, d), value: o.startsAt || o.date, full: o.available === 0 };
+    });
+    const dates = serverDates.length > 0
+      ? serverDates
+      : getNextOccurrences(course.weekday).map(date => ({ date, value: date.toISOString(), full: false }));
     const hasPlaylist = course.playlist && course.playlist.length > 0 && audioFeatureEnabled;
     
     return (
       <div className="grid grid-cols-2 gap-2 mt-3">
-        {dates.map((date, idx) => {
-          const dateISO = date.toISOString();
+        {dates.map(({ date, value, full }, idx) => {
+          const dateISO = value;
           const isSelected = selectedCourse?.id === course.id && selectedDates.includes(dateISO);
           return (
-            <button key={idx} type="button"
+            <button key={idx} type="button" disabled={full}
               onClick={() => { 
                 // Sélectionner le cours si différent
                 if (selectedCourse?.id !== course.id) {
@@ -4275,9 +4256,9 @@ function App() {
                 }
               }}
               className={`session-btn px-3 py-2 rounded-lg text-sm font-medium ${isSelected ? 'selected' : ''}`}
-              style={{ color: 'white', position: 'relative' }} data-testid={`date-btn-${course.id}-${idx}`}>
+              style={{ color: 'white', position: 'relative', opacity: full ? 0.4 : 1 }} data-testid={`date-btn-${course.id}-${idx}`}>
               <span className="flex items-center justify-center gap-2">
-                {formatDate(date, course.time, lang)} {isSelected && '✔'}
+                {formatDate(date, course.time, lang)} {isSelected && '✔'} {full && '(complet)'}
               </span>
             </button>
           );
@@ -4375,9 +4356,14 @@ function App() {
   // FILTRAGE SÉPARÉ : Sessions/Offres vs Produits vs Cours
   // =====================================================
   
+  // Résultats du serveur pour la requête affichée (null tant qu'ils ne sont pas arrivés)
+  const serverOffers = searchResults && searchResults.query === searchQuery.trim() ? searchResults.offers : null;
+  
   // Filtrer les SERVICES (sessions, abonnements) selon la recherche
   let filteredServices = visibleServices;
-  if (searchQuery.trim()) {
+  if (searchQuery.trim() && serverOffers) {
+    filteredServices = serverOffers.filter(o => !o.isProduct);
+  } else if (searchQuery.trim()) {
     const query = searchQuery.trim();
     filteredServices = visibleServices.filter(offer => 
       searchWithSynonyms(offer.name || '', query) ||
@@ -4388,7 +4374,9 @@ function App() {
   
   // Filtrer les PRODUITS selon la recherche
   let filteredProducts = visibleProducts;
-  if (searchQuery.trim()) {
+  if (searchQuery.trim() && serverOffers) {
+    filteredProducts = serverOffers.filter(o => o.isProduct === true);
+  } else if (searchQuery.trim()) {
     const query = searchQuery.trim();
     filteredProducts = visibleProducts.filter(product => 
       searchWithSynonyms(product.name || '', query) ||
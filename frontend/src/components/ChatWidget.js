@@ -71,31 +71,15 @@ export const ChatWidget = () => {
   }, [messages]);
 
   // === SYNCHRONISATION CONTACTS: Créer ou mettre à jour le contact en base ===
+  // Upsert côté serveur par email normalisé: pas besoin de télécharger la liste des contacts
   const syncContactToDatabase = async (clientData) => {
     try {
-      // Vérifier si le contact existe déjà par email
-      const usersResponse = await axios.get(`${API}/users`);
-      const existingUser = usersResponse.data.find(
-        u => u.email?.toLowerCase() === clientData.email.toLowerCase()
-      );
-
-      if (existingUser) {
-        // Mettre à jour le contact existant (nom et whatsapp peuvent avoir changé)
-        await axios.put(`${API}/users/${existingUser.id}`, {
-          name: clientData.firstName,
-          email: clientData.email,
-          whatsapp: clientData.whatsapp
-        });
-        console.log(`✅ Contact mis à jour: ${clientData.firstName}`);
-      } else {
-        // Créer un nouveau contact
-        await axios.post(`${API}/users`, {
-          name: clientData.firstName,
-          email: clientData.email,
-          whatsapp: clientData.whatsapp
-        });
-        console.log(`✅ Nouveau contact créé: ${clientData.firstName}`);
-      }
+      await axios.post(`${API}/users`, {
+        name: clientData.firstName,
+        email: clientData.email,
+        whatsapp: clientData.whatsapp
+      });
+      console.log(`✅ Contact synchronisé: ${clientData.firstName}`);
     } catch (err) {
       console.error('Error syncing contact:', err);
       // Ne pas bloquer le chat si la synchro échoue
@@ -1028,7 +1028,8 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
         email: manualContact.email,
         whatsapp: manualContact.whatsapp || ""
       });
-      setUsers([...users, response.data]);
+      // L'API renvoie le contact canonique (existant si même email): pas de doublon dans la liste
+      setUsers(prev => [...prev.filter(u => u.id !== response.data.id), response.data]);
       setManualContact({ name: "", email: "", whatsapp: "" });
       setShowManualContactForm(false);
     } catch (err) {
@@ -1283,6 +1284,7 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
   const [selectedContactsForCampaign, setSelectedContactsForCampaign] = useState([]);
   const [contactSearchQuery, setContactSearchQuery] = useState("");
   const [campaignLogs, setCampaignLogs] = useState([]); // Error logs
+  const [campaignResults, setCampaignResults] = useState({}); // campaignId -> { items, page, pages } (résultats paginés)
   
   // === ENVOI DIRECT STATE ===
   const [directSendMode, setDirectSendMode] = useState(false);
@@ -1373,6 +1375,27 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
     }
   }, [tab]);
 
+  // Résultats d'une campagne en cours d'envoi, page par page (la liste ne renvoie que les compteurs)
+  const loadCampaignResults = async (campaignId, page = 1) => {
+    try {
+      const res = await axios.get(`${API}/campaigns/${campaignId}/results`, { params: { page, limit: 100 } });
+      setCampaignResults(prev => ({
+        ...prev,
+        [campaignId]: {
+          items: page === 1 ? res.data.data : [...(prev[campaignId]?.items || []), ...res.data.data],
+          page,
+          pages: res.data.pagination.pages
+        }
+      }));
+    } catch (err) { console.error("Error loading campaign results:", err); }
+  };
+
+  useEffect(() => {
+    campaigns
+      .filter(c => c.status === 'sending' && !campaignResults[c.id])
+      .forEach(c => loadCampaignResults(c.id));
+  }, [campaigns]);
+
   // Get unique contacts from users and reservations
   const allContacts = useMemo(() => {
     const contactMap = new Map();
@@ -1475,8 +1498,10 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
     try {
       addCampaignLog(campaignId, 'Lancement de la campagne...', 'info');
       const res = await axios.post(`${API}/campaigns/${campaignId}/launch`);
-      setCampaigns(campaigns.map(c => c.id === campaignId ? res.data : c));
-      addCampaignLog(campaignId, `Campagne lancée avec ${res.data.results?.length || 0} destinataire(s)`, 'success');
+      const { results, ...launched } = res.data;
+      setCampaignResults(prev => { const next = { ...prev }; delete next[campaignId]; return next; });
+      setCampaigns(campaigns.map(c => c.id === campaignId ? launched : c));
+      addCampaignLog(campaignId, `Campagne lancée avec ${launched.resultsTotal || 0} destinataire(s)`, 'success');
       alert("🚀 Campagne lancée ! Cliquez sur les contacts pour ouvrir les liens.");
     } catch (err) { 
       console.error("Error launching campaign:", err);
@@ -1977,14 +2002,61 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
   }, [allContacts, selectedContactsForCampaign, newCampaign.targetType]);
 
   // Mark result as sent
-  const markResultSent = async (campaignId, contactId, channel) => {
+  // Les clics rapprochés sont regroupés en un seul appel /mark-sent/batch (compteurs renvoyés par le serveur)
+  const pendingMarksRef = useRef({});
+
+  const flushMarkedResults = async (campaignId) => {
+    const queue = pendingMarksRef.current[campaignId];
+    if (!queue || queue.items.length === 0) return;
+    const items = queue.items;
+    queue.items = [];
     try {
-      await axios.post(`${API}/campaigns/${campaignId}/mark-sent`, { contactId, channel });
-      const res = await axios.get(`${API}/campaigns/${campaignId}`);
-      setCampaigns(campaigns.map(c => c.id === campaignId ? res.data : c));
+      const res = await axios.post(`${API}/campaigns/${campaignId}/mark-sent/batch`, { results: items });
+      setCampaigns(prev => prev.map(c => c.id === campaignId ? { ...c, ...res.data.campaign } : c));
     } catch (err) { console.error("Error marking sent:", err); }
   };
 
+  const markResultSent = (campaignId, contactId, channel) => {
+    // Mise à jour optimiste de la ligne cliquée
+    setCampaignResults(prev => prev[campaignId] ? {
+      ...prev,
+      [campaignId]: {
+        ...prev[campaignId],
+        items: prev[campaignId].items.map(r => r.contactId === contactId && r.channel === channel ? { ...r, status: 'sent' } : r)
+      }
+    } : prev);
+    const queue = pendingMarksRef.current[campaignId] || (pendingMarksRef.current[campaignId] = { items: [], timer: null });
+    queue.items.push({ contactId, channel, status: 'sent' });
+    clearTimeout(queue.timer);
+    queue.timer = setTimeout(() => flushMarkedResults(campaignId), queue.items.length >= 25 ? 0 : 1500);
+  };
+
+  // Marques encore en file à la fermeture de l'onglet ou en quittant le dashboard: envoyées sans attendre
+  // le délai (fetch keepalive: la requête survit au déchargement de la page), sinon les contacts seraient renvoyés
+  useEffect(() => {
+    const flushMarksOnExit = () => {
+      Object.entries(pendingMarksRef.current).forEach(([campaignId, queue]) => {
+        clearTimeout(queue.timer);
+        if (queue.items.length === 0) return;
+        const items = queue.items;
+        queue.items = [];
+        fetch(`${API}/campaigns/${campaignId}/mark-sent/batch`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ results: items }),
+          keepalive: true
+        }).catch(err => console.error("Error marking sent:", err));
+      });
+    };
+    window.addEventListener('pagehide', flushMarksOnExit);
+    window.addEventListener('beforeunload', flushMarksOnExit);
+    return () => {
+      window.removeEventListener('pagehide', flushMarksOnExit);
+      window.removeEventListener('beforeunload', flushMarksOnExit);
+      flushMarksOnExit();
+    };
+  }, []);
+
   // Update shipping tracking for a reservation
   const updateTracking = async (reservationId, trackingNumber, shippingStatus) => {
     try {
@@ -3263,6 +3335,7 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                             time: course.time,
                             locationName: course.locationName,
                             mapsUrl: course.mapsUrl || '',
+                            capacity: course.capacity ?? -1,
                             visible: true,
                             archived: false
                           };
@@ -3326,6 +3399,13 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                       <input type="time" value={course.time} onChange={(e) => { const n = [...courses]; n[idx].time = e.target.value; setCourses(n); }}
                         onBlur={() => updateCourse(course)} className="w-full px-3 py-2 rounded-lg neon-input text-sm" />
                     </div>
+                    {/* Casques disponibles par séance (vide = illimité) */}
+                    <div>
+                      <label className="block mb-1 text-white text-xs opacity-70">Casques par séance</label>
+                      <input type="number" min="0" value={course.capacity >= 0 ? course.capacity : ''} placeholder="Illimité"
+                        onChange={(e) => { const n = [...courses]; const realIdx = courses.findIndex(c => c.id === course.id); n[realIdx].capacity = e.target.value === '' ? -1 : parseInt(e.target.value); setCourses(n); }}
+                        onBlur={() => updateCourse(course)} className="w-full px-3 py-2 rounded-lg neon-input text-sm" />
+                    </div>
                     <div className="md:col-span-2">
                       <label className="block mb-1 text-white text-xs opacity-70">{t('mapsLink')}</label>
                       <input type="url" value={course.mapsUrl || ''} onChange={(e) => { const n = [...courses]; n[idx].mapsUrl = e.target.value; setCourses(n); }}
@@ -5176,7 +5256,7 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                   <tbody>
                     {campaigns.map(campaign => {
                       // Count failed results for this campaign
-                      const failedCount = campaign.results?.filter(r => r.status === 'failed').length || 0;
+                      const failedCount = campaign.resultsFailed || 0;
                       const hasErrors = failedCount > 0 || campaignLogs.some(l => l.campaignId === campaign.id && l.type === 'error');
                       
                       return (
@@ -5190,7 +5270,7 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                             </div>
                           </td>
                           <td className="py-3 pr-4">
-                            {campaign.targetType === "all" ? `Tous (${campaign.results?.length || 0})` : campaign.selectedContacts?.length || 0}
+                            {campaign.targetType === "all" ? `Tous (${campaign.resultsTotal || 0})` : campaign.selectedContacts?.length || 0}
                           </td>
                           <td className="py-3 pr-4">
                             {campaign.channels?.whatsapp && <span className="mr-1">📱</span>}
@@ -5201,6 +5281,8 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                             <div className="flex items-center gap-1">
                               {campaign.status === 'draft' && <span className="px-2 py-1 rounded text-xs bg-gray-600">📝 Brouillon</span>}
                               {campaign.status === 'scheduled' && <span className="px-2 py-1 rounded text-xs bg-yellow-600">📅 Programmé</span>}
+                              {campaign.status === 'missed' && <span className="px-2 py-1 rounded text-xs bg-red-600" title="Date d'envoi dépassée: campagne non envoyée">⏰ Manquée</span>}
+                              {campaign.status === 'launching' && <span className="px-2 py-1 rounded text-xs bg-blue-600">⏳ Préparation ({campaign.launchProgress?.processed || 0})</span>}
                               {campaign.status === 'sending' && <span className="px-2 py-1 rounded text-xs bg-blue-600">🔄 En cours</span>}
                               {campaign.status === 'completed' && !hasErrors && <span className="px-2 py-1 rounded text-xs bg-green-600">✅ Envoyé</span>}
                               {campaign.status === 'completed' && hasErrors && (
@@ -5215,7 +5297,7 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                           </td>
                           <td className="py-3">
                             <div className="flex gap-2">
-                              {(campaign.status === 'draft' || campaign.status === 'scheduled') && (
+                              {(campaign.status === 'draft' || campaign.status === 'scheduled' || campaign.status === 'missed') && (
                                 <button onClick={() => launchCampaign(campaign.id)} className="px-3 py-1 rounded text-xs bg-purple-600 hover:bg-purple-700">
                                   🚀 Lancer
                                 </button>
@@ -5246,6 +5328,7 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
               
               {/* Expanded Campaign Details (when sending) */}
               {campaigns.filter(c => c.status === 'sending').map(campaign => {
+                const loaded = campaignResults[campaign.id] || { items: [], page: 0, pages: 0 };
                 // Helper to check if WhatsApp link is valid
                 const getWhatsAppLinkOrError = (result) => {
                   if (result.channel !== 'whatsapp') return { link: null, error: false };
@@ -5259,7 +5342,7 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                     <p className="text-white text-sm mb-3 opacity-70">Cliquez sur un contact pour ouvrir le lien et marquer comme envoyé</p>
                     
                     <div className="space-y-2" style={{ maxHeight: '300px', overflowY: 'auto' }}>
-                      {campaign.results?.map((result, idx) => {
+                      {loaded.items.map((result, idx) => {
                         const whatsappResult = result.channel === 'whatsapp' ? getWhatsAppLinkOrError(result) : { link: null, error: false };
                         const hasError = (result.channel === 'whatsapp' && whatsappResult.error) || 
                                         (result.channel === 'email' && !result.contactEmail) ||
@@ -5309,13 +5392,19 @@ const CoachDashboard = ({ t, lang, onBack, onLogout, coachUser, audioFeatureEnab
                           </div>
                         );
                       })}
+                      {loaded.page < loaded.pages && (
+                        <button type="button" onClick={() => loadCampaignResults(campaign.id, loaded.page + 1)}
+                          className="w-full px-3 py-1 rounded text-xs bg-purple-600/30 hover:bg-purple-600/50 text-white">
+                          Afficher plus ({loaded.items.length} / {campaign.resultsTotal || 0})
+                        </button>
+                      )}
                     </div>
                     
                     <div className="mt-3 flex justify-between text-xs">
                       <span className="text-purple-400">
-                        Progression: {campaign.results?.filter(r => r.status === 'sent').length || 0} / {campaign.results?.length || 0} envoyé(s)
+                        Progression: {campaign.resultsSent || 0} / {campaign.resultsTotal || 0} envoyé(s)
                       </span>
-                      {campaign.results?.some(r => r.status === 'pending' && (
+                      {loaded.items.some(r => r.status === 'pending' && (
                         (r.channel === 'whatsapp' && !formatPhoneForWhatsApp(r.contactPhone)) ||
                         (r.channel === 'email' && !r.contactEmail)
                       )) && (
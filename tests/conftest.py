@@ -0,0 +1,40 @@
+"""
+Shared fixture for in-process tests of backend/server.py internals.
+
+`backend` imports server.py against a dedicated database (TEST_DB_NAME, dropped at the end
+of the session) and runs coroutines on a single event loop (Motor binds to the first loop
+it is used from). Tests using it are skipped when the backend dependencies or MongoDB
+(MONGO_URL) are not available.
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+
+
+@pytest.fixture(scope="session")
+def backend():
+    pytest.importorskip("emergentintegrations")
+    db_name = os.environ.get("TEST_DB_NAME", "afroboost_inprocess_tests")
+    os.environ["DB_NAME"] = db_name  # load_dotenv does not override variables already set
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        import server
+    except RuntimeError as e:  # MONGO_URL absent
+        pytest.skip(str(e))
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(asyncio.wait_for(server.client.admin.command("ping"), 5))
+    except Exception as e:
+        loop.close()
+        pytest.skip(f"MongoDB unreachable: {e}")
+
+    yield SimpleNamespace(server=server, db=server.db, run=loop.run_until_complete)
+
+    loop.run_until_complete(server.client.drop_database(db_name))
+    loop.close()
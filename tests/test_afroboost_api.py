@@ -27,6 +27,16 @@ class TestHealthAndRoot:
         assert "message" in data
         assert data["message"] == "Afroboost API"
 
+    def test_health_is_cached_probe(self, api_client):
+        response = api_client.get(f"{BASE_URL}/api/health")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "healthy"
+        assert data["database"] == "connected"
+        assert data["ready"] is True
+        # Served from the background probe, not a ping per request
+        assert data["checked_seconds_ago"] is not None
+
 
 class TestCourses:
     """Course CRUD operations"""
@@ -143,6 +153,39 @@ class TestUsers:
         assert data["name"] == user_data["name"]
         assert data["email"] == user_data["email"]
 
+    def test_create_user_is_idempotent_by_email(self, api_client):
+        email = f"test_{uuid.uuid4().hex[:6]}@example.com"
+        first = api_client.post(f"{BASE_URL}/api/users", json={"name": "TEST_First", "email": email})
+        second = api_client.post(f"{BASE_URL}/api/users", json={
+            "name": "TEST_Second", "email": f"  {email.upper()} ", "whatsapp": "+41790000000"
+        })
+        assert first.status_code == 200 and second.status_code == 200
+        # Same canonical contact, refreshed with the latest details
+        assert second.json()["id"] == first.json()["id"]
+        assert second.json()["name"] == "TEST_Second"
+        assert second.json()["whatsapp"] == "+41790000000"
+        api_client.delete(f"{BASE_URL}/api/users/{first.json()['id']}")
+
+    def test_bulk_upsert_users(self, api_client):
+        email = f"test_{uuid.uuid4().hex[:6]}@example.com"
+        existing = api_client.post(f"{BASE_URL}/api/users", json={"name": "TEST_Existing", "email": email}).json()
+        new_email = f"test_{uuid.uuid4().hex[:6]}@example.com"
+        response = api_client.post(f"{BASE_URL}/api/users/bulk", json={"users": [
+            {"name": "TEST_Existing", "email": email.upper()},
+            {"name": "TEST_New", "email": new_email},
+            {"name": "TEST_New_Dup", "email": new_email},
+            {"name": "TEST_No_Contact", "email": ""}
+        ]})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 1
+        assert data["updated"] == 1
+        assert data["skipped"] == 1
+        ids = {u["email"].lower(): u["id"] for u in data["users"]}
+        assert ids[email] == existing["id"]
+        for user_id in ids.values():
+            api_client.delete(f"{BASE_URL}/api/users/{user_id}")
+
 
 class TestDiscountCodes:
     """Discount code CRUD and validation - including delete functionality"""
@@ -372,6 +415,27 @@ class TestReservations:
         # Cleanup
         api_client.delete(f"{BASE_URL}/api/reservations/{data['id']}")
 
+    def test_migrate_reservations_in_bulk(self, api_client):
+        """localStorage migration: inserted/skipped counts, idempotent on re-run"""
+        codes = [f"AFR-T{uuid.uuid4().hex[:5].upper()}" for _ in range(2)]
+        reservations = [
+            {"id": str(uuid.uuid4()), "reservationCode": code, "userName": "TEST_Migration",
+             "createdAt": "2024-05-01T10:00:00.000Z"}
+            for code in codes
+        ]
+        payload = {"reservations": reservations + [dict(reservations[0]), {"userName": "no code"}]}
+        try:
+            first = api_client.post(f"{BASE_URL}/api/migrate-data", json=payload).json()["migrated"]
+            assert first["reservations"] == 2
+            assert first["reservationsSkipped"] == 2
+
+            again = api_client.post(f"{BASE_URL}/api/migrate-data", json=payload).json()["migrated"]
+            assert again["reservations"] == 0
+            assert again["reservationsSkipped"] == 4
+        finally:
+            for reservation in reservations:
+                api_client.delete(f"{BASE_URL}/api/reservations/{reservation['id']}")
+
 
 class TestConfig:
     """App configuration"""
@@ -0,0 +1,173 @@
+"""
+Authenticated principal cache tests
+- backend/auth_cache.py (in-process, fake clock): TTL expiry, session expiry cap,
+  LRU eviction, invalidation, shared revocation version.
+- require_coach / logout (server.py against a test MongoDB, see conftest.backend):
+  Bearer logout and revocations made by another worker.
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from auth_cache import PrincipalCache  # noqa: E402
+
+LATER = datetime.now(timezone.utc) + timedelta(days=7)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def principal(user_id, email=None):
+    return {"user_id": user_id, "email": email or f"{user_id}@example.com"}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestPrincipalCache:
+    def test_ttl_expiry(self, clock):
+        cache = PrincipalCache(10, ttl_seconds=60, clock=clock)
+        cache.put("tok", principal("u1"), LATER)
+        clock.now += 59
+        assert cache.get("tok") == principal("u1")
+        clock.now += 2
+        assert cache.get("tok") is None
+        assert not cache.entries
+
+    def test_ttl_capped_by_session_expiry(self, clock):
+        cache = PrincipalCache(10, ttl_seconds=60, clock=clock)
+        cache.put("soon", principal("u1"), datetime.now(timezone.utc) + timedelta(seconds=5))
+        cache.put("expired", principal("u2"), datetime.now(timezone.utc) - timedelta(seconds=1))
+        assert cache.get("expired") is None
+        clock.now += 10
+        assert cache.get("soon") is None
+
+    def test_lru_eviction(self, clock):
+        cache = PrincipalCache(2, ttl_seconds=60, clock=clock)
+        cache.put("a", principal("a"), LATER)
+        cache.put("b", principal("b"), LATER)
+        assert cache.get("a")  # a becomes most recent
+        cache.put("c", principal("c"), LATER)
+        assert cache.get("b") is None
+        assert cache.get("a") and cache.get("c")
+
+    def test_tokens_are_not_stored_in_clear(self, clock):
+        cache = PrincipalCache(10, ttl_seconds=60, clock=clock)
+        cache.put("secret-token", principal("u1"), LATER)
+        assert "secret-token" not in cache.entries
+
+    def test_invalidate_token_and_user(self, clock):
+        cache = PrincipalCache(10, ttl_seconds=60, clock=clock)
+        cache.put("t1", principal("u1", "Coach@Example.com"), LATER)
+        cache.put("t2", principal("u1", "coach@example.com"), LATER)
+        cache.put("t3", principal("u2"), LATER)
+
+        cache.invalidate_token("t3")
+        assert cache.get("t3") is None
+        cache.invalidate_user(email="COACH@example.com")
+        assert cache.get("t1") is None and cache.get("t2") is None
+
+        cache.put("t4", principal("u4"), LATER)
+        cache.invalidate_user(user_id="u4")
+        assert cache.get("t4") is None
+
+    def test_shared_revocation_version(self, clock):
+        cache = PrincipalCache(10, ttl_seconds=60, revocation_poll_seconds=1, clock=clock)
+        assert cache.revocation_check_due()
+        assert cache.sync_revocations(("e", 0)) is False  # first sight: nothing to clear
+        cache.put("t1", principal("u1"), LATER)
+
+        assert not cache.revocation_check_due()  # polled at most once per interval
+        clock.now += 1
+        assert cache.revocation_check_due()
+        assert cache.sync_revocations(("e", 0)) is False
+        assert cache.get("t1")
+
+        assert cache.sync_revocations(("e", 1)) is True  # revoked on another worker
+        assert cache.get("t1") is None
+
+
+# --- require_coach / logout (MongoDB) ---
+
+def _request(token, cookie=False):
+    from starlette.requests import Request
+
+    header = (b"cookie", f"coach_session_token={token}".encode()) if cookie else \
+        (b"authorization", f"Bearer {token}".encode())
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [header]})
+
+
+@pytest.fixture
+def session_token(backend, monkeypatch):
+    """A valid coach session; revocation polling on every request"""
+    server = backend.server
+    monkeypatch.setattr(server.principal_cache, "revocation_poll_seconds", 0)
+    server.principal_cache.entries.clear()
+    token = f"test_{uuid.uuid4().hex}"
+    user_id = f"user_{uuid.uuid4().hex[:8]}"
+
+    async def setup():
+        await server.db.google_users.insert_one({"user_id": user_id, "email": "coach@example.com", "name": "Coach"})
+        await server.db.coach_sessions.insert_one({
+            "session_token": token, "user_id": user_id,
+            "expires_at": datetime.now(timezone.utc) + timedelta(days=1)
+        })
+
+    async def cleanup():
+        await server.db.google_users.delete_many({"user_id": user_id})
+        await server.db.coach_sessions.delete_many({"user_id": user_id})
+
+    backend.run(setup())
+    yield token
+    backend.run(cleanup())
+
+
+class TestRequireCoach:
+    def test_bearer_logout_revokes_cached_principal(self, backend, session_token):
+        server = backend.server
+        assert backend.run(server.require_coach(_request(session_token)))["email"] == "coach@example.com"
+        assert server.principal_cache.get(session_token)
+
+        from starlette.responses import Response
+        backend.run(server.logout(_request(session_token), Response()))
+        assert server.principal_cache.get(session_token) is None
+        with pytest.raises(server.HTTPException) as exc:
+            backend.run(server.require_coach(_request(session_token)))
+        assert exc.value.status_code == 401
+
+    def test_revocation_by_another_worker(self, backend, session_token):
+        server = backend.server
+        backend.run(server.require_coach(_request(session_token, cookie=True)))
+        assert server.principal_cache.get(session_token)
+
+        async def other_worker_logout():
+            # Same writes as logout on another process: this worker's cache is untouched
+            await server.db.coach_sessions.delete_many({"session_token": session_token})
+            await server._bump_collection_version("auth_revocations")
+
+        backend.run(other_worker_logout())
+        with pytest.raises(server.HTTPException) as exc:
+            backend.run(server.require_coach(_request(session_token, cookie=True)))
+        assert exc.value.status_code == 401
+
+    def test_cached_principal_skips_the_lookup(self, backend, session_token, monkeypatch):
+        server = backend.server
+        backend.run(server.require_coach(_request(session_token)))
+
+        async def no_lookup(token):
+            raise AssertionError("cache miss")
+
+        monkeypatch.setattr(server, "_load_principal", no_lookup)
+        assert backend.run(server.require_coach(_request(session_token)))["email"] == "coach@example.com"
+
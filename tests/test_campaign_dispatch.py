@@ -0,0 +1,283 @@
+"""
+Campaign dispatch tests
+- backend/campaign_dispatch.py (runs in-process, no services): token bucket pacing,
+  local channel adapters, adapter pool error handling.
+- Scheduler loop (server.py against a test MongoDB, see conftest.backend): atomic claim
+  across workers, lateness window, local dispatch with batched counters, dispatch lease.
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from campaign_dispatch import (  # noqa: E402
+    ChannelAdapter, ChannelAdapterPool, LocalChannelAdapter, RateLimiter, format_phone_e164, personalize_message
+)
+
+RESULT = {"contactId": "u1", "contactName": "Awa Diop", "contactEmail": "awa@example.com",
+          "contactPhone": "+41791234567", "channel": "email"}
+CAMPAIGN = {"id": "c1", "message": "Salut {prénom} ({nom})"}
+
+
+class TestRateLimiter:
+    def test_burst_then_paced(self):
+        async def scenario():
+            limiter = RateLimiter(50)
+            started = time.monotonic()
+            for _ in range(50):
+                await limiter.acquire()
+            burst = time.monotonic() - started
+            for _ in range(25):
+                await limiter.acquire()
+            return burst, time.monotonic() - started
+
+        burst, total = asyncio.run(scenario())
+        assert burst < 0.2  # bucket starts full
+        assert total >= 0.45  # 25 more tokens at 50/s
+
+    def test_concurrent_acquires_share_the_rate(self):
+        async def scenario():
+            limiter = RateLimiter(20)
+            started = time.monotonic()
+            await asyncio.gather(*[limiter.acquire() for _ in range(30)])
+            return time.monotonic() - started
+
+        assert asyncio.run(scenario()) >= 0.45  # 20 immediate, 10 more at 20/s
+
+    def test_slow_rate_keeps_one_token_burst(self):
+        limiter = RateLimiter(0.5)
+        assert limiter.capacity == 1.0
+
+
+class TestAdapterPool:
+    def test_channel_adapter_is_abstract(self):
+        class Incomplete(ChannelAdapter):
+            channel = "sms"
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_local_mode_records_personalized_messages(self):
+        pool = ChannelAdapterPool("local", {"whatsapp": 100, "email": 100})
+        assert all(isinstance(a, LocalChannelAdapter) for a in pool.adapters.values())
+
+        ok, error = asyncio.run(pool.send(RESULT, CAMPAIGN))
+        assert (ok, error) == (True, None)
+        assert pool.adapters["email"].sent == [
+            {"campaignId": "c1", "to": "awa@example.com", "message": "Salut Awa (Awa Diop)"}
+        ]
+        assert pool.adapters["whatsapp"].sent == []
+
+    def test_local_mode_missing_recipient_fails(self):
+        pool = ChannelAdapterPool("local", {"whatsapp": 100})
+        ok, error = asyncio.run(pool.send({**RESULT, "channel": "whatsapp", "contactPhone": ""}, CAMPAIGN))
+        assert not ok and error == "Destinataire manquant"
+
+    def test_live_mode_uses_given_adapters_and_catches_errors(self):
+        class Broken(ChannelAdapter):
+            channel = "email"
+
+            async def send(self, result, campaign):
+                raise ConnectionError("EmailJS down")
+
+        pool = ChannelAdapterPool("live", {"email": 100}, live_adapters={"email": Broken})
+        assert pool.supports("email") and not pool.supports("instagram")
+        assert asyncio.run(pool.send(RESULT, CAMPAIGN)) == (False, "EmailJS down")
+
+    def test_unknown_mode_rejected(self):
+        with pytest.raises(ValueError):
+            ChannelAdapterPool("dry-run", {"email": 1})
+
+
+class TestMessageHelpers:
+    def test_personalize_without_name(self):
+        assert personalize_message("Bonjour {prenom}!", "") == "Bonjour ami(e)!"
+
+    @pytest.mark.parametrize("raw,expected", [
+        ("079 123 45 67", "+41791234567"),
+        ("+33 6 12 34 56 78", "+33612345678"),
+        ("41791234567", "+41791234567"),
+        ("", ""),
+    ])
+    def test_format_phone_e164(self, raw, expected):
+        assert format_phone_e164(raw) == expected
+
+
+# --- Scheduler loop (MongoDB) ---
+
+def _scheduler(server, worker_id):
+    pool = ChannelAdapterPool("local", {"whatsapp": 1000, "email": 1000})
+    return server.CampaignScheduler(pool, interval=1, worker_id=worker_id)
+
+
+@pytest.fixture
+def campaign_env(backend):
+    """Empty campaign collections plus three contacts; yields a factory for campaigns"""
+    db = backend.db
+
+    async def reset():
+        await db.campaigns.delete_many({})
+        await db.campaign_results.delete_many({})
+        await db.users.delete_many({})
+        await backend.server._ensure_campaign_indexes()
+
+    backend.run(reset())
+    contacts = [
+        {"id": f"u{i}", "name": f"Contact {i}", "email": f"c{i}@example.com", "whatsapp": f"+4179000000{i}"}
+        for i in range(3)
+    ]
+    backend.run(db.users.insert_many([dict(c) for c in contacts]))
+
+    def make(scheduled_at, channels=None, status="scheduled"):
+        campaign = {
+            "id": str(uuid.uuid4()), "name": "TEST_Scheduler", "message": "Salut {prénom}",
+            "targetType": "selected", "selectedContacts": [c["id"] for c in contacts],
+            "channels": channels or {"whatsapp": True, "email": True, "instagram": False},
+            "scheduledAt": scheduled_at, "status": status,
+            "createdAt": datetime.now(timezone.utc), "updatedAt": datetime.now(timezone.utc)
+        }
+        backend.run(db.campaigns.insert_one(dict(campaign)))
+        return campaign["id"]
+
+    yield make
+    backend.run(reset())
+
+
+class TestSchedulerLoop:
+    def test_parse_scheduled_at(self, backend):
+        parse = backend.server._parse_scheduled_at
+        assert parse("2025-12-25T10:00:00") == datetime(2025, 12, 25, 9, 0, tzinfo=timezone.utc)  # CET
+        assert parse("2025-07-01T10:00:00") == datetime(2025, 7, 1, 8, 0, tzinfo=timezone.utc)  # CEST
+        assert parse("2025-12-25T10:00:00Z") == datetime(2025, 12, 25, 10, 0, tzinfo=timezone.utc)
+        assert parse("2025-12-25T10:00:00+01:00") == datetime(2025, 12, 25, 9, 0, tzinfo=timezone.utc)
+        assert parse(None) is None
+
+    def test_two_workers_claim_once(self, backend, campaign_env):
+        campaign_id = campaign_env(datetime.now(timezone.utc) - timedelta(minutes=1))
+        first, second = _scheduler(backend.server, "worker-a"), _scheduler(backend.server, "worker-b")
+
+        async def race():
+            return await asyncio.gather(first._fire_next_due_campaign(), second._fire_next_due_campaign())
+
+        claimed = backend.run(race())
+        assert sorted(claimed) == [False, True]
+
+        campaign = backend.run(backend.db.campaigns.find_one({"id": campaign_id}))
+        assert campaign["status"] == "sending"
+        assert campaign["dispatch"] == "server"
+        assert campaign["resultsTotal"] == campaign["resultsPending"] == 6  # 3 contacts x 2 channels
+        assert backend.run(backend.db.campaign_results.count_documents({"campaignId": campaign_id})) == 6
+
+    def test_future_campaign_not_claimed(self, backend, campaign_env):
+        campaign_env(datetime.now(timezone.utc) + timedelta(hours=1))
+        assert backend.run(_scheduler(backend.server, "worker-a")._fire_next_due_campaign()) is False
+
+    def test_overdue_campaign_marked_missed(self, backend, campaign_env):
+        campaign_id = campaign_env(datetime.now(timezone.utc) - timedelta(days=30))
+        scheduler = _scheduler(backend.server, "worker-a")
+
+        backend.run(scheduler.tick())
+        campaign = backend.run(backend.db.campaigns.find_one({"id": campaign_id}))
+        assert campaign["status"] == "missed"
+        assert backend.run(backend.db.campaign_results.count_documents({"campaignId": campaign_id})) == 0
+        assert all(not adapter.sent for adapter in scheduler.pool.adapters.values())
+
+    def test_tick_dispatches_through_local_adapters(self, backend, campaign_env, monkeypatch):
+        monkeypatch.setattr(backend.server, "CAMPAIGN_DISPATCH_BATCH_SIZE", 2)  # several batches and lease renewals
+        campaign_id = campaign_env(datetime.now(timezone.utc) - timedelta(minutes=1))
+        backend.run(backend.db.users.update_one({"id": "u2"}, {"$set": {"email": ""}}))
+        scheduler = _scheduler(backend.server, "worker-a")
+
+        backend.run(scheduler.tick())
+        campaign = backend.run(backend.db.campaigns.find_one({"id": campaign_id}))
+        assert campaign["status"] == "completed"
+        assert (campaign["resultsSent"], campaign["resultsFailed"], campaign["resultsPending"]) == (5, 1, 0)
+        assert isinstance(campaign["dispatchFinishedAt"], datetime)
+        assert "dispatchLease" not in campaign
+        assert len(scheduler.pool.adapters["whatsapp"].sent) == 3
+        assert [m["message"] for m in scheduler.pool.adapters["email"].sent] == ["Salut Contact", "Salut Contact"]
+
+        failed = backend.run(backend.db.campaign_results.find_one({"campaignId": campaign_id, "status": "failed"}))
+        assert failed["contactId"] == "u2" and failed["error"] == "Destinataire manquant"
+
+    def test_dispatch_respects_other_workers_lease(self, backend, campaign_env):
+        campaign_id = campaign_env(datetime.now(timezone.utc) - timedelta(minutes=1))
+        owner = _scheduler(backend.server, "worker-a")
+        backend.run(owner._fire_next_due_campaign())
+
+        lease = {"owner": "worker-a", "expiresAt": datetime.now(timezone.utc) + timedelta(minutes=5)}
+        backend.run(backend.db.campaigns.update_one({"id": campaign_id}, {"$set": {"dispatchLease": lease}}))
+        other = _scheduler(backend.server, "worker-b")
+        assert backend.run(other._dispatch_next_campaign()) is False
+
+        # Expired lease (worker gone): taken over by another worker
+        expired = {"owner": "worker-a", "expiresAt": datetime.now(timezone.utc) - timedelta(seconds=1)}
+        backend.run(backend.db.campaigns.update_one({"id": campaign_id}, {"$set": {"dispatchLease": expired}}))
+        assert backend.run(other._dispatch_next_campaign()) is True
+        assert len(other.pool.adapters["email"].sent) == 3
+
+    def test_dispatch_stops_when_its_lease_is_taken(self, backend, campaign_env, monkeypatch):
+        monkeypatch.setattr(backend.server, "CAMPAIGN_DISPATCH_BATCH_SIZE", 2)
+        campaign_id = campaign_env(datetime.now(timezone.utc) - timedelta(minutes=1))
+        scheduler = _scheduler(backend.server, "worker-a")
+        backend.run(scheduler._fire_next_due_campaign())
+        send = scheduler.pool.send
+
+        async def send_then_lose_lease(result, campaign):
+            # Lease replaced while the first batch is being sent (manual relaunch / takeover)
+            await backend.db.campaigns.update_one(
+                {"id": campaign_id}, {"$set": {"dispatchLease": {"owner": "other", "token": "other"}}}
+            )
+            return await send(result, campaign)
+
+        monkeypatch.setattr(scheduler.pool, "send", send_then_lose_lease)
+        assert backend.run(scheduler._dispatch_next_campaign()) is True
+
+        campaign = backend.run(backend.db.campaigns.find_one({"id": campaign_id}))
+        assert campaign["resultsPending"] == 6  # nothing written over the new owner's results
+        assert "dispatchFinishedAt" not in campaign
+        assert campaign["dispatchLease"]["token"] == "other"  # not released by the old dispatcher
+
+    def test_record_results_batches_counters(self, backend, campaign_env):
+        server = backend.server
+        campaign_id = campaign_env(None, channels={"whatsapp": True, "email": False}, status="draft")
+        backend.run(server.launch_campaign(campaign_id))
+
+        campaign = backend.run(server._record_campaign_results(campaign_id, [
+            {"contactId": "u0", "channel": "whatsapp", "status": "sent"},
+            {"contactId": "u1", "channel": "whatsapp", "status": "failed", "error": "HTTP 500"},
+        ]))
+        assert (campaign["resultsSent"], campaign["resultsFailed"], campaign["resultsPending"]) == (1, 1, 1)
+        assert campaign["status"] == "sending"
+
+        campaign = backend.run(server._record_campaign_results(campaign_id, [
+            {"contactId": "u1", "channel": "whatsapp", "status": "sent"},  # resend of a failed result
+            {"contactId": "u2", "channel": "whatsapp", "status": "sent"},
+            {"contactId": "u2", "channel": "whatsapp", "status": "sent"},  # duplicate: counted once
+        ]))
+        assert (campaign["resultsSent"], campaign["resultsFailed"], campaign["resultsPending"]) == (3, 0, 0)
+        assert campaign["status"] == "completed"
+
+    def test_manual_relaunch_refused_during_server_dispatch(self, backend, campaign_env):
+        server = backend.server
+        campaign_id = campaign_env(datetime.now(timezone.utc) - timedelta(minutes=1))
+        backend.run(_scheduler(server, "worker-a")._fire_next_due_campaign())  # sending, dispatch: server
+
+        with pytest.raises(server.HTTPException) as exc:
+            backend.run(server.launch_campaign(campaign_id))
+        assert exc.value.status_code == 409
+        campaign = backend.run(backend.db.campaigns.find_one({"id": campaign_id}))
+        assert campaign["status"] == "sending" and campaign["resultsTotal"] == 6
+        assert backend.run(backend.db.campaign_results.count_documents({"campaignId": campaign_id})) == 6
+
+        # Once the server dispatch is finished, a manual relaunch is allowed again
+        backend.run(backend.db.campaigns.update_one(
+            {"id": campaign_id}, {"$set": {"dispatchFinishedAt": datetime.now(timezone.utc)}}
+        ))
+        backend.run(server.launch_campaign(campaign_id))
+        assert backend.run(backend.db.campaigns.find_one({"id": campaign_id}))["dispatch"] == "manual"
@@ -26,6 +26,8 @@ class TestCampaigns:
         assert response.status_code == 200
         data = response.json()
         assert isinstance(data, list)
+        # Counters only: results are paged through /campaigns/{id}/results
+        assert all("results" not in campaign for campaign in data)
     
     def test_create_campaign_immediate(self, api_client):
         """Test creating an immediate campaign (no scheduledAt)"""
@@ -65,7 +67,7 @@ class TestCampaigns:
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "scheduled"  # Scheduled campaigns have status "scheduled"
-        assert data["scheduledAt"] == "2025-12-25T10:00:00"
+        assert data["scheduledAt"].startswith("2025-12-25T09:00:00")  # Europe/Zurich local time stored as UTC
         return data["id"]
     
     def test_get_single_campaign(self, api_client):
@@ -138,7 +140,121 @@ class TestCampaigns:
         assert data["status"] == "sending"
         assert "results" in data
         assert isinstance(data["results"], list)
-    
+        assert data["resultsTotal"] == len(data["results"])
+        assert data["resultsPending"] == len(data["results"])
+
+    def test_mark_sent_updates_counters(self, api_client):
+        """Test POST /api/campaigns/{id}/mark-sent maintains resultsSent/resultsPending counters"""
+        # Create a contact so the campaign has at least one result
+        user_response = api_client.post(f"{BASE_URL}/api/users", json={
+            "name": f"TEST_Contact_{uuid.uuid4().hex[:6]}",
+            "email": f"test_{uuid.uuid4().hex[:6]}@example.com",
+            "whatsapp": "+41765203363"
+        })
+        contact_id = user_response.json()["id"]
+
+        campaign_data = {
+            "name": f"TEST_Counters_{uuid.uuid4().hex[:6]}",
+            "message": "Counters test",
+            "mediaUrl": "",
+            "mediaFormat": "16:9",
+            "targetType": "selected",
+            "selectedContacts": [contact_id],
+            "channels": {"whatsapp": True, "email": False, "instagram": False},
+            "scheduledAt": None
+        }
+        campaign_id = api_client.post(f"{BASE_URL}/api/campaigns", json=campaign_data).json()["id"]
+        launched = api_client.post(f"{BASE_URL}/api/campaigns/{campaign_id}/launch").json()
+        assert launched["resultsTotal"] == 1
+        assert launched["resultsPending"] == 1
+
+        response = api_client.post(f"{BASE_URL}/api/campaigns/{campaign_id}/mark-sent", json={"contactId": contact_id, "channel": "whatsapp"})
+        assert response.status_code == 200
+
+        # Marking the same result twice must not double-count
+        api_client.post(f"{BASE_URL}/api/campaigns/{campaign_id}/mark-sent", json={"contactId": contact_id, "channel": "whatsapp"})
+
+        data = api_client.get(f"{BASE_URL}/api/campaigns/{campaign_id}").json()
+        assert data["resultsSent"] == 1
+        assert data["resultsPending"] == 0
+        assert data["status"] == "completed"
+        assert data["results"][0]["status"] == "sent"
+
+        # Paginated results endpoint
+        page = api_client.get(f"{BASE_URL}/api/campaigns/{campaign_id}/results?status=sent").json()
+        assert page["pagination"]["total"] == 1
+
+        api_client.delete(f"{BASE_URL}/api/campaigns/{campaign_id}")
+        api_client.delete(f"{BASE_URL}/api/users/{contact_id}")
+
+    def test_mark_sent_batch(self, api_client):
+        """Test POST /api/campaigns/{id}/mark-sent/batch applies several results and returns counters"""
+        contact_ids = []
+        for _ in range(2):
+            user = api_client.post(f"{BASE_URL}/api/users", json={
+                "name": f"TEST_Batch_{uuid.uuid4().hex[:6]}",
+                "email": f"test_{uuid.uuid4().hex[:6]}@example.com",
+                "whatsapp": "+41765203363"
+            }).json()
+            contact_ids.append(user["id"])
+
+        campaign_data = {
+            "name": f"TEST_Batch_{uuid.uuid4().hex[:6]}",
+            "message": "Batch test",
+            "mediaUrl": "",
+            "mediaFormat": "16:9",
+            "targetType": "selected",
+            "selectedContacts": contact_ids,
+            "channels": {"whatsapp": True, "email": True, "instagram": False},
+            "scheduledAt": None
+        }
+        campaign_id = api_client.post(f"{BASE_URL}/api/campaigns", json=campaign_data).json()["id"]
+        api_client.post(f"{BASE_URL}/api/campaigns/{campaign_id}/launch")
+
+        batch = {"results": [
+            {"contactId": contact_ids[0], "channel": "whatsapp", "status": "sent"},
+            {"contactId": contact_ids[0], "channel": "email", "status": "sent"},
+            {"contactId": contact_ids[1], "channel": "whatsapp", "status": "failed"}
+        ]}
+        response = api_client.post(f"{BASE_URL}/api/campaigns/{campaign_id}/mark-sent/batch", json=batch)
+        assert response.status_code == 200
+        counters = response.json()["campaign"]
+        assert counters["resultsTotal"] == 4
+        assert counters["resultsSent"] == 2
+        assert counters["resultsFailed"] == 1
+        assert counters["resultsPending"] == 1
+        assert counters["status"] == "sending"
+
+        # Retry the failed one and send the last pending one -> campaign completes
+        batch = {"results": [
+            {"contactId": contact_ids[1], "channel": "whatsapp", "status": "sent"},
+            {"contactId": contact_ids[1], "channel": "email", "status": "sent"}
+        ]}
+        counters = api_client.post(f"{BASE_URL}/api/campaigns/{campaign_id}/mark-sent/batch", json=batch).json()["campaign"]
+        assert counters["resultsSent"] == 4
+        assert counters["resultsFailed"] == 0
+        assert counters["resultsPending"] == 0
+        assert counters["status"] == "completed"
+
+        # Invalid status is rejected
+        response = api_client.post(f"{BASE_URL}/api/campaigns/{campaign_id}/mark-sent/batch", json={"results": [
+            {"contactId": contact_ids[0], "channel": "whatsapp", "status": "bogus"}
+        ]})
+        assert response.status_code == 400
+
+        api_client.delete(f"{BASE_URL}/api/campaigns/{campaign_id}")
+        for contact_id in contact_ids:
+            api_client.delete(f"{BASE_URL}/api/users/{contact_id}")
+
+    def test_scheduler_status(self, api_client):
+        """Test GET /api/campaign-scheduler/status exposes mode and per-channel rates"""
+        response = api_client.get(f"{BASE_URL}/api/campaign-scheduler/status")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["mode"] in ("live", "local")
+        assert "whatsapp" in data["rates"]
+        assert "email" in data["rates"]
+
     def test_delete_campaign(self, api_client):
         """Test DELETE /api/campaigns/{id}"""
         # First create a campaign
@@ -0,0 +1,242 @@
+"""
+Checkout holds and inventory races (server.py against a test MongoDB, see conftest.backend)
+- stock unit: one per booking for a course (whatever the number of dates), quantity for a product
+- Stripe hold flow: held at checkout (released if the transaction cannot be saved), held -> booked
+  on payment, released on checkout.session.expired or by the sweeper, late payment after release
+- concurrent bookings never oversell headsets or offer stock
+- occurrence counters include reservations made before the occurrence existed
+- calendar window: started sessions of the day skipped, on-demand occurrences beyond it kept
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+DATES = ["2030-06-02", "2030-06-09"]
+
+
+@pytest.fixture
+def shop(backend):
+    """A course with 2 headsets per session and an offer with 3 units of stock"""
+    server = backend.server
+    db = backend.db
+    course_id, offer_id = f"course-{uuid.uuid4().hex[:8]}", f"offer-{uuid.uuid4().hex[:8]}"
+
+    async def setup():
+        await server._ensure_inventory_indexes()
+        await db.courses.insert_one({"id": course_id, "name": "TEST_Hold", "weekday": 0, "time": "18:30", "capacity": 2})
+        await db.offers.insert_one({"id": offer_id, "name": "TEST_Hold", "price": 30.0, "stock": 3})
+
+    async def cleanup():
+        await db.courses.delete_many({"id": course_id})
+        await db.offers.delete_many({"id": offer_id})
+        await db.course_occurrences.delete_many({"courseId": course_id})
+        await db.payment_transactions.delete_many({"inventory.offerId": offer_id})
+        await db.reservations.delete_many({"courseId": course_id})
+
+    backend.run(setup())
+
+    def hold(dates=DATES, quantity=1, expires_in=timedelta(minutes=30)):
+        """Same writes as /stripe/create-checkout, without Stripe: returns the session id"""
+        checkout = server.StripeCheckoutRequest(
+            offer_id=offer_id, offer_name="TEST_Hold", price=30.0, user_name="TEST_Hold",
+            user_email="hold@example.com", course_id=course_id, course_name="TEST_Hold",
+            origin_url="http://localhost", quantity=quantity, selected_dates=dates
+        )
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+
+        async def create():
+            inventory = await server._hold_checkout_inventory(checkout)
+            now = datetime.now(timezone.utc)
+            await db.payment_transactions.insert_one({
+                "id": str(uuid.uuid4()), "session_id": session_id, "payment_status": "pending",
+                "createdAt": now, "inventory": inventory, "holdStatus": "held",
+                "holdExpiresAt": now + expires_in
+            })
+
+        backend.run(create())
+        return session_id
+
+    def state():
+        async def read():
+            offer = await db.offers.find_one({"id": offer_id})
+            occurrences = await db.course_occurrences.find({"courseId": course_id}).to_list(None)
+            return offer["stock"], {o["date"]: (o["held"], o["booked"]) for o in occurrences}
+        return backend.run(read())
+
+    yield SimpleNamespace(course_id=course_id, offer_id=offer_id, hold=hold, state=state)
+    backend.run(cleanup())
+
+
+def _hold_status(backend, session_id):
+    return backend.run(backend.db.payment_transactions.find_one({"session_id": session_id}))["holdStatus"]
+
+
+class TestCheckoutHold:
+    def test_hold_takes_one_stock_unit_per_booking(self, backend, shop):
+        shop.hold(quantity=len(DATES))  # older clients send the number of dates as quantity
+        stock, occurrences = shop.state()
+        assert stock == 2
+        assert occurrences == {date: (1, 0) for date in DATES}
+
+    def test_product_takes_quantity(self, backend, shop):
+        async def buy():
+            return await backend.server._acquire_inventory(shop.offer_id, 2, "N/A", ["2030-06-02"], "booked")
+
+        inventory = backend.run(buy())
+        assert inventory["stock"] == 2 and inventory["dates"] == []
+        assert shop.state()[0] == 1
+
+    def test_payment_moves_held_to_booked_once(self, backend, shop):
+        server = backend.server
+        session_id = shop.hold()
+        assert backend.run(server._confirm_checkout_hold(session_id))["dates"] == DATES
+        assert backend.run(server._confirm_checkout_hold(session_id)) is None  # webhook retry / poll
+        stock, occurrences = shop.state()
+        assert stock == 2
+        assert occurrences == {date: (0, 1) for date in DATES}
+        assert _hold_status(backend, session_id) == "booked"
+
+        # A paid checkout is never released afterwards
+        assert backend.run(server._release_checkout_hold(session_id)) is False
+        assert shop.state()[1] == {date: (0, 1) for date in DATES}
+
+    def test_expired_checkout_releases_once(self, backend, shop):
+        server = backend.server
+        session_id = shop.hold()
+        assert backend.run(server._release_checkout_hold(session_id)) is True  # checkout.session.expired
+        assert backend.run(server._release_checkout_hold(session_id)) is False
+        stock, occurrences = shop.state()
+        assert stock == 3
+        assert occurrences == {date: (0, 0) for date in DATES}
+        assert _hold_status(backend, session_id) == "released"
+
+    def test_sweeper_releases_only_expired_holds(self, backend, shop):
+        server = backend.server
+        expired = shop.hold(dates=DATES[:1], expires_in=timedelta(seconds=-1))
+        active = shop.hold(dates=DATES[:1])
+        assert backend.run(server.checkout_hold_sweeper.sweep()) >= 1
+        assert _hold_status(backend, expired) == "released"
+        assert _hold_status(backend, active) == "held"
+        assert shop.state() == (2, {DATES[0]: (1, 0)})
+
+    def test_failed_transaction_insert_releases_hold(self, backend, shop, monkeypatch):
+        from starlette.requests import Request
+        server = backend.server
+        backend.run(server._ensure_payment_indexes())
+        taken = shop.hold(dates=DATES[:1])
+
+        async def create_checkout_session(request):
+            # Same session id as an existing transaction: the unique index rejects the insert
+            return SimpleNamespace(session_id=taken, url="https://checkout.stripe.test")
+
+        monkeypatch.setattr(server, "_get_stripe_checkout",
+                            lambda webhook_url="": SimpleNamespace(create_checkout_session=create_checkout_session))
+        checkout = server.StripeCheckoutRequest(
+            offer_id=shop.offer_id, offer_name="TEST_Hold", price=30.0, user_name="TEST_Hold",
+            user_email="hold@example.com", course_id=shop.course_id, course_name="TEST_Hold",
+            origin_url="http://localhost", selected_dates=DATES[:1]
+        )
+        request = Request({"type": "http", "scheme": "http", "server": ("testserver", 80), "path": "/",
+                           "root_path": "", "query_string": b"", "headers": []})
+        with pytest.raises(server.HTTPException) as error:
+            backend.run(server.create_stripe_checkout(request, checkout))
+        assert error.value.status_code == 500
+        assert shop.state() == (2, {DATES[0]: (1, 0)})  # only the first checkout still holds
+
+    def test_late_payment_after_release_is_booked(self, backend, shop):
+        server = backend.server
+        late = shop.hold(dates=DATES[:1])
+        backend.run(server._release_checkout_hold(late))
+        # Both headsets of the session sold to others in the meantime
+        for _ in range(2):
+            backend.run(server._confirm_checkout_hold(shop.hold(dates=DATES[:1])))
+
+        inventory = backend.run(server._confirm_checkout_hold(late))
+        assert inventory["dates"] == DATES[:1]
+        assert _hold_status(backend, late) == "booked"
+        # The customer paid: placed over capacity, stock taken back
+        assert shop.state() == (0, {DATES[0]: (0, 3)})
+        assert backend.run(server._confirm_checkout_hold(late)) is None
+
+
+class TestConcurrentBookings:
+    def test_take_seat_never_oversells(self, backend, shop):
+        server = backend.server
+
+        async def race():
+            await server._ensure_occurrence(shop.course_id, DATES[0], 2)
+            return await asyncio.gather(*[server._take_seat(shop.course_id, DATES[0], "held") for _ in range(10)])
+
+        assert sorted(backend.run(race())) == [False] * 8 + [True] * 2
+        assert shop.state()[1] == {DATES[0]: (2, 0)}
+
+    def test_concurrent_checkouts_never_oversell(self, backend, shop):
+        server = backend.server
+
+        async def book():
+            try:
+                return await server._acquire_inventory(shop.offer_id, 1, shop.course_id, DATES, "held")
+            except server.HTTPException as e:
+                return e.status_code
+
+        async def race():
+            return await asyncio.gather(*[book() for _ in range(8)])
+
+        results = backend.run(race())
+        booked = [r for r in results if isinstance(r, dict)]
+        assert len(booked) == 2  # 2 headsets per session
+        assert [r for r in results if not isinstance(r, dict)] == [409] * 6
+        # Failed bookings gave back their stock and any headset already taken
+        assert shop.state() == (1, {date: (2, 0) for date in DATES})
+
+
+class TestOccurrenceCounters:
+    def _legacy_reservation(self, backend, shop, day):
+        # Reservation made before inventory tracking: only the client dates are stored
+        backend.run(backend.db.reservations.insert_one({
+            "id": str(uuid.uuid4()), "courseId": shop.course_id, "selectedDates": [f"{day}T16:30:00.000Z"]
+        }))
+
+    def test_new_occurrence_counts_older_reservations(self, backend, shop):
+        server = backend.server
+        self._legacy_reservation(backend, shop, DATES[0])
+        backend.run(server._ensure_occurrence(shop.course_id, DATES[0], 2))
+        assert shop.state()[1] == {DATES[0]: (0, 1)}
+        # Only one headset left
+        assert backend.run(server._take_seat(shop.course_id, DATES[0], "booked")) is True
+        assert backend.run(server._take_seat(shop.course_id, DATES[0], "booked")) is False
+
+    def test_materialize_reconciles_undercounted_occurrence(self, backend, shop):
+        server = backend.server
+        today = datetime.now(server.COURSE_TIMEZONE).date()
+        day = server._course_dates({"weekday": 0, "time": "18:30"}, today, 1)[0][0]
+        backend.run(server._ensure_occurrence(shop.course_id, day, 2))
+        backend.run(server._take_seat(shop.course_id, day, "booked"))
+        self._legacy_reservation(backend, shop, day)  # not seen when the occurrence was created
+
+        backend.run(server._materialize_occurrences(weeks=1))
+        occurrence = backend.run(backend.db.course_occurrences.find_one({"courseId": shop.course_id, "date": day}))
+        assert occurrence["booked"] == 1  # max(counter, reservations): the seat above has no reservation
+
+        self._legacy_reservation(backend, shop, day)
+        backend.run(server._materialize_occurrences(weeks=1))
+        occurrence = backend.run(backend.db.course_occurrences.find_one({"courseId": shop.course_id, "date": day}))
+        assert occurrence["booked"] == 2
+
+    def test_materialize_keeps_on_demand_occurrences_beyond_the_window(self, backend, shop):
+        server = backend.server
+        backend.run(server._ensure_occurrence(shop.course_id, DATES[0], 2))  # booked far ahead, no seat taken yet
+        backend.run(server._materialize_occurrences(weeks=1))
+        assert DATES[0] in shop.state()[1]
+
+
+class TestCourseDates:
+    def test_started_session_of_the_day_is_skipped(self, backend):
+        server = backend.server
+        today = datetime.now(server.COURSE_TIMEZONE).date()
+        course = {"weekday": (today.weekday() + 1) % 7, "time": "00:00"}  # today, already started
+        dates = [day for day, _ in server._course_dates(course, today, 2)]
+        assert dates == [(today + timedelta(days=7)).isoformat(), (today + timedelta(days=14)).isoformat()]
@@ -0,0 +1,97 @@
+"""
+Test suite for HTTP conditional requests on catalog endpoints
+Tests:
+1. GET catalog endpoints return ETag + Cache-Control
+2. If-None-Match with the current ETag returns 304 without body
+3. A write route bumps the collection version (new ETag, 200)
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://livejam-coach.preview.emergentagent.com').rstrip('/')
+
+CATALOG_ENDPOINTS = ["courses", "offers", "concept", "payment-links", "categories", "manifest.json"]
+
+
+class TestCatalogETags:
+    """ETag / If-None-Match validators"""
+
+    @pytest.mark.parametrize("endpoint", CATALOG_ENDPOINTS)
+    def test_etag_and_cache_control_present(self, endpoint):
+        response = requests.get(f"{BASE_URL}/api/{endpoint}")
+        assert response.status_code == 200
+        assert response.headers.get("ETag"), f"/{endpoint} should return an ETag"
+        assert response.headers["ETag"].startswith('W/"'), "Gzip re-encodes the body: the ETag must be weak"
+        assert "must-revalidate" in response.headers.get("Cache-Control", "")
+        print(f"✅ /{endpoint} ETag: {response.headers['ETag']}")
+
+    @pytest.mark.parametrize("endpoint", CATALOG_ENDPOINTS)
+    def test_if_none_match_returns_304(self, endpoint):
+        etag = requests.get(f"{BASE_URL}/api/{endpoint}").headers["ETag"]
+        response = requests.get(f"{BASE_URL}/api/{endpoint}", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers.get("ETag") == etag
+        # A cache may send back the opaque tag without the weak prefix
+        assert requests.get(f"{BASE_URL}/api/{endpoint}", headers={"If-None-Match": etag[2:]}).status_code == 304
+        print(f"✅ /{endpoint} revalidated with 304")
+
+    def test_write_changes_etag(self):
+        etag_before = requests.get(f"{BASE_URL}/api/courses").headers["ETag"]
+
+        course_data = {
+            "name": f"TEST_ETag_Course_{uuid.uuid4().hex[:6]}",
+            "weekday": 2,
+            "time": "19:00",
+            "locationName": "Test",
+            "visible": False
+        }
+        created = requests.post(f"{BASE_URL}/api/courses", json=course_data)
+        assert created.status_code == 200
+        course_id = created.json()["id"]
+
+        try:
+            response = requests.get(f"{BASE_URL}/api/courses", headers={"If-None-Match": etag_before})
+            assert response.status_code == 200, "A write must invalidate the previous ETag"
+            assert response.headers["ETag"] != etag_before
+            assert any(c["id"] == course_id for c in response.json())
+        finally:
+            requests.delete(f"{BASE_URL}/api/courses/{course_id}")
+        print("✅ Course creation bumped the courses ETag")
+
+
+class TestPublicBootstrap:
+    """Single public bootstrap request for the booking page"""
+
+    def test_bootstrap_public_projection(self):
+        response = requests.get(f"{BASE_URL}/api/public/bootstrap")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data.keys()) == {"courses", "offers", "concept", "paymentLinks"}
+        assert all(c.get("visible") is not False and not c.get("archived") for c in data["courses"])
+        assert all(o.get("visible") is not False for o in data["offers"])
+        assert all("authorEmail" not in item for item in data["courses"] + data["offers"])
+        # Only the public payment links, never the coach notification contacts
+        assert set(data["paymentLinks"].keys()) == {"stripe", "paypal", "twint", "coachWhatsapp"}
+        print(f"✅ Bootstrap: {len(data['courses'])} courses, {len(data['offers'])} offers")
+
+    def test_bootstrap_revalidates_and_follows_writes(self):
+        etag = requests.get(f"{BASE_URL}/api/public/bootstrap").headers["ETag"]
+        assert requests.get(f"{BASE_URL}/api/public/bootstrap", headers={"If-None-Match": etag}).status_code == 304
+
+        offer = requests.post(f"{BASE_URL}/api/offers", json={
+            "name": f"TEST_Bootstrap_{uuid.uuid4().hex[:6]}", "price": 10.0, "visible": True
+        }).json()
+        try:
+            response = requests.get(f"{BASE_URL}/api/public/bootstrap", headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert any(o["id"] == offer["id"] for o in response.json()["offers"])
+        finally:
+            requests.delete(f"{BASE_URL}/api/offers/{offer['id']}")
+        print("✅ Bootstrap ETag follows catalog writes")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,124 @@
+"""
+Test suite for reservation inventory
+Tests:
+1. Offer stock is decremented atomically and never goes below zero (409)
+2. Course capacity (headsets per session date) is enforced per date
+3. Deleting a reservation gives the headset and stock back
+4. Course occurrence calendar lists dated sessions with availability
+"""
+import pytest
+import requests
+import os
+import uuid
+from datetime import date
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://livejam-coach.preview.emergentagent.com').rstrip('/')
+
+
+def _reservation(course, offer, dates, quantity=1):
+    return {
+        "userId": "test-user-id",
+        "userName": "TEST_Inventory",
+        "userEmail": "test@example.com",
+        "courseId": course["id"],
+        "courseName": course["name"],
+        "courseTime": course["time"],
+        "datetime": dates[0],
+        "selectedDates": dates,
+        "offerId": offer["id"],
+        "offerName": offer["name"],
+        "price": 0.0,
+        "quantity": quantity,
+        "totalPrice": 0.0
+    }
+
+
+@pytest.fixture
+def course():
+    course = requests.post(f"{BASE_URL}/api/courses", json={
+        "name": f"TEST_Inventory_{uuid.uuid4().hex[:6]}", "weekday": 0, "time": "18:30",
+        "locationName": "Test", "visible": False, "capacity": 1
+    }).json()
+    yield course
+    requests.delete(f"{BASE_URL}/api/courses/{course['id']}")
+
+
+@pytest.fixture
+def offer():
+    offer = requests.post(f"{BASE_URL}/api/offers", json={
+        "name": f"TEST_Inventory_{uuid.uuid4().hex[:6]}", "price": 0.0, "visible": False, "stock": 2
+    }).json()
+    yield offer
+    requests.delete(f"{BASE_URL}/api/offers/{offer['id']}")
+
+
+class TestInventory:
+    def test_course_capacity_per_date(self, course, offer):
+        sunday = "2030-06-02T16:30:00.000Z"  # 18:30 Europe/Zurich
+        first = requests.post(f"{BASE_URL}/api/reservations", json=_reservation(course, offer, [sunday]))
+        assert first.status_code == 200
+
+        full = requests.post(f"{BASE_URL}/api/reservations", json=_reservation(course, offer, [sunday]))
+        assert full.status_code == 409, "The only headset of this session is already booked"
+
+        # Another date of the same course still has its headset
+        other = requests.post(f"{BASE_URL}/api/reservations", json=_reservation(course, offer, ["2030-06-09T16:30:00.000Z"]))
+        assert other.status_code == 200
+
+        # Deleting the first reservation frees its headset
+        requests.delete(f"{BASE_URL}/api/reservations/{first.json()['id']}")
+        again = requests.post(f"{BASE_URL}/api/reservations", json=_reservation(course, offer, [sunday]))
+        assert again.status_code == 200
+
+        for res in (other, again):
+            requests.delete(f"{BASE_URL}/api/reservations/{res.json()['id']}")
+        print("✅ Headset capacity enforced per session date")
+
+    def test_offer_stock_never_negative(self, offer):
+        product = {"id": "N/A", "name": "Produit physique", "time": ""}
+        created = []
+        try:
+            for _ in range(2):
+                response = requests.post(f"{BASE_URL}/api/reservations", json=_reservation(product, offer, [""]))
+                assert response.status_code == 200
+                created.append(response.json()["id"])
+            sold_out = requests.post(f"{BASE_URL}/api/reservations", json=_reservation(product, offer, [""]))
+            assert sold_out.status_code == 409
+            stock = next(o["stock"] for o in requests.get(f"{BASE_URL}/api/offers").json() if o["id"] == offer["id"])
+            assert stock == 0
+        finally:
+            for reservation_id in created:
+                requests.delete(f"{BASE_URL}/api/reservations/{reservation_id}")
+        stock = next(o["stock"] for o in requests.get(f"{BASE_URL}/api/offers").json() if o["id"] == offer["id"])
+        assert stock == 2
+        print("✅ Offer stock decremented atomically and restored on delete")
+
+
+class TestOccurrences:
+    def test_calendar_with_availability(self, course, offer):
+        response = requests.get(f"{BASE_URL}/api/courses/occurrences", params={"course_id": course["id"]})
+        assert response.status_code == 200
+        occurrences = response.json()
+        assert len(occurrences) >= 4
+        # weekday 0 = Sunday; isoweekday() 7 = Sunday
+        assert all(date.fromisoformat(o["date"]).isoweekday() == 7 for o in occurrences)
+        assert [o["date"] for o in occurrences] == sorted(o["date"] for o in occurrences)
+        assert occurrences[0]["available"] == 1
+
+        first = occurrences[0]
+        reservation = requests.post(
+            f"{BASE_URL}/api/reservations", json=_reservation(course, offer, [first["date"]])
+        ).json()
+        try:
+            after = requests.get(f"{BASE_URL}/api/courses/occurrences", params={
+                "course_id": course["id"], "start": first["date"], "end": first["date"]
+            }).json()
+            assert len(after) == 1
+            assert after[0]["booked"] == 1 and after[0]["available"] == 0
+        finally:
+            requests.delete(f"{BASE_URL}/api/reservations/{reservation['id']}")
+        print(f"✅ {len(occurrences)} dated sessions, availability follows bookings")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
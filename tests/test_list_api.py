@@ -0,0 +1,131 @@
+"""
+Uniform list layer tests (backend/list_api.py)
+Runs in-process: cursor encoding, keyset conditions, whitelists and projection.
+"""
+import os
+import sys
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("bson")
+from bson import ObjectId  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from pydantic import BaseModel, Field, TypeAdapter  # noqa: E402
+from pymongo import ASCENDING, DESCENDING  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from list_api import ListSpec, decode_cursor, encode_cursor, keyset_query, list_response_model  # noqa: E402
+
+
+class Item(BaseModel):
+    id: str
+    name: str
+    price: float = 0.0
+    visible: bool = True
+
+
+class Stamped(BaseModel):
+    id: str
+    price: float = 0.0
+    tags: List[str] = Field(default_factory=list)
+    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+SPEC = ListSpec(Item, filters={"visible": bool, "price": float}, sorts=("name", "price"))
+
+
+class TestListApi:
+    def test_cursor_roundtrip(self):
+        oid = ObjectId()
+        when = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        assert decode_cursor(encode_cursor(when, oid)) == (when, oid)
+        assert decode_cursor(encode_cursor("abc", oid)) == ("abc", oid)
+
+    def test_invalid_cursor(self):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor("not-a-cursor")
+        assert error.value.status_code == 400
+
+    def test_keyset_descending(self):
+        oid = ObjectId()
+        assert keyset_query("price", DESCENDING, 10, oid) == {
+            "$or": [{"price": {"$lt": 10}}, {"price": 10, "_id": {"$lt": oid}}, {"price": None}]
+        }
+        assert keyset_query("_id", ASCENDING, oid, oid) == {"_id": {"$gt": oid}}
+
+    def test_keyset_descending_mixed_types_keeps_lower_types_and_nulls(self):
+        # Legacy leads: createdAt stored as ISO strings, newer ones as Dates
+        oid = ObjectId()
+        when = datetime(2026, 1, 2, tzinfo=timezone.utc)
+        branches = keyset_query("createdAt", DESCENDING, when, oid)["$or"]
+        assert branches[:2] == [{"createdAt": {"$lt": when}}, {"createdAt": when, "_id": {"$lt": oid}}]
+        assert "string" in branches[2]["createdAt"]["$type"]
+        assert "date" not in branches[2]["createdAt"]["$type"]
+        assert branches[3] == {"createdAt": None}
+
+    def test_keyset_ascending_mixed_types_keeps_higher_types(self):
+        oid = ObjectId()
+        branches = keyset_query("createdAt", ASCENDING, "2025-06-01T10:00:00", oid)["$or"]
+        assert {"createdAt": {"$type": ["object", "array", "binData", "objectId", "bool", "date",
+                                         "timestamp", "regex"]}} in branches
+        assert {"createdAt": None} not in branches
+
+    def test_keyset_null_ascending_keeps_later_values(self):
+        oid = ObjectId()
+        assert keyset_query("name", ASCENDING, None, oid) == {
+            "$or": [{"name": {"$ne": None}}, {"name": None, "_id": {"$gt": oid}}]
+        }
+
+    def test_whitelists(self):
+        assert SPEC.sort("-price") == ("price", DESCENDING)
+        assert SPEC.query({"visible": "false", "other": "x"}) == {"visible": False}
+        for call in (lambda: SPEC.sort("secret"), lambda: SPEC.query({"visible": "maybe"}),
+                     lambda: SPEC.requested_fields("name,password")):
+            with pytest.raises(HTTPException):
+                call()
+
+    def test_projection_and_shape(self):
+        fields = SPEC.requested_fields("name")
+        assert fields == {"id", "name"}
+        assert SPEC.projection(fields, "price") == {"id": 1, "name": 1, "price": 1}
+        doc = {"_id": ObjectId(), "id": "1", "name": "A", "price": 5.0}
+        assert SPEC.shape(doc, fields, "price") == {"id": "1", "name": "A"}
+        assert SPEC.shape({"_id": ObjectId(), "id": "2", "name": "B"}, None, "_id") == {
+            "id": "2", "name": "B", "price": 0.0, "visible": True
+        }
+
+    def test_shape_applies_model_defaults(self):
+        """Static defaults and default_factory applied to the raw documents, stored values untouched"""
+        spec = ListSpec(Stamped, sorts=("createdAt",))
+        when = datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+        docs = [
+            {"_id": ObjectId(), "id": "1", "price": 3.5, "createdAt": when, "legacy": "x"},
+            {"_id": ObjectId(), "id": "2"},
+            {"_id": ObjectId(), "id": "3"},
+        ]
+        first, second, third = spec.shape_many(docs, None, "_id")
+        assert first == {"id": "1", "price": 3.5, "tags": [], "createdAt": when}
+        assert second["price"] == 0.0 and isinstance(second["createdAt"], datetime)
+        assert second["tags"] == [] and second["tags"] is not third["tags"]
+
+    def test_projection_built_once(self):
+        assert SPEC.projection(None, "price") is SPEC.projection(None, "name")
+        assert SPEC.projection(None, "_id") == {"id": 1, "name": 1, "price": 1, "visible": 1, "_id": 1}
+
+    def test_legacy_document_missing_required_field_kept(self):
+        shaped = SPEC.shape_many([{"id": "1", "name": "A"}, {"id": "2"}], None, "_id")
+        assert shaped == [{"id": "1", "name": "A", "price": 0.0, "visible": True}, {"id": "2", "price": 0.0, "visible": True}]
+
+    def test_response_model_documents_both_shapes(self):
+        adapter = TypeAdapter(list_response_model(Item))
+        assert adapter.validate_python([{"id": "1", "name": "A"}])[0].price == 0.0
+        page = adapter.validate_python({"data": [{"id": "1", "name": "A"}], "pagination": {"limit": 1}})
+        assert page.pagination.nextCursor is None
+        assert list_response_model(Item) is list_response_model(Item)  # one OpenAPI schema per model
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,94 @@
+"""
+Built-in Prometheus metrics tests (backend/metrics.py)
+Runs against a small in-process FastAPI app: route-template labels, status counts,
+per-request Mongo attribution and WebSocket message counters.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+fastapi = pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi import FastAPI, HTTPException, WebSocket  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from metrics import MetricsMiddleware, MetricsRegistry, MongoCommandListener  # noqa: E402
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+def client(registry):
+    app = FastAPI()
+    listener = MongoCommandListener(registry)
+
+    @app.get("/api/items/{item_id}")
+    async def get_item(item_id: str):
+        if item_id == "missing":
+            raise HTTPException(status_code=404)
+        # Simulates two Motor commands issued while serving the request
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=500))
+        return {"id": item_id}
+
+    @app.websocket("/ws/echo")
+    async def echo(websocket: WebSocket):
+        await websocket.accept()
+        message = await websocket.receive_text()
+        await websocket.send_text(message)
+        await websocket.close()
+
+    app.add_middleware(MetricsMiddleware, registry=registry)
+    return TestClient(app)
+
+
+class TestMetrics:
+    def test_latency_uses_route_template(self, client, registry):
+        for item_id in ("a", "b", "c"):
+            assert client.get(f"/api/items/{item_id}").status_code == 200
+        histogram = registry.http_latency[("GET", "/api/items/{item_id}")]
+        assert histogram.count == 3
+        assert registry.http_status[("GET", "/api/items/{item_id}", 200)] == 3
+
+    def test_status_counts(self, client, registry):
+        client.get("/api/items/missing")
+        client.get("/nowhere")
+        assert registry.http_status[("GET", "/api/items/{item_id}", 404)] == 1
+        assert registry.http_status[("GET", "unmatched", 404)] == 1
+
+    def test_mongo_calls_attributed_to_request(self, client, registry):
+        client.get("/api/items/a")
+        key = ("GET", "/api/items/{item_id}")
+        assert registry.http_mongo_calls[key] == 2
+        assert registry.http_mongo_seconds[key] == pytest.approx(0.002)
+        assert registry.mongo_commands["find"][0] == 2
+
+    def test_mongo_calls_outside_request_are_global_only(self, registry):
+        MongoCommandListener(registry).succeeded(SimpleNamespace(command_name="ping", duration_micros=100))
+        assert registry.mongo_commands["ping"][0] == 1
+        assert registry.http_mongo_calls == {}
+
+    def test_websocket_messages(self, client, registry):
+        with client.websocket_connect("/ws/echo") as ws:
+            ws.send_text("hello")
+            assert ws.receive_text() == "hello"
+        assert registry.ws_messages[("/ws/echo", "in")] == 1
+        assert registry.ws_messages[("/ws/echo", "out")] == 1
+        assert registry.ws_active["/ws/echo"] == 0
+
+    def test_prometheus_exposition(self, client, registry):
+        client.get("/api/items/a")
+        text = registry.render()
+        assert 'afroboost_http_request_duration_seconds_bucket{method="GET",route="/api/items/{item_id}",le="+Inf"} 1' in text
+        assert 'afroboost_http_responses_total{method="GET",route="/api/items/{item_id}",status="200"} 1' in text
+        assert "# TYPE afroboost_mongo_commands_total counter" in text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
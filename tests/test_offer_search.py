@@ -0,0 +1,69 @@
+"""
+Offer search index tests (backend/offer_search.py)
+Runs in-process: accent folding, prefix matching, ranking, filters and pagination.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from offer_search import OfferSearchIndex, fold  # noqa: E402
+
+OFFERS = [
+    {"id": "single", "name": "Cours à l'unité", "keywords": "séance cardio", "description": "", "category": "service"},
+    {"id": "card", "name": "Carte 10 cours", "keywords": "", "description": "Pack de séances", "category": "service"},
+    {"id": "month", "name": "Abonnement 1 mois", "keywords": "abo", "description": "Accès illimité", "category": "service"},
+    {"id": "tee", "name": "T-shirt Afroboost", "keywords": "", "description": "Coton bio", "category": "tshirt", "isProduct": True},
+]
+
+
+@pytest.fixture
+def index():
+    index = OfferSearchIndex()
+    index.build(OFFERS, version=("test", 1))
+    return index
+
+
+def ids(result):
+    return [offer["id"] for offer in result[1]]
+
+
+class TestOfferSearch:
+    def test_fold_removes_accents_and_punctuation(self):
+        assert fold("Séance d'Été!") == "seance d ete"
+
+    def test_accent_insensitive(self, index):
+        assert ids(index.search("seance")) == ids(index.search("SÉANCE"))
+        assert set(ids(index.search("unite"))) == {"single"}
+
+    def test_prefix_matching(self, index):
+        assert ids(index.search("abon")) == ["month"]
+        assert "tee" in ids(index.search("t-sh"))
+
+    def test_all_terms_required(self, index):
+        assert ids(index.search("carte cours")) == ["card"]
+        assert ids(index.search("carte mois")) == []
+
+    def test_name_ranks_above_description(self, index):
+        # "séance" is a keyword of "single" (x2) but only in the description of "card" (x1)
+        assert ids(index.search("seance")) == ["single", "card"]
+
+    def test_synonyms(self, index):
+        assert ids(index.search("abonnement"))[0] == "month"
+        assert "single" in ids(index.search("session"))
+
+    def test_filters(self, index):
+        assert ids(index.search("", category="TSHIRT")) == ["tee"]
+        assert "tee" not in ids(index.search("", is_product=False))
+
+    def test_pagination(self, index):
+        total, first = index.search("", page=1, limit=3)
+        _, second = index.search("", page=2, limit=3)
+        assert total == 4
+        assert len(first) == 3 and len(second) == 1
+        assert {o["id"] for o in first + second} == {o["id"] for o in OFFERS}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
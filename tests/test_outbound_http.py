@@ -0,0 +1,142 @@
+"""
+Shared outbound HTTP layer tests (backend/outbound_http.py)
+Runs against a local stub server: keep-alive reuse, retry/backoff, per-host limit, timeouts.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from outbound_http import OutboundHTTP  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the OAuth / Stripe / LLM upstreams"""
+    protocol_version = "HTTP/1.1"  # keep-alive
+    flaky_calls = 0
+    connections = set()
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"ok"):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        cls = StubHandler
+        cls.connections.add(self.client_address)
+        if self.path == "/ok":
+            self._reply(200)
+        elif self.path == "/flaky":
+            with cls.lock:
+                cls.flaky_calls += 1
+                calls = cls.flaky_calls
+            self._reply(503 if calls <= 2 else 200)
+        elif self.path == "/slow":
+            with cls.lock:
+                cls.in_flight += 1
+                cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            time.sleep(0.2)
+            with cls.lock:
+                cls.in_flight -= 1
+            self._reply(200)
+        elif self.path == "/hang":
+            time.sleep(2)
+            self._reply(200)
+        else:
+            self._reply(404)
+
+    def do_POST(self):
+        StubHandler.flaky_calls += 1
+        self._reply(503)
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def reset_stub():
+    StubHandler.flaky_calls = 0
+    StubHandler.connections = set()
+    StubHandler.max_in_flight = 0
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestOutboundHTTP:
+    def test_connections_are_reused(self, stub_url):
+        async def scenario():
+            http = OutboundHTTP()
+            await http.start()
+            for _ in range(5):
+                response = await http.get(f"{stub_url}/ok")
+                assert response.status_code == 200
+            await http.close()
+        run(scenario())
+        # Sequential calls share a single keep-alive connection
+        assert len(StubHandler.connections) == 1
+
+    def test_retries_idempotent_requests_with_backoff(self, stub_url):
+        async def scenario():
+            http = OutboundHTTP(retries=3, backoff=0.01)
+            response = await http.get(f"{stub_url}/flaky")
+            await http.close()
+            return response
+        response = run(scenario())
+        assert response.status_code == 200
+        assert StubHandler.flaky_calls == 3
+
+    def test_post_is_not_retried_by_default(self, stub_url):
+        async def scenario():
+            http = OutboundHTTP(retries=3, backoff=0.01)
+            response = await http.post(f"{stub_url}/anything")
+            await http.close()
+            return response
+        response = run(scenario())
+        assert response.status_code == 503
+        assert StubHandler.flaky_calls == 1
+
+    def test_per_host_limit(self, stub_url):
+        async def scenario():
+            http = OutboundHTTP(max_per_host=2)
+            responses = await asyncio.gather(*[http.get(f"{stub_url}/slow") for _ in range(6)])
+            await http.close()
+            return responses
+        responses = run(scenario())
+        assert all(r.status_code == 200 for r in responses)
+        assert StubHandler.max_in_flight <= 2
+
+    def test_timeout(self, stub_url):
+        async def scenario():
+            http = OutboundHTTP(timeout=0.3, retries=0)
+            try:
+                await http.get(f"{stub_url}/hang")
+            finally:
+                await http.close()
+        with pytest.raises(httpx.TimeoutException):
+            run(scenario())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -10,6 +10,7 @@ import pytest
 import requests
 import os
 import uuid
+from datetime import datetime
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://livejam-coach.preview.emergentagent.com').rstrip('/')
 
@@ -92,9 +93,24 @@ class TestReservationPagination:
         pagination = data["pagination"]
         assert pagination["page"] == 2
         assert pagination["limit"] == 10
-        
+
         print(f"✅ Page 2 pagination test passed")
 
+    def test_reservations_sorted_by_bson_created_at(self):
+        """createdAt is a timezone-aware datetime and results are newest first"""
+        response = requests.get(f"{BASE_URL}/api/reservations?page=1&limit=20")
+        assert response.status_code == 200
+        reservations = response.json()["data"]
+
+        dates = [
+            datetime.fromisoformat(r["createdAt"].replace('Z', '+00:00'))
+            for r in reservations if r.get("createdAt")
+        ]
+        assert all(d.tzinfo is not None for d in dates), "createdAt should carry a UTC offset"
+        assert dates == sorted(dates, reverse=True), "Reservations should be sorted by createdAt desc"
+
+        print(f"✅ createdAt ordering verified on {len(dates)} reservations")
+
 
 class TestOfferKeywords:
     """Test offer keywords field for search optimization"""
@@ -316,5 +332,68 @@ class TestSearchFunctionality:
             print("⚠️ No offers to verify searchable fields")
 
 
+class TestCursorListing:
+    """Uniform list API: full list by default, cursor pages, fields projection, whitelisted filters/sort"""
+
+    @pytest.mark.parametrize("endpoint", ["users", "leads", "discount-codes", "campaigns", "coaches", "offers", "courses"])
+    def test_cursor_pages_cover_full_list(self, endpoint):
+        full = requests.get(f"{BASE_URL}/api/{endpoint}")
+        assert full.status_code == 200
+        assert isinstance(full.json(), list)
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 7, **({"cursor": cursor} if cursor else {})}
+            page = requests.get(f"{BASE_URL}/api/{endpoint}", params=params).json()
+            assert len(page["data"]) <= 7
+            seen.extend(item.get("id") for item in page["data"])
+            cursor = page["pagination"]["nextCursor"]
+            if not cursor:
+                break
+        assert len(seen) == len(full.json())
+        assert len(set(seen)) == len(seen), "Cursor pages must not overlap"
+        print(f"✅ /{endpoint}: {len(seen)} items over cursor pages")
+
+    def test_fields_projection(self):
+        page = requests.get(f"{BASE_URL}/api/offers", params={"limit": 5, "fields": "name,price"}).json()
+        assert all(set(offer.keys()) <= {"id", "name", "price"} for offer in page["data"])
+
+    def test_rejects_unknown_sort_and_fields(self):
+        assert requests.get(f"{BASE_URL}/api/users", params={"sort": "password"}).status_code == 400
+        assert requests.get(f"{BASE_URL}/api/offers", params={"fields": "$where"}).status_code == 400
+
+    def test_filter_and_sort(self):
+        offers = requests.get(f"{BASE_URL}/api/offers", params={"visible": "true", "sort": "-price"}).json()
+        assert all(o["visible"] for o in offers)
+        prices = [o["price"] for o in offers]
+        assert prices == sorted(prices, reverse=True)
+
+
+class TestResponseCompression:
+    """Negotiated gzip compression for large JSON payloads"""
+
+    def test_large_payload_is_gzipped(self):
+        """all_data export is compressed when the client accepts gzip"""
+        response = requests.get(
+            f"{BASE_URL}/api/reservations?all_data=true",
+            headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        if len(response.content) >= 1024:
+            assert response.headers.get("Content-Encoding") == "gzip"
+        # requests decompresses transparently
+        assert "data" in response.json()
+        print(f"✅ Export served with Content-Encoding: {response.headers.get('Content-Encoding')}")
+
+    def test_identity_when_gzip_not_accepted(self):
+        response = requests.get(
+            f"{BASE_URL}/api/reservations?all_data=true",
+            headers={"Accept-Encoding": "identity"}
+        )
+        assert response.status_code == 200
+        assert response.headers.get("Content-Encoding") != "gzip"
+        print("✅ Uncompressed response without Accept-Encoding: gzip")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,62 @@
+"""
+Read-preference routing tests (db vs db_analytics handles in backend/server.py)
+Requires a local replica set, e.g.:
+    docker run -d -p 27017:27017 mongo:7 --replSet rs0 && mongosh --eval "rs.initiate()"
+    (add a secondary for the routing assertion)
+    MONGO_REPLICA_SET_URL="mongodb://localhost:27017,localhost:27018/?replicaSet=rs0" pytest tests/test_read_preference.py
+Skipped when MONGO_REPLICA_SET_URL is not set.
+"""
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+REPLICA_SET_URL = os.environ.get("MONGO_REPLICA_SET_URL")
+pytestmark = pytest.mark.skipif(not REPLICA_SET_URL, reason="MONGO_REPLICA_SET_URL not set")
+
+if REPLICA_SET_URL:
+    os.environ["MONGO_URL"] = REPLICA_SET_URL
+    os.environ.setdefault("DB_NAME", "afroboost_read_pref_test")
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+    import server  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestReadPreference:
+    def test_handles_use_expected_preferences(self):
+        assert server.db.read_preference.mode == 0  # primary
+        document = server.db_analytics.read_preference.document
+        assert document["mode"] == server.ANALYTICS_READ_PREFERENCE
+        if server.ANALYTICS_MAX_STALENESS_SECONDS != -1:
+            assert document["maxStalenessSeconds"] == server.ANALYTICS_MAX_STALENESS_SECONDS
+
+    def test_unknown_mode_is_rejected(self):
+        with pytest.raises(RuntimeError):
+            server._read_preference("fastest")
+
+    def test_analytics_reads_are_routed_to_a_secondary(self):
+        async def scenario():
+            marker = f"TEST_read_pref_{uuid.uuid4().hex[:8]}"
+            await server.db.leads.insert_one({"id": marker, "createdAt": marker})
+            try:
+                cursor = server.db_analytics.leads.find({}, {"_id": 0}).limit(1)
+                await cursor.to_list(1)
+                # Topology is known once the first query has run
+                return server.client.primary, server.client.secondaries, cursor.address
+            finally:
+                await server.db.leads.delete_one({"id": marker})
+
+        primary, secondaries, address = run(scenario())
+        if not secondaries:
+            pytest.skip("Replica set has no secondary member")
+        assert address in secondaries
+        assert address != primary
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,48 @@
+"""
+Default data seeding (server.py against a test MongoDB, see conftest.backend)
+- seeded once, not re-created after the coach deletes everything
+- an interrupted seed (defaults partly inserted, not marked) is completed on next start
+"""
+import pytest
+
+DOCS = [{"id": "seed-a", "name": "A"}, {"id": "seed-b", "name": "B"}]
+NAME = "seed_test_items"
+
+
+@pytest.fixture
+def seed(backend):
+    db = backend.db
+
+    async def reset():
+        await db[NAME].delete_many({})
+        await db.seed_state.delete_many({"_id": NAME})
+
+    backend.run(reset())
+    yield lambda: backend.run(backend.server._seed_collection_once(NAME, [dict(d) for d in DOCS]))
+    backend.run(reset())
+
+
+def _ids(backend):
+    return sorted(doc["id"] for doc in backend.run(backend.db[NAME].find({}).to_list(None)))
+
+
+class TestSeedCollectionOnce:
+    def test_seeded_once(self, backend, seed):
+        seed()
+        assert _ids(backend) == ["seed-a", "seed-b"]
+        backend.run(backend.db[NAME].delete_many({}))
+        seed()
+        assert _ids(backend) == []
+
+    def test_interrupted_seed_is_completed(self, backend, seed):
+        # Crash after the first default was written, before seed_state was marked
+        backend.run(backend.db[NAME].insert_one({"id": "seed-a", "name": "A"}))
+        seed()
+        assert _ids(backend) == ["seed-a", "seed-b"]
+        assert backend.run(backend.db.seed_state.find_one({"_id": NAME}))
+
+    def test_existing_data_is_left_alone(self, backend, seed):
+        backend.run(backend.db[NAME].insert_one({"id": "coach-own", "name": "Mine"}))
+        seed()
+        assert _ids(backend) == ["coach-own"]
+        assert backend.run(backend.db.seed_state.find_one({"_id": NAME}))
@@ -92,6 +92,92 @@ class TestStripeCheckout:
         assert "status" in data, "Response should contain 'status'"
         print(f"✅ Checkout status endpoint working, status: {data.get('status')}")
 
+    def test_checkout_status_concurrent_polls(self):
+        """Concurrent polls of a pending session share one result"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        session_id = requests.post(
+            f"{BASE_URL}/api/stripe/create-checkout",
+            json={
+                "offer_id": "test-offer",
+                "offer_name": "Test Offer",
+                "price": 30.0,
+                "user_name": "Test User",
+                "user_email": "test@example.com",
+                "course_id": "test-course",
+                "course_name": "Test Course",
+                "origin_url": BASE_URL
+            }
+        ).json()["session_id"]
+
+        url = f"{BASE_URL}/api/stripe/checkout-status/{session_id}"
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = list(pool.map(lambda _: requests.get(url), range(5)))
+        assert all(r.status_code == 200 for r in responses)
+        assert all(r.json() == responses[0].json() for r in responses)
+        assert responses[0].json()["payment_status"] != "paid"
+        assert responses[0].json()["amount_total"] == 3000
+        print("✅ Concurrent status polls answered consistently")
+
+
+class TestReservationLookup:
+    """Direct lookups used by the Stripe return flow"""
+
+    def test_session_lookup_pending(self):
+        """Unpaid session: local transaction found, no reservation, wait bounded"""
+        create_response = requests.post(
+            f"{BASE_URL}/api/stripe/create-checkout",
+            json={
+                "offer_id": "test-offer",
+                "offer_name": "Test Offer",
+                "price": 30.0,
+                "user_name": "Test User",
+                "user_email": "test@example.com",
+                "course_id": "test-course",
+                "course_name": "Test Course",
+                "origin_url": BASE_URL
+            }
+        )
+        assert create_response.status_code == 200
+        checkout = create_response.json()
+
+        response = requests.get(f"{BASE_URL}/api/stripe/session/{checkout['session_id']}", params={"wait": 1})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["reservation_code"] == checkout["reservation_code"]
+        assert data["payment_status"] == "pending"
+        assert data["reservation"] is None
+        print("✅ Session lookup returns the pending transaction")
+
+    def test_session_lookup_unknown(self):
+        response = requests.get(f"{BASE_URL}/api/stripe/session/cs_test_unknown")
+        assert response.status_code == 404
+
+    def test_reservation_by_code(self):
+        created = requests.post(f"{BASE_URL}/api/reservations", json={
+            "userId": "test-user-id",
+            "userName": "TEST_ByCode",
+            "userEmail": "test@example.com",
+            "userWhatsapp": "+41791234567",
+            "courseId": "test-course-id",
+            "courseName": "Test Course",
+            "courseTime": "18:30",
+            "datetime": "2025-01-15T18:30:00.000Z",
+            "offerId": "test-offer-id",
+            "offerName": "Test Offer",
+            "price": 30.0,
+            "quantity": 1,
+            "totalPrice": 30.0
+        }).json()
+        try:
+            response = requests.get(f"{BASE_URL}/api/reservations/by-code/{created['reservationCode']}")
+            assert response.status_code == 200
+            assert response.json()["id"] == created["id"]
+        finally:
+            requests.delete(f"{BASE_URL}/api/reservations/{created['id']}")
+        assert requests.get(f"{BASE_URL}/api/reservations/by-code/AFR-NOPE00").status_code == 404
+        print(f"✅ Reservation found by code {created['reservationCode']}")
+
 
 class TestWebSocketSession:
     """Test WebSocket session endpoints"""
@@ -0,0 +1,153 @@
+"""
+Stripe webhook idempotency (server.py against a test MongoDB, see conftest.backend)
+The Stripe client is replaced by a local fake returning canned webhook events and statuses.
+- duplicate delivery of the same event, and a second event for the same session
+- webhook racing checkout-status polls: one paid transition, one reservation
+- _create_paid_reservation failure: transaction and event rolled back, Stripe retry succeeds
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+
+class FakeStripe:
+    """Stand-in for StripeCheckout: handle_webhook returns the next queued event"""
+    def __init__(self):
+        self.events = []
+        self.status = None
+
+    async def handle_webhook(self, body, signature):
+        return self.events.pop(0)
+
+    async def get_checkout_status(self, session_id):
+        await asyncio.sleep(0.01)  # leaves room for the webhook to interleave
+        return self.status
+
+
+def _webhook_request():
+    from starlette.requests import Request
+
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    return Request({
+        "type": "http", "method": "POST", "path": "/api/webhook/stripe",
+        "headers": [(b"stripe-signature", b"t=0,v1=test")]
+    }, receive)
+
+
+@pytest.fixture
+def checkout(backend, monkeypatch):
+    """A pending checkout session; yields a namespace to queue events and count notifications"""
+    server = backend.server
+    db = backend.db
+    stripe = FakeStripe()
+    monkeypatch.setattr(server, "_get_stripe_checkout", lambda webhook_url="": stripe)
+    notified = []
+    monkeypatch.setattr(server, "_notify_reservation_created", notified.append)
+
+    session_id = f"cs_test_{uuid.uuid4().hex}"
+    metadata = {
+        "reservation_code": f"AFR-{uuid.uuid4().hex[:6].upper()}", "offer_id": "offer-1",
+        "offer_name": "Séance", "user_name": "TEST_Webhook", "user_email": "webhook@example.com",
+        "course_id": "course-1", "course_name": "Cours", "total_price": "30.0",
+        "admin_commission": "3.0", "coach_amount": "27.0"
+    }
+    stripe.status = SimpleNamespace(
+        status="complete", payment_status="paid", amount_total=3000, currency="chf", metadata=metadata
+    )
+
+    async def setup():
+        await server._ensure_payment_indexes()
+        await db.payment_transactions.insert_one({
+            "id": str(uuid.uuid4()), "session_id": session_id, "reservation_code": metadata["reservation_code"],
+            "amount": 30.0, "currency": "chf", "payment_status": "pending", "metadata": metadata
+        })
+
+    async def cleanup():
+        await db.payment_transactions.delete_many({"session_id": session_id})
+        await db.reservations.delete_many({"stripeSessionId": session_id})
+        await db.stripe_events.delete_many({"session_id": session_id})
+
+    server._stripe_status_cache.clear()
+    backend.run(setup())
+
+    def deliver(event_id, event_type="checkout.session.completed"):
+        stripe.events.append(SimpleNamespace(
+            event_id=event_id, event_type=event_type, session_id=session_id, metadata=metadata
+        ))
+        return backend.run(server.stripe_webhook(_webhook_request()))
+
+    yield SimpleNamespace(session_id=session_id, metadata=metadata, deliver=deliver, notified=notified)
+    backend.run(cleanup())
+
+
+def _reservations(backend, session_id):
+    return backend.run(backend.db.reservations.find({"stripeSessionId": session_id}, {"_id": 0}).to_list(None))
+
+
+class TestWebhookIdempotency:
+    def test_duplicate_delivery_creates_one_reservation(self, backend, checkout):
+        assert checkout.deliver("evt_1") == {"received": True}
+        assert checkout.deliver("evt_1") == {"received": True, "duplicate": True}
+
+        reservations = _reservations(backend, checkout.session_id)
+        assert len(reservations) == 1
+        assert reservations[0]["reservationCode"] == checkout.metadata["reservation_code"]
+        assert checkout.notified == [checkout.metadata["reservation_code"]]
+
+        transaction = backend.run(backend.db.payment_transactions.find_one({"session_id": checkout.session_id}))
+        assert transaction["payment_status"] == "paid" and "expiresAt" not in transaction
+
+    def test_second_event_for_same_session_is_a_no_op(self, backend, checkout):
+        assert checkout.deliver("evt_1") == {"received": True}
+        assert checkout.deliver("evt_2") == {"received": True}
+        assert len(_reservations(backend, checkout.session_id)) == 1
+        assert len(checkout.notified) == 1
+
+    def test_webhook_racing_status_polls(self, backend, checkout):
+        server = backend.server
+
+        async def race():
+            polls = [server._resolve_checkout_status(checkout.session_id) for _ in range(3)]
+            *statuses, _ = await asyncio.gather(
+                *polls, server._complete_paid_checkout(checkout.session_id, checkout.metadata)
+            )
+            return statuses
+
+        statuses = backend.run(race())
+        assert all(s["payment_status"] == "paid" for s in statuses)
+        assert len(_reservations(backend, checkout.session_id)) == 1
+        assert len(checkout.notified) == 1
+
+        # Webhook arriving after the poll did the work: acknowledged, nothing created
+        assert checkout.deliver("evt_late") == {"received": True}
+        assert len(_reservations(backend, checkout.session_id)) == 1
+        # Later polls are served from the local terminal state
+        assert backend.run(server._resolve_checkout_status(checkout.session_id))["status"] == "complete"
+
+    def test_failed_reservation_rolls_back_for_retry(self, backend, checkout, monkeypatch):
+        server = backend.server
+        create = server._create_paid_reservation
+
+        async def broken(*args, **kwargs):
+            raise ConnectionError("primary stepped down")
+
+        monkeypatch.setattr(server, "_create_paid_reservation", broken)
+        response = checkout.deliver("evt_1")
+        assert response.status_code == 500  # non-2xx: Stripe retries the event
+
+        transaction = backend.run(backend.db.payment_transactions.find_one({"session_id": checkout.session_id}))
+        assert transaction["payment_status"] == "pending" and "paidAt" not in transaction
+        assert transaction["expiresAt"] > datetime.now(timezone.utc)  # pending again: TTL-managed
+        assert backend.run(backend.db.stripe_events.count_documents({"event_id": "evt_1"})) == 0
+        assert _reservations(backend, checkout.session_id) == []
+
+        monkeypatch.setattr(server, "_create_paid_reservation", create)
+        assert checkout.deliver("evt_1") == {"received": True}  # Stripe retry
+        assert len(_reservations(backend, checkout.session_id)) == 1
+        transaction = backend.run(backend.db.payment_transactions.find_one({"session_id": checkout.session_id}))
+        assert transaction["payment_status"] == "paid"